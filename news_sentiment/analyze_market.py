@@ -1,106 +1,109 @@
 # news_sentiment/analyze_market.py
 
+import argparse
 import pandas as pd
-import yfinance as yf
-import matplotlib.pyplot as plt
-from scipy.stats import pearsonr
-import os
+
+from correlations import correlate, lagged_returns, rolling_correlations
+from market_data import CachedPriceProvider, CsvProvider
+from plots import PlotJob, render_all
+
 
 def analyze_sentiment_vs_indexes(
     sentiment_csv="daily_summary.csv",
-    tickers={"^GSPC": "S&P 500", "^IXIC": "NASDAQ", "^DJI": "Dow Jones"}
+    tickers={"^GSPC": "S&P 500", "^IXIC": "NASDAQ", "^DJI": "Dow Jones"},
+    price_provider=None,
+    lags=range(0, 4),
+    metrics=("avg_vader", "finbert_pos"),
+    rolling_window=None,
+    plot_workers=None,
 ):
-    # Load daily sentiment summary
+    # Load daily sentiment summary (built by `python -m news_sentiment.aggregate`)
     daily = pd.read_csv(sentiment_csv)
     daily["date"] = pd.to_datetime(daily["date"])
 
-    results = []
+    # Closes for every ticker at once, from the local cache where possible
+    price_provider = price_provider or CachedPriceProvider()
+    prices = price_provider.load(tickers, start=daily["date"].min(), end=daily["date"].max())
 
+    # Tickers with prices that overlap the sentiment dates
+    available = []
     for ticker, name in tickers.items():
-        print(f"\n=== {name} ({ticker}) ===")
-        market = yf.download(
-            ticker,
-            start=daily["date"].min(),
-            end=daily["date"].max(),
-            progress=False
-        )
-
-        if market.empty:
+        close = prices[ticker].dropna() if ticker in prices else pd.Series(dtype="float64")
+        if close.empty:
             print(f"⚠️ No market data for {ticker}")
             continue
-
-        # Flatten column names if MultiIndex
-        if isinstance(market.columns, pd.MultiIndex):
-            market.columns = [c[0] if isinstance(c, tuple) else c for c in market.columns]
-
-        # Ensure close column exists
-        if "Close" not in market.columns:
-            print(f"⚠️ Could not find a 'Close' column in market data for {ticker}. Columns were: {market.columns.tolist()}")
-            continue
-
-        # Prepare market data
-        market = market[["Close"]].rename(columns={"Close": "close"})
-        market["date"] = market.index.normalize()
-        market["returns"] = market["close"].pct_change()
-
-        # Lead-lag returns (1, 2, 3 days ahead)
-        for lag in [1, 2, 3]:
-            market[f"returns_t+{lag}"] = market["returns"].shift(-lag)
-
-        # Merge with sentiment data
-        merged = pd.merge(daily, market, on="date", how="inner")
-
-        if merged.empty:
+        overlap = int(daily["date"].isin(close.index).sum())
+        if not overlap:
             print(f"⚠️ No overlap between sentiment and market for {ticker}")
             continue
-
-        print(f"✅ Merged dataset for {ticker}, {len(merged)} days of overlap")
-
-        # --- Correlations ---
-        # Same-day
-        for metric in ["avg_vader", "finbert_pos"]:
-            sub = merged.dropna(subset=[metric, "returns"])
-            if len(sub) > 1:
-                r, p = pearsonr(sub[metric], sub["returns"])
-                print(f"{metric} vs {ticker} returns: r = {r:.3f}, p = {p:.4f}")
-                results.append([ticker, name, 0, metric, r, p])
-            else:
-                print(f"⚠️ Not enough data for {metric} vs {ticker} returns (same-day)")
-
-        # Lead-lag
-        for lag, col in [(1, "returns_t+1"), (2, "returns_t+2"), (3, "returns_t+3")]:
-            for metric in ["avg_vader", "finbert_pos"]:
-                if col in merged:
-                    sub = merged.dropna(subset=[metric, col])
-                    if len(sub) > 1:
-                        r, p = pearsonr(sub[metric], sub[col])
-                        print(f"{metric} vs {ticker} returns +{lag} days: r = {r:.3f}, p = {p:.4f}")
-                        results.append([ticker, name, lag, metric, r, p])
-                    else:
-                        print(f"⚠️ Not enough data for {metric} vs {ticker} returns +{lag} days")
-
-        # --- Plot sentiment vs returns ---
-        plt.figure(figsize=(10, 5))
-        plt.scatter(merged["avg_vader"], merged["returns"], label="VADER vs Returns", alpha=0.7)
-        plt.scatter(merged["finbert_pos"], merged["returns"], label="FinBERT % Positive vs Returns", alpha=0.7)
-        plt.axhline(0, color="gray", linestyle="--")
-        plt.title(f"Sentiment vs {name} Returns")
-        plt.xlabel("Sentiment Metric")
-        plt.ylabel("Market Returns")
-        plt.legend()
-        plt.tight_layout()
-        os.makedirs("market_plots", exist_ok=True)
+        print(f"✅ {name} ({ticker}): {overlap} days of overlap")
+        available.append(ticker)
+
+    if not available:
+        return
+
+    # --- Correlations: every ticker x lag x metric in one pass ---
+    returns = lagged_returns(prices[available], lags)
+    res_df = correlate(daily, returns, metrics)
+    res_df.insert(1, "Index", res_df["Ticker"].map(tickers))
+
+    shown = res_df if len(res_df) <= 100 else res_df.reindex(res_df["Correlation"].abs().nlargest(20).index)
+    if len(shown) < len(res_df):
+        print(f"\n{len(res_df)} correlations; strongest {len(shown)}:")
+    for row in shown.itertuples(index=False):
+        ticker, _, lag, metric, r, p = row[:6]
+        when = "returns" if lag == 0 else f"returns +{lag} days"
+        print(f"{metric} vs {ticker} {when}: r = {r:.3f}, p = {p:.4f}")
+
+    # --- Plot sentiment vs same-day returns (skipped where the data is unchanged) ---
+    same_day = returns if 0 in lags else lagged_returns(prices[available], [0])
+    same_day = same_day.xs(0, level="lag", axis=1)
+    jobs = []
+    for ticker in available:
+        merged = daily[["avg_vader", "finbert_pos"]].assign(returns=same_day[ticker].reindex(daily["date"]).to_numpy())
         out_path = f"market_plots/sentiment_vs_{ticker.replace('^', '')}.png"
-        plt.savefig(out_path)
-        plt.close()
+        jobs.append(PlotJob("market_scatter", out_path, f"Sentiment vs {tickers[ticker]} Returns", merged))
+    rendered, skipped = render_all(jobs, workers=plot_workers)
+    for out_path in rendered:
         print(f"📈 Plot saved: {out_path}")
+    if skipped:
+        print(f"📈 {len(skipped)} plots unchanged, not re-rendered")
 
     # Save results table
-    if results:
-        res_df = pd.DataFrame(results, columns=["Ticker", "Index", "Lag (days)", "Metric", "Correlation", "p-value"])
-        res_df.to_csv("market_sentiment_results.csv", index=False)
-        print("✅ Results saved to market_sentiment_results.csv")
+    res_df = res_df.drop(columns=["n"])
+    res_df.to_csv("market_sentiment_results.csv", index=False)
+    print("✅ Results saved to market_sentiment_results.csv")
+
+    # Rolling-window correlations, long format
+    if rolling_window:
+        parts = []
+        for metric in metrics:
+            rolled = rolling_correlations(daily, returns, metric, rolling_window)
+            long = rolled.stack(["ticker", "lag"], future_stack=True).dropna().rename("Correlation").reset_index()
+            long.columns = ["date", "Ticker", "Lag (days)", "Correlation"]
+            long.insert(3, "Metric", metric)
+            parts.append(long)
+        rolling_df = pd.concat(parts, ignore_index=True)
+        rolling_df.to_csv("market_rolling_correlations.csv", index=False)
+        print(f"✅ {rolling_window}-day rolling correlations saved to market_rolling_correlations.csv")
 
 
 if __name__ == "__main__":
-    analyze_sentiment_vs_indexes()
+    parser = argparse.ArgumentParser(description="Correlate daily sentiment with index returns")
+    parser.add_argument("--sentiment-csv", default="daily_summary.csv")
+    parser.add_argument("--cache-dir", default="market_data", help="local Parquet price cache")
+    parser.add_argument("--prices-csv", metavar="DIR",
+                        help="fill cache gaps from <DIR>/<ticker>.csv instead of Yahoo (offline)")
+    parser.add_argument("--max-lag", type=int, default=3, help="correlate with returns 0..N trading days ahead")
+    parser.add_argument("--rolling", type=int, metavar="DAYS", help="also write rolling-window correlations")
+    parser.add_argument("--plot-workers", type=int, help="plot render processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    upstream = CsvProvider(args.prices_csv) if args.prices_csv else None
+    analyze_sentiment_vs_indexes(
+        args.sentiment_csv,
+        price_provider=CachedPriceProvider(upstream, cache_dir=args.cache_dir),
+        lags=range(0, args.max_lag + 1),
+        rolling_window=args.rolling,
+        plot_workers=args.plot_workers,
+    )
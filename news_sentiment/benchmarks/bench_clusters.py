@@ -0,0 +1,146 @@
+# news_sentiment/benchmarks/bench_clusters.py
+#
+# Near-duplicate clustering (news_sentiment.clusters.ClusterIndex) over a
+# synthetic stream of headlines. Each story gets a few rewordings the way
+# other outlets carry it (case, "UPDATE 2-" prefixes, " - Reuters"
+# suffixes, punctuation, a dropped word), arriving within hours of the
+# first. Reports headlines/sec through assign(), how many rewordings joined
+# their own story's cluster (recall) and how many joins went to another
+# story (false joins), and the index's memory by max_entries: its numpy
+# arrays at full size, the Python objects around them (remembered scores,
+# free slots), and how much the process RSS grew while it ran.
+#
+#   cd news_sentiment
+#   python benchmarks/bench_clusters.py --items 1000000
+#   python benchmarks/bench_clusters.py --items 1000000 --max-entries 100000,1000000 --window-hours 0
+
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_finbert_batch import HEADLINES_TXT  # noqa: E402
+from news_sentiment.clusters import ClusterIndex  # noqa: E402
+
+COLUMNS = ("vader_compound", "finbert_label", "finbert_score")
+SOURCES = (" - Reuters", " | CNBC", " - The Guardian", " (AP)", " - MarketWatch")
+
+
+def _reword(text, rng):
+    kind = rng.randrange(6)
+    if kind == 0:
+        return text.upper() if rng.random() < 0.5 else text.lower()
+    if kind == 1:
+        return f"UPDATE {rng.randint(1, 3)}-{text}"
+    if kind == 2:
+        return text + rng.choice(SOURCES)
+    if kind == 3:
+        return text.replace(" ", ", ", 1) + "!"
+    if kind == 4:
+        return text.rsplit(" ", 1)[0]
+    return f"'{text}'"
+
+
+def synthetic_stream(n, days, dup_share, seed=0):
+    """[(arrival, story, headline)] in arrival order; about dup_share of them reword an earlier story."""
+    rng = random.Random(seed)
+    with open(HEADLINES_TXT, encoding="utf-8") as f:
+        base = [line.split() for line in f if line.strip()]
+    vocab = sorted({w for words in base for w in words if w.isalpha()})
+    span = days * 86400
+    out = []
+    story = 0
+    while len(out) < n:
+        words = list(rng.choice(base))
+        for i in rng.sample(range(len(words)), (len(words) + 1) // 2):
+            words[i] = rng.choice(vocab)
+        name = "".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiou") for _ in range(3)).title()
+        text = f"{name} {' '.join(words)}"
+        if rng.random() < 0.3:
+            text += f" {rng.randint(1, 99)}%"
+        start = rng.uniform(0, span)
+        out.append((start, story, text))
+        while len(out) < n and rng.random() < dup_share:
+            out.append((start + rng.expovariate(1 / 7200), story, _reword(text, rng)))
+        story += 1
+    out.sort()
+    return out
+
+
+def index_bytes(index):
+    """(bytes of the index's numpy arrays, bytes of the Python objects around them)."""
+    arrays = sum(a.nbytes for a in (index.sigs, index.keys, index.numbers, index.hashes, index.seen, index.table,
+                                            index.overflow))
+    size = sys.getsizeof
+    python = size(index.scores) + size(index.free) + sum(size(s) for s in index.free)
+    python += sum(size(v) + sum(size(x) for x in v) for v in index.scores if v is not None)
+    return arrays, python
+
+
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def run(stream, max_entries, window_hours, threshold):
+    index = ClusterIndex(threshold=threshold, max_entries=max_entries, window_hours=window_hours, columns=COLUMNS)
+    first = {}  # {story: cluster id of its first headline}
+    owner = {}  # {cluster id: story}
+    correct = false_joins = rewordings = 0
+    scores = {"vader_compound": 0.1, "finbert_label": "neutral", "finbert_score": 0.9}
+    start = time.perf_counter()
+    for arrival, story, headline in stream:
+        cid, slot, shared, _ = index.assign(headline, arrival)
+        if story in first:
+            rewordings += 1
+            correct += cid == first[story]
+        else:
+            first[story] = cid
+        false_joins += owner.setdefault(cid, story) != story
+        if shared is None:
+            index.remember(slot, cid, scores)  # as the pipeline does once the row is scored
+    elapsed = time.perf_counter() - start
+    return elapsed, index, correct, rewordings, false_joins
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate clustering headlines/sec, recall and index memory")
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--max-entries", default="100000,1000000", help="index sizes to compare")
+    parser.add_argument("--window-hours", type=float, default=48.0, help="0 keeps stories until evicted")
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--days", type=float, default=7.0, help="time the stream spans")
+    parser.add_argument("--dup-share", type=float, default=0.4, help="chance each story gets another rewording")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stream = synthetic_stream(args.items, args.days, args.dup_share, args.seed)
+    stories = len({story for _, story, _ in stream})
+    print(f"{len(stream)} headlines, {stories} stories over {args.days:g} days, "
+          f"window {args.window_hours:g}h, threshold {args.threshold}")
+    print(f"{'max_entries':>11} {'headlines/sec':>14} {'us/item':>8} {'recall':>7} {'false joins':>12} "
+          f"{'entries':>9} {'arrays MB':>10} {'python MB':>10} {'RSS +MB':>8} {'bytes/entry':>12}")
+    for max_entries in (int(v) for v in args.max_entries.split(",")):
+        before = rss()
+        elapsed, index, correct, rewordings, false_joins = run(stream, max_entries, args.window_hours,
+                                                                args.threshold)
+        grown = rss() - before
+        arrays, python = index_bytes(index)
+        counters = index.take_counters()
+        print(f"{max_entries:>11} {len(stream) / elapsed:>14.0f} {elapsed / len(stream) * 1e6:>8.1f} "
+              f"{correct / max(rewordings, 1):>6.1%} {false_joins / len(stream):>11.3%} {len(index):>9} "
+              f"{arrays / 2**20:>10.1f} {python / 2**20:>10.1f} {grown / 2**20:>8.1f} "
+              f"{(arrays + python) / max_entries:>12.0f}")
+        print(f"{'':>11} " + ", ".join(f"{k}={v}" for k, v in sorted(counters.items())))
+        del index
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"\npeak RSS {peak / 1024:.0f} MB (includes the synthetic stream)")
+
+
+if __name__ == "__main__":
+    main()
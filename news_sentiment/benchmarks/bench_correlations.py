@@ -0,0 +1,74 @@
+# news_sentiment/benchmarks/bench_correlations.py
+#
+# Time correlations.correlate() on synthetic prices for many tickers and
+# lags, and check it against the per-combination pearsonr() loop on a
+# sample of (ticker, lag, metric) cells.
+#
+#   cd news_sentiment
+#   python benchmarks/bench_correlations.py --tickers 500 --max-lag 30 --days 730
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import pearsonr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from correlations import correlate, lagged_returns  # noqa: E402
+
+
+def synthetic(n_tickers, days, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2024-01-01", periods=days, freq="D")
+    trading = dates[dates.dayofweek < 5]
+    closes = 100 * np.cumprod(1 + rng.normal(0, 0.01, (len(trading), n_tickers)), axis=0)
+    prices = pd.DataFrame(closes, index=trading, columns=[f"T{i:04d}" for i in range(n_tickers)])
+    # a few holidays per ticker, so calendars differ
+    holes = rng.random(prices.shape) < 0.01
+    prices = prices.mask(holes)
+    daily = pd.DataFrame({
+        "date": dates,
+        "avg_vader": rng.normal(0, 0.1, days),
+        "finbert_pos": rng.uniform(0, 1, days),
+    })
+    return daily, prices
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized correlation matrix timing")
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--max-lag", type=int, default=30)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--check", type=int, default=50, help="cells to verify against pearsonr")
+    args = parser.parse_args()
+
+    daily, prices = synthetic(args.tickers, args.days)
+    lags = range(args.max_lag + 1)
+
+    start = time.perf_counter()
+    returns = lagged_returns(prices, lags)
+    t_returns = time.perf_counter() - start
+    res = correlate(daily, returns)
+    total = time.perf_counter() - start
+    print(f"{args.tickers} tickers x {len(lags)} lags x 2 metrics = {len(res)} correlations")
+    print(f"lagged returns {t_returns:.3f}s, total {total:.3f}s")
+
+    rng = np.random.default_rng(1)
+    worst = 0.0
+    for i in rng.choice(len(res), size=min(args.check, len(res)), replace=False):
+        row = res.iloc[i]
+        close = prices[row["Ticker"]].dropna().to_frame("close")
+        close["date"] = close.index
+        close["ret"] = close["close"].pct_change().shift(-row["Lag (days)"])
+        sub = pd.merge(daily, close, on="date").dropna(subset=[row["Metric"], "ret"])
+        r, p = pearsonr(sub[row["Metric"]], sub["ret"])
+        worst = max(worst, abs(r - row["Correlation"]), abs(p - row["p-value"]))
+    print(f"max |difference| vs pearsonr on {args.check} cells: {worst:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+# news_sentiment/benchmarks/bench_crawl.py
+#
+# End-to-end crawl benchmark: the real `scrapy crawl multinews` (spider,
+# middlewares, pipeline, scorers, storage) against recorded feed fixtures
+# served by a local HTTP stand-in, with no network.
+#
+# The fixtures (data/feeds/*.xml[.gz] by default; add recorded feeds there
+# or point --fixtures elsewhere) are split into their items and replayed as
+# --feeds synthetic feeds of --items-per-feed items each. Every feed gets
+# its own URLs. Its headlines are its own too, except a --shared share that
+# every feed carrying them repeats, as syndicated stories are. The crawl
+# runs in a fresh work dir with the project settings, without delays or
+# per-host limits. It reports:
+#   - items/sec end to end (crawl start to close)
+#   - per-stage latency percentiles, from the crawl's run report
+#     (news_sentiment.metrics)
+#   - peak RSS of the crawl's process tree, worker processes included
+# Each run is saved as JSON under --out-dir; --compare prints the change
+# against an earlier run.
+#
+#   cd news_sentiment
+#   python benchmarks/bench_crawl.py --feeds 2000 --items-per-feed 50
+#   python benchmarks/bench_crawl.py --feeds 200 --set FINBERT_WORKERS=0 --set STORAGE_BACKENDS=csv,parquet
+#   python benchmarks/bench_crawl.py --compare benchmarks/results/crawl-20251006T100000Z.json
+
+import argparse
+import glob
+import gzip
+import json
+import multiprocessing
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from zlib import crc32
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCH_DIR)
+FIXTURES = os.path.join(BENCH_DIR, "data", "feeds", "*.xml*")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+# the crawl as fast as the stand-in allows; --set overrides any of these
+CRAWL_SETTINGS = {
+    "DOWNLOAD_DELAY": "0",
+    "HOST_THROTTLE_ENABLED": "False",
+    "CONCURRENT_REQUESTS": "32",
+    "CONCURRENT_REQUESTS_PER_DOMAIN": "32",
+    "TELNETCONSOLE_ENABLED": "False",
+    "LOG_LEVEL": "INFO",
+}
+
+_ITEM = re.compile(rb"<(item|entry)\b.*?</\1>", re.S)
+_HOST = re.compile(rb"(https?://[^/\"'<\s]+/)")
+_TITLE = re.compile(rb"(<title\b[^>]*>(?:\s*<!\[CDATA\[)?)")
+
+
+# --- The stand-in feed server ---
+
+def load_fixtures(pattern):
+    """[(head, [item bytes], tail)] for each fixture feed."""
+    templates = []
+    for path in sorted(glob.glob(pattern)):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as f:
+            body = f.read()
+        items = list(_ITEM.finditer(body))
+        if items:
+            templates.append((body[:items[0].start()], [m.group(0) for m in items], body[items[-1].end():]))
+    if not templates:
+        raise SystemExit(f"no RSS/Atom items in fixtures matching {pattern}")
+    return templates
+
+
+def render_feed(templates, feed, per_feed, shared):
+    """Feed number `feed`: per_feed items of one fixture, with its own URLs and (mostly) headlines."""
+    head, items, tail = templates[feed % len(templates)]
+    start = feed * per_feed
+    out = [head]
+    for k in range(start, start + per_feed):
+        item = items[k % len(items)]
+        item = _HOST.sub(rb"\1f%d/" % feed, item)
+        if crc32(b"%d" % (k % len(items))) % 1000 >= shared * 1000:
+            item = _TITLE.sub(rb"\1F%d " % feed, item, count=1)
+        out.append(item)
+    out.append(tail)
+    return b"\n".join(out)
+
+
+def serve(port, fixtures, per_feed, shared, ready):
+    templates = load_fixtures(fixtures)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            m = re.fullmatch(r"/feeds/(\d+)\.xml", self.path)
+            if not m:
+                self.send_error(404)
+                return
+            body = render_feed(templates, int(m.group(1)), per_feed, shared)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/xml; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+# --- Measuring the crawl ---
+
+def tree_rss(pid):
+    """Resident bytes of `pid` and all its descendants."""
+    total, todo = 0, [pid]
+    while todo:
+        p = todo.pop()
+        try:
+            with open(f"/proc/{p}/statm") as f:
+                total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+            for task in os.listdir(f"/proc/{p}/task"):
+                with open(f"/proc/{p}/task/{task}/children") as f:
+                    todo += [int(c) for c in f.read().split()]
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return total
+
+
+class PeakRss(threading.Thread):
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid, self.interval, self.peak = pid, interval, 0
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            self.peak = max(self.peak, tree_rss(self.pid))
+
+
+def run_crawl(port, n_feeds, settings, work_dir):
+    feeds = [{"source": f"Bench{i % 50:02d}", "category": ("business", "world", "technology")[i % 3],
+              "url": f"http://127.0.0.1:{port}/feeds/{i}.xml"} for i in range(n_feeds)]
+    feeds_file = os.path.join(work_dir, "feeds.json")
+    with open(feeds_file, "w", encoding="utf-8") as f:
+        json.dump(feeds, f)
+    cmd = [sys.executable, "-m", "scrapy", "crawl", "multinews", "-a", f"feeds_file={feeds_file}"]
+    for key, value in settings.items():
+        cmd += ["-s", f"{key}={value}"]
+    env = dict(os.environ, SCRAPY_SETTINGS_MODULE="news_sentiment.settings",
+               PYTHONPATH=os.pathsep.join(filter(None, [PROJECT_DIR, os.environ.get("PYTHONPATH")])))
+    log_path = os.path.join(work_dir, "crawl.log")
+    start = time.perf_counter()
+    with open(log_path, "wb") as log:
+        proc = subprocess.Popen(cmd, cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        sampler = PeakRss(proc.pid)
+        sampler.start()
+        proc.wait()
+        sampler.done.set()
+    wall = time.perf_counter() - start
+    if proc.returncode:
+        with open(log_path, encoding="utf-8", errors="replace") as f:
+            sys.stderr.write(f.read()[-4000:])
+        raise SystemExit(f"crawl exited with {proc.returncode}")
+    reports = sorted(glob.glob(os.path.join(work_dir, "run_reports", "run-*.json")))
+    if not reports:
+        raise SystemExit("the crawl wrote no run report; is METRICS_ENABLED off?")
+    with open(reports[-1], encoding="utf-8") as f:
+        return json.load(f), wall, sampler.peak
+
+
+def summarize_run(report, wall, peak_rss):
+    stats = report["stats"]
+    items = stats.get("item_scraped_count", 0)
+    elapsed = report["elapsed_seconds"]
+    return {
+        "items": items,
+        "feeds_fetched": stats.get("downloader/response_status_count/200", 0),
+        "elapsed_seconds": elapsed,
+        "wall_seconds": round(wall, 3),
+        "items_per_sec": round(items / elapsed, 1) if elapsed else None,
+        "items_per_sec_wall": round(items / wall, 1) if wall else None,
+        "peak_rss_mb": round(peak_rss / 2**20, 1),
+        "stages": {
+            name: {k: s[k] for k in ("count", "mean", "p50", "p90", "p99", "max", "total_seconds")}
+            for name, s in sorted(report["stages"].items())
+        },
+        "queues": report["queues"],
+        "stats": {k: v for k, v in stats.items() if not k.startswith(("stage/", "queue/"))},
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_run(result, baseline=None):
+    r = result["results"]
+    base = baseline["results"] if baseline else None
+
+    def change(value, old):
+        return f" ({value / old - 1:+.0%})" if old else ""
+
+    print(f"{r['items']} items from {r['feeds_fetched']} feeds in {r['elapsed_seconds']:.1f}s: "
+          f"{r['items_per_sec']:.0f} items/sec{change(r['items_per_sec'], base and base['items_per_sec'])}, "
+          f"peak RSS {r['peak_rss_mb']:.0f} MB{change(r['peak_rss_mb'], base and base['peak_rss_mb'])}")
+    # percentiles are bucketed, so changes are given on the mean
+    print(f"{'stage':<12} {'count':>8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'total s':>9}"
+          f"{' mean vs base' if base else ''}")
+    for name, s in r["stages"].items():
+        old = base["stages"].get(name) if base else None
+        print(f"{name:<12} {s['count']:>8} {s['p50'] * 1000:>9.3f} {s['p90'] * 1000:>9.3f} "
+              f"{s['p99'] * 1000:>9.3f} {s['max'] * 1000:>9.1f} {s['total_seconds']:>9.2f}"
+              f"{change(s['mean'], old['mean']) if old else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end multinews crawl against replayed feed fixtures")
+    parser.add_argument("--fixtures", default=FIXTURES, help="glob of recorded RSS/Atom files (.xml or .xml.gz)")
+    parser.add_argument("--feeds", type=int, default=2000)
+    parser.add_argument("--items-per-feed", type=int, default=50)
+    parser.add_argument("--shared", type=float, default=0.1,
+                        help="share of fixture items whose headline every feed carrying them repeats")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="Scrapy setting override")
+    parser.add_argument("--out-dir", default=RESULTS_DIR)
+    parser.add_argument("--compare", help="an earlier result JSON to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the crawl's work dir (output, state, log)")
+    args = parser.parse_args()
+
+    settings = dict(CRAWL_SETTINGS)
+    for pair in args.set:
+        key, _, value = pair.partition("=")
+        settings[key] = value
+
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(0, args.fixtures, args.items_per_feed, args.shared, ready),
+                                     daemon=True)
+    server.start()
+    port = ready.get(timeout=60)
+    work_dir = tempfile.mkdtemp(prefix="bench_crawl-")
+    print(f"{args.feeds} feeds x {args.items_per_feed} items from {len(glob.glob(args.fixtures))} fixtures "
+          f"on 127.0.0.1:{port}; crawling in {work_dir}")
+    try:
+        report, wall, peak = run_crawl(port, args.feeds, dict(settings, RUN_REPORT_DIR="run_reports"), work_dir)
+    finally:
+        server.terminate()
+
+    result = {
+        "run_id": datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
+        "commit": _git_commit(),
+        "config": {"feeds": args.feeds, "items_per_feed": args.items_per_feed, "shared": args.shared,
+                   "fixtures": sorted(os.path.basename(p) for p in glob.glob(args.fixtures)), "settings": settings},
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": summarize_run(report, wall, peak),
+    }
+    os.makedirs(args.out_dir, exist_ok=True)
+    path = os.path.join(args.out_dir, f"crawl-{result['run_id']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=1, sort_keys=True, default=str)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_run(result, baseline)
+    print(f"\nsaved {path}")
+    if args.keep:
+        print(f"work dir kept: {work_dir}")
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# news_sentiment/benchmarks/bench_dates.py
+#
+# Published-date normalization over a large corpus of feed date strings.
+# Compares the parsers used before, email.utils.parsedate_to_datetime (the
+# pipeline) and the RFC-822/ISO switch in feedparse, against
+# news_sentiment.dates with and without its per-feed format memo and in
+# bulk over a column. Reports items/sec, how many dates each approach read,
+# and how many it read correctly.
+#
+# The synthetic corpus renders random timestamps in the layouts real feeds
+# use (the publishers named in STYLES). --csv reads the `published` column
+# of a headlines.csv instead, which has no ground truth, so "correct" is blank.
+#
+#   cd news_sentiment
+#   python benchmarks/bench_dates.py --items 1000000
+#   python benchmarks/bench_dates.py --csv headlines.csv
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from news_sentiment.dates import DateNormalizer  # noqa: E402
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+FULL_MONTHS = ("January", "February", "March", "April", "May", "June", "July", "August", "September", "October",
+               "November", "December")
+
+
+def _rfc822(dt, zone, minutes=0, day="%02d", seconds=True):
+    local = dt + timedelta(minutes=minutes)
+    clock = f"{local:%H:%M:%S}" if seconds else f"{local:%H:%M}"
+    return f"{WEEKDAYS[local.weekday()]}, {day % local.day} {MONTHS[local.month - 1]} {local.year} {clock} {zone}"
+
+
+def _iso(dt, minutes=0, fraction=False, sep="T", zone=None):
+    local = dt + timedelta(minutes=minutes)
+    out = f"{local:%Y-%m-%d}{sep}{local:%H:%M:%S}"
+    if fraction:
+        out += f".{local.microsecond // 1000:03d}"
+    if zone is None:
+        sign = "-" if minutes < 0 else "+"
+        zone = "Z" if minutes == 0 else f"{sign}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+    return out + zone
+
+
+# (feed, share of the corpus, render(dt) -> string); layouts as these
+# publishers' RSS/Atom feeds send them
+STYLES = [
+    ("reuters", 14, lambda dt: _rfc822(dt, "GMT")),
+    ("guardian", 12, lambda dt: _rfc822(dt, "GMT")),
+    ("nytimes", 10, lambda dt: _rfc822(dt, "+0000")),
+    ("cnbc", 8, lambda dt: _rfc822(dt, "GMT")),
+    ("marketwatch", 6, lambda dt: _rfc822(dt, "-0400", -240)),
+    ("timesofindia", 4, lambda dt: _rfc822(dt, "+0530", 330)),
+    ("foxbusiness", 3, lambda dt: _rfc822(dt, "EDT", -240)),
+    ("cnn", 3, lambda dt: _rfc822(dt, "EST", -300, day="%d", seconds=False)),
+    ("verge-atom", 8, lambda dt: _iso(dt, -240)),
+    ("github-atom", 5, lambda dt: _iso(dt)),
+    ("medium-atom", 4, lambda dt: _iso(dt, fraction=True)),
+    ("wordpress-dc", 4, lambda dt: _iso(dt, 0, zone="+00:00")),
+    ("blogger-atom", 3, lambda dt: _iso(dt, 120, fraction=True)),
+    ("ft-nosecs", 3, lambda dt: f"{dt.day} {MONTHS[dt.month - 1]} {dt.year} {dt:%H:%M} GMT"),
+    ("aljazeera", 3, lambda dt: f"{WEEKDAYS[dt.weekday()]}, {dt.day:02d} {FULL_MONTHS[dt.month - 1]} {dt.year} "
+                                f"{dt:%H:%M:%S} +0000"),
+    ("rfc850", 2, lambda dt: f"{dt:%A}, {dt.day:02d}-{MONTHS[dt.month - 1]}-{dt:%y} {dt:%H:%M:%S} GMT"),
+    ("cms-space", 3, lambda dt: _iso(dt, sep=" ", zone=" +0000")),
+    ("cms-naive", 2, lambda dt: _iso(dt, sep=" ", zone="")),
+    ("asctime", 1, lambda dt: f"{WEEKDAYS[dt.weekday()]} {MONTHS[dt.month - 1]} {dt.day:2d} {dt:%H:%M:%S} {dt.year}"),
+    ("epoch", 1, lambda dt: str(int(dt.timestamp()))),
+    ("missing", 1, lambda dt: ""),
+]
+
+
+def synthetic_corpus(n, seed=0):
+    """[(feed, date string, true UTC datetime or None)] in the STYLES mix."""
+    rng = random.Random(seed)
+    feeds = [feed for feed, share, _ in STYLES for _ in range(share)]
+    render = {feed: fn for feed, _, fn in STYLES}
+    start = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    out = []
+    for _ in range(n):
+        feed = rng.choice(feeds)
+        # whole minutes, so layouts without seconds still carry the exact time
+        when = start + timedelta(minutes=rng.randrange(500 * 1440))
+        text = render[feed](when)
+        out.append((feed, text, when if text else None))
+    return out
+
+
+def csv_corpus(path, n):
+    import pandas as pd
+
+    df = pd.read_csv(path, usecols=["source", "published"], dtype=str, keep_default_na=False, nrows=n)
+    return [(source, published, None) for source, published in zip(df["source"], df["published"])]
+
+
+# --- the parsers used before ---
+
+def old_pipeline(text, feed):
+    try:
+        dt = parsedate_to_datetime(text)
+    except Exception:
+        return None
+    dt = dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def old_feedparse(text, feed):
+    text = (text or "").strip()
+    if not text:
+        return None
+    try:
+        if text[:4].isdigit():
+            dt = datetime.fromisoformat(text.replace("Z", "+00:00").replace("z", "+00:00"))
+        else:
+            dt = parsedate_to_datetime(text)
+    except (TypeError, ValueError, IndexError):
+        return None
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def run(parse, corpus):
+    start = time.perf_counter()
+    out = [parse(text, feed) for feed, text, _ in corpus]
+    return time.perf_counter() - start, out
+
+
+def score(corpus, results):
+    parsed = sum(r is not None for r in results)
+    truth = [t for _, _, t in corpus]
+    if all(t is None for t in truth):
+        return parsed, None
+    correct = sum(
+        r is not None and t is not None and abs((r - t).total_seconds()) < 1 for r, t in zip(results, truth)
+    )
+    return parsed, correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feed date normalization items/sec and coverage by parser")
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--csv", help="take date strings from a headlines.csv instead of the synthetic corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = csv_corpus(args.csv, args.items) if args.csv else synthetic_corpus(args.items, args.seed)
+    dated = sum(bool(text) for _, text, _ in corpus)
+    memo = DateNormalizer()
+
+    variants = [
+        ("parsedate (before)", old_pipeline),
+        ("feedparse (before)", old_feedparse),
+        ("dates, no memo", lambda text, feed, n=DateNormalizer(): n.normalize(text)),
+        ("dates, per-feed memo", memo.normalize),
+    ]
+    print(f"{len(corpus)} date strings ({dated} non-empty) from {len({f for f, _, _ in corpus})} feeds, "
+          f"{'from ' + args.csv if args.csv else 'synthetic'}")
+    print(f"{'parser':<22} {'items/sec':>11} {'parsed':>8} {'correct':>8} {'speedup':>8}")
+    baseline = None
+    for name, parse in variants:
+        elapsed, results = run(parse, corpus)
+        rate = len(corpus) / elapsed
+        baseline = baseline or rate
+        parsed, correct = score(corpus, results)
+        print(f"{name:<22} {rate:>11.0f} {parsed / max(dated, 1):>7.1%} "
+              f"{'' if correct is None else f'{correct / max(dated, 1):.1%}':>8} {rate / baseline:>7.2f}x")
+
+    import pandas as pd
+
+    bulk = DateNormalizer()
+    published, feeds = pd.Series([t for _, t, _ in corpus]), pd.Series([f for f, _, _ in corpus])
+    start = time.perf_counter()
+    column = bulk.normalize_column(published, feeds)
+    rate = len(corpus) / (time.perf_counter() - start)
+    parsed, correct = score(corpus, [None if ts is pd.NaT else ts.to_pydatetime() for ts in column])
+    print(f"{'dates, column':<22} {rate:>11.0f} {parsed / max(dated, 1):>7.1%} "
+          f"{'' if correct is None else f'{correct / max(dated, 1):.1%}':>8} {rate / baseline:>7.2f}x")
+
+    counters = Counter(memo.take_counters())
+    hits = counters.pop("memo_hits", 0)
+    print(f"\nper-feed memo: {len(memo.learned)} feeds learned, {hits / max(dated, 1):.1%} of dates read on the "
+          f"first try; by format: " + ", ".join(f"{k}={v}" for k, v in counters.most_common()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# news_sentiment/benchmarks/bench_feedparse.py
+#
+# Parse large RSS 2.0, RSS 1.0 (RDF) and Atom fixture feeds with the old
+# per-item CSS selector code and with feedparse.iter_entries(), and report
+# entries/sec and how many entries each one found.
+#
+#   cd news_sentiment
+#   python benchmarks/bench_feedparse.py
+#   python benchmarks/bench_feedparse.py --write-fixtures --items 2000   # regenerate data/feeds/
+
+import argparse
+import gzip
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape
+
+from scrapy.http import XmlResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_finbert_batch import load_headlines  # noqa: E402
+from news_sentiment.feedparse import iter_entries  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "feeds")
+FLAVOURS = ["rss2", "rdf", "atom"]
+
+
+# --- Fixtures ---
+
+def _entries(n, seed=0):
+    rng = random.Random(seed)
+    headlines = load_headlines(n)
+    start = datetime(2025, 10, 1, tzinfo=timezone.utc)
+    for i, title in enumerate(headlines):
+        when = start + timedelta(minutes=7 * i)
+        url = f"https://news.example.com/{when:%Y/%m/%d}/story-{i}?utm_source=rss&utm_medium=feed"
+        summary = " ".join(rng.sample(title.split() * 4, min(12, len(title.split()) * 4)))
+        yield i, escape(f"{title} ({i})"), escape(url), when, escape(summary)
+
+
+def _rss2(n):
+    out = ['<?xml version="1.0" encoding="UTF-8"?>',
+           '<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/" '
+           'xmlns:media="http://search.yahoo.com/mrss/" xmlns:atom="http://www.w3.org/2005/Atom">',
+           "<channel><title>Example Business</title><link>https://news.example.com/</link>",
+           '<atom:link href="https://news.example.com/rss.xml" rel="self" type="application/rss+xml"/>']
+    for i, title, url, when, summary in _entries(n):
+        out.append(
+            f"<item><title><![CDATA[{title}]]></title><link>{url}</link>"
+            f"<description><![CDATA[<p>{summary}</p>]]></description>"
+            f'<guid isPermaLink="false">story-{i}</guid><category>business</category>'
+            f'<media:thumbnail url="https://img.example.com/{i}.jpg" width="240" height="135"/>'
+            f"<pubDate>{format_datetime(when)}</pubDate></item>")
+    out.append("</channel></rss>")
+    return "\n".join(out)
+
+
+def _rdf(n):
+    out = ['<?xml version="1.0" encoding="UTF-8"?>',
+           '<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" '
+           'xmlns="http://purl.org/rss/1.0/" xmlns:dc="http://purl.org/dc/elements/1.1/">',
+           '<channel rdf:about="https://news.example.com/"><title>Example World</title>'
+           "<link>https://news.example.com/</link></channel>"]
+    for i, title, url, when, summary in _entries(n, seed=1):
+        out.append(
+            f'<item rdf:about="{url}"><title>{title}</title><link>{url}</link>'
+            f"<description>{summary}</description><dc:subject>world</dc:subject>"
+            f"<dc:date>{when.isoformat()}</dc:date></item>")
+    out.append("</rdf:RDF>")
+    return "\n".join(out)
+
+
+def _atom(n):
+    out = ['<?xml version="1.0" encoding="UTF-8"?>',
+           '<feed xmlns="http://www.w3.org/2005/Atom"><title>Example Technology</title>',
+           '<link href="https://news.example.com/" rel="alternate"/><id>urn:example:feed</id>']
+    for i, title, url, when, summary in _entries(n, seed=2):
+        out.append(
+            f'<entry><title type="html">{title}</title><id>urn:example:{i}</id>'
+            f'<link rel="alternate" type="text/html" href="{url}"/>'
+            f'<link rel="enclosure" href="https://img.example.com/{i}.jpg"/>'
+            f"<updated>{when.isoformat()}</updated><published>{when.isoformat()}</published>"
+            f'<summary type="html">{summary}</summary><author><name>Desk</name></author></entry>')
+    out.append("</feed>")
+    return "\n".join(out)
+
+
+def write_fixtures(n):
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for flavour, build in [("rss2", _rss2), ("rdf", _rdf), ("atom", _atom)]:
+        path = os.path.join(FIXTURE_DIR, f"{flavour}.xml.gz")
+        with gzip.GzipFile(path, "wb", mtime=0) as f:
+            f.write(build(n).encode("utf-8"))
+        print(f"wrote {path}")
+
+
+def load_fixture(flavour):
+    with gzip.open(os.path.join(FIXTURE_DIR, f"{flavour}.xml.gz"), "rb") as f:
+        return f.read()
+
+
+# --- The two parsers ---
+
+def parse_selectors(body):
+    """The CSS selector path parse_feed used before feedparse."""
+    response = XmlResponse(url="https://news.example.com/feed", body=body)
+    items = response.css("item")
+    is_atom = False
+    if not items:
+        items = response.css("entry")
+        is_atom = True
+    out = []
+    for it in items:
+        title = it.css("title::text").get() or it.css("title *::text").get()
+        if is_atom:
+            link = it.css("link::attr(href)").get() or it.css("link::text").get()
+            pub = it.css("updated::text").get() or it.css("published::text").get() or it.css("dc\\:date::text").get()
+        else:
+            link = it.css("link::text").get() or it.css("link::attr(href)").get()
+            pub = it.css("pubDate::text").get() or it.css("dc\\:date::text").get()
+        if title and link:
+            out.append((title.strip(), link.strip(), (pub or "").strip()))
+    return out
+
+
+def parse_streaming(body):
+    return [(e["title"], e["link"], e["published"]) for e in iter_entries(body)]
+
+
+def timed(fn, body, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(body)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feed parsing: CSS selectors vs. streaming lxml")
+    parser.add_argument("--write-fixtures", action="store_true")
+    parser.add_argument("--items", type=int, default=2000, help="entries per fixture feed (with --write-fixtures)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.write_fixtures:
+        write_fixtures(args.items)
+
+    print(f"{'feed':<6} {'KiB':>6} {'parser':<10} {'entries':>8} {'ms':>8} {'entries/s':>11}")
+    for flavour in FLAVOURS:
+        body = load_fixture(flavour)
+        results = {}
+        for name, fn in [("selectors", parse_selectors), ("streaming", parse_streaming)]:
+            seconds, entries = timed(fn, body, args.repeat)
+            results[name] = entries
+            rate = len(entries) / seconds if entries else 0
+            print(f"{flavour:<6} {len(body) // 1024:>6} {name:<10} {len(entries):>8} {seconds * 1000:>8.1f} {rate:>11,.0f}")
+        if results["selectors"] and results["selectors"] != results["streaming"]:
+            print(f"  ⚠️ {flavour}: parsers disagree")
+
+
+if __name__ == "__main__":
+    main()
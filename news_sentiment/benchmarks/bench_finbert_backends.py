@@ -0,0 +1,110 @@
+# news_sentiment/benchmarks/bench_finbert_backends.py
+#
+# FinBERT inference backends side by side: throughput, per-batch latency,
+# peak RSS and how closely each one agrees with the fp32 torch reference
+# (label agreement, mean/max difference in the winning label's score).
+# Every backend runs in a fresh interpreter so RSS isn't shared; the ONNX
+# export is written on first use under .state/onnx and reused after that.
+#
+#   cd news_sentiment
+#   python benchmarks/bench_finbert_backends.py --items 512 --batch-size 32
+#   python benchmarks/bench_finbert_backends.py torch onnx --threads 4
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+
+def child(backend, items, batch_size, threads):
+    from bench_finbert_batch import load_headlines
+    from news_sentiment.scoring import build_finbert
+
+    if threads and backend != "onnx":
+        import torch
+
+        torch.set_num_threads(threads)
+
+    t0 = time.perf_counter()
+    finbert = build_finbert(backend, threads=threads)
+    load = time.perf_counter() - t0
+    headlines = load_headlines(items)
+    finbert(headlines[:8])  # warm-up
+
+    latencies, outputs = [], []
+    start = time.perf_counter()
+    for i in range(0, len(headlines), batch_size):
+        chunk = headlines[i:i + batch_size]
+        t = time.perf_counter()
+        outputs += finbert(chunk, batch_size=len(chunk))
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(json.dumps({
+        "load": load,
+        "rate": len(headlines) / elapsed,
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "outputs": [(o["label"], float(o["score"])) for o in outputs],
+    }))
+
+
+def measure(backend, args):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", backend,
+           "--items", str(args.items), "--batch-size", str(args.batch_size), "--threads", str(args.threads)]
+    proc = subprocess.Popen(cmd, cwd=PROJECT_DIR, stdout=subprocess.PIPE, text=True)
+    out = proc.stdout.read()
+    _, status, usage = os.wait4(proc.pid, 0)
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise SystemExit(f"{backend}: child exited with {os.waitstatus_to_exitcode(status)}")
+    result = json.loads(out.strip().splitlines()[-1])
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    result["peak_rss_mb"] = usage.ru_maxrss * scale / 2**20
+    return result
+
+
+def agreement(reference, outputs):
+    same = sum(r[0] == o[0] for r, o in zip(reference, outputs))
+    diffs = [abs(r[1] - o[1]) for r, o in zip(reference, outputs)]
+    return same / len(reference), sum(diffs) / len(diffs), max(diffs)
+
+
+def main():
+    from news_sentiment.scoring import BACKENDS
+
+    parser = argparse.ArgumentParser(description="FinBERT backends: speed, memory and agreement with fp32")
+    parser.add_argument("backends", nargs="*", default=list(BACKENDS), help=f"any of {', '.join(BACKENDS)}")
+    parser.add_argument("--items", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads (0 = library default)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.items, args.batch_size, args.threads)
+        return
+
+    # agreement is always measured against fp32 torch
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    results = {b: measure(b, args) for b in backends}
+    reference = results["torch"]["outputs"]
+
+    print(f"FinBERT on CPU, {args.items} headlines, batch size {args.batch_size}")
+    print(f"{'backend':<11} {'load':>7} {'items/sec':>10} {'p50 batch':>10} {'p95 batch':>10} "
+          f"{'peak RSS':>9} {'labels':>7} {'mean Δ':>8} {'max Δ':>8}")
+    for backend in backends:
+        r = results[backend]
+        same, mean_diff, max_diff = agreement(reference, r["outputs"])
+        print(f"{backend:<11} {r['load']:>6.2f}s {r['rate']:>10.1f} {r['p50'] * 1000:>8.1f}ms "
+              f"{r['p95'] * 1000:>8.1f}ms {r['peak_rss_mb']:>6.0f} MB {same:>6.1%} {mean_diff:>8.4f} {max_diff:>8.4f}")
+
+
+if __name__ == "__main__":
+    main()
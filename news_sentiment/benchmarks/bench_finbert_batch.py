@@ -0,0 +1,60 @@
+# news_sentiment/benchmarks/bench_finbert_batch.py
+#
+# Compare FinBERT throughput (items/sec) at different batch sizes on CPU.
+#
+#   cd news_sentiment
+#   python benchmarks/bench_finbert_batch.py --items 512 --batch-sizes 1,8,32,64
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HEADLINES_TXT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "headlines.txt")
+
+
+def load_headlines(n):
+    with open(HEADLINES_TXT, encoding="utf-8") as f:
+        base = [line.strip() for line in f if line.strip()]
+    return [base[i % len(base)] for i in range(n)]
+
+
+def run(finbert, headlines, batch_size):
+    start = time.perf_counter()
+    for i in range(0, len(headlines), batch_size):
+        chunk = headlines[i:i + batch_size]
+        finbert(chunk, batch_size=len(chunk))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FinBERT items/sec by batch size")
+    parser.add_argument("--items", type=int, default=512)
+    parser.add_argument("--batch-sizes", default="1,8,32,64")
+    parser.add_argument("--threads", type=int, default=None, help="torch.set_num_threads")
+    args = parser.parse_args()
+
+    import torch
+    from news_sentiment.scoring import build_finbert
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    finbert = build_finbert()
+    headlines = load_headlines(args.items)
+    finbert(headlines[:8])  # warm-up
+
+    print(f"FinBERT on CPU, {args.items} headlines, torch threads = {torch.get_num_threads()}")
+    print(f"{'batch':>6} {'seconds':>9} {'items/sec':>10} {'speedup':>8}")
+    baseline = None
+    for bs in [int(b) for b in args.batch_sizes.split(",")]:
+        elapsed = run(finbert, headlines, bs)
+        rate = len(headlines) / elapsed
+        baseline = baseline or rate
+        print(f"{bs:>6} {elapsed:>9.2f} {rate:>10.1f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
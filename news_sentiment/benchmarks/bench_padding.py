@@ -0,0 +1,70 @@
+# news_sentiment/benchmarks/bench_padding.py
+#
+# FinBERT throughput with and without length bucketing. The baseline is the
+# transformers pipeline the scorer used to call (per-text tokenization, every
+# batch padded to its longest headline); the others are the bulk-tokenized
+# classifier at several FINBERT_MAX_PADDING values. Headlines are mixed with
+# longer ones (two or three joined together) so lengths vary as they do in
+# real feeds.
+#
+#   cd news_sentiment
+#   python benchmarks/bench_padding.py --items 1024 --batch-size 32 --max-padding 1,0.5,0.25,0.1
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_finbert_batch import load_headlines
+
+
+def mixed_lengths(n, seed=0):
+    rng = random.Random(seed)
+    base = load_headlines(n)
+    return [" ".join(rng.sample(base, rng.choice((1, 1, 1, 2, 3)))) for _ in range(n)]
+
+
+def run(finbert, headlines, batch_size):
+    start = time.perf_counter()
+    for i in range(0, len(headlines), batch_size):
+        chunk = headlines[i:i + batch_size]
+        finbert(chunk, batch_size=len(chunk))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FinBERT items/sec, tokens/sec and padding waste by bucketing")
+    parser.add_argument("--items", type=int, default=1024)
+    parser.add_argument("--batch-size", type=int, default=32, help="headlines per FinBERT call, as in the pipeline")
+    parser.add_argument("--max-padding", default="1,0.5,0.25,0.1")
+    parser.add_argument("--backend", default="torch")
+    args = parser.parse_args()
+
+    from transformers import pipeline
+    from news_sentiment.scoring import FINBERT_MODEL, build_finbert
+
+    headlines = mixed_lengths(args.items)
+
+    legacy = pipeline("sentiment-analysis", model=FINBERT_MODEL, tokenizer=FINBERT_MODEL, device=-1)
+    legacy(headlines[:8])  # warm-up
+    baseline = len(headlines) / run(legacy, [h[:512] for h in headlines], args.batch_size)
+
+    print(f"FinBERT ({args.backend}) on CPU, {args.items} headlines, {args.batch_size} per call")
+    print(f"{'variant':<18} {'items/sec':>10} {'tokens/sec':>11} {'padding':>8} {'passes':>7} {'speedup':>8}")
+    print(f"{'pipeline (before)':<18} {baseline:>10.1f} {'':>11} {'':>8} {'':>7} {1:>7.2f}x")
+    for max_padding in [float(p) for p in args.max_padding.split(",")]:
+        finbert = build_finbert(args.backend, max_padding=max_padding)
+        finbert(headlines[:8])
+        finbert.take_counters()
+        elapsed = run(finbert, headlines, args.batch_size)
+        c = finbert.take_counters()
+        rate = len(headlines) / elapsed
+        print(f"{f'max_padding={max_padding:g}':<18} {rate:>10.1f} {c['tokens'] / c['seconds']:>11.0f} "
+              f"{1 - c['tokens'] / c['padded_tokens']:>7.1%} {c['batches']:>7} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
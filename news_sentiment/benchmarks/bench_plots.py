@@ -0,0 +1,68 @@
+# news_sentiment/benchmarks/bench_plots.py
+#
+# Time plots.render_all() on synthetic market scatter plots: a cold render
+# in-process and in a process pool, then a warm run where nothing changed
+# and one where a single ticker's data did.
+#
+#   cd news_sentiment
+#   python benchmarks/bench_plots.py --plots 24 --workers 4
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plots import PlotJob, render_all  # noqa: E402
+
+
+def synthetic_jobs(n_plots, days, out_dir, seed=0):
+    rng = np.random.default_rng(seed)
+    jobs = []
+    for i in range(n_plots):
+        data = pd.DataFrame({
+            "avg_vader": rng.normal(0, 0.1, days),
+            "finbert_pos": rng.uniform(0, 1, days),
+            "returns": rng.normal(0, 0.01, days),
+        })
+        jobs.append(PlotJob("market_scatter", os.path.join(out_dir, f"sentiment_vs_T{i:03d}.png"),
+                            f"Sentiment vs T{i:03d} Returns", data))
+    return jobs
+
+
+def timed(jobs, workers, manifest, force=False):
+    start = time.perf_counter()
+    rendered, skipped = render_all(jobs, workers=workers, manifest_path=manifest, force=force)
+    return time.perf_counter() - start, len(rendered), len(skipped)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plot rendering time, cold vs. warm")
+    parser.add_argument("--plots", type=int, default=24)
+    parser.add_argument("--days", type=int, default=250)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = os.path.join(tmp, "plot_hashes.json")
+        jobs = synthetic_jobs(args.plots, args.days, tmp)
+
+        rows = [("cold, in-process", *timed(jobs, 1, manifest, force=True)),
+                (f"cold, {args.workers} workers", *timed(jobs, args.workers, manifest, force=True)),
+                ("warm, unchanged", *timed(jobs, args.workers, manifest))]
+        first = jobs[0]
+        jobs[0] = first._replace(data=first.data.assign(returns=first.data["returns"] * 2))
+        rows.append(("warm, 1 changed", *timed(jobs, args.workers, manifest)))
+
+    print(f"{'run':<22} {'seconds':>8} {'rendered':>9} {'skipped':>8}")
+    for name, seconds, rendered, skipped in rows:
+        print(f"{name:<22} {seconds:>8.2f} {rendered:>9} {skipped:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# news_sentiment/benchmarks/bench_query.py
+#
+# Range and group-by queries answered by news_sentiment.query from the
+# (date, source, category) sums, against the same queries over the scored
+# rows with pandas (filter, then groupby), on a synthetic history. Checks
+# the two agree and reports the time of each. Also times cold loads: the
+# sums CSV on the first query, then the cached index.
+#
+#   cd news_sentiment
+#   python benchmarks/bench_query.py --rows 2000000 --days 730 --sources 200
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from news_sentiment.aggregate import DailyAggregator, fold, summarize  # noqa: E402
+from news_sentiment.query import SentimentQuery  # noqa: E402
+
+CATEGORIES = ["business", "world", "technology", "politics", "science"]
+
+
+def synthetic_rows(n, days, n_sources, seed=0):
+    """Scored rows in the headlines.csv layout, fewer columns."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2024-01-01", tz="UTC")
+    published = start + pd.to_timedelta(rng.integers(0, days * 86400, n), unit="s")
+    # a few sources publish most of the headlines
+    weights = 1 / np.arange(1, n_sources + 1)
+    sources = rng.choice([f"source{i:03d}" for i in range(n_sources)], n, p=weights / weights.sum())
+    return pd.DataFrame({
+        "scraped_at": published.map(lambda ts: ts.isoformat()),
+        "source": sources,
+        "category": rng.choice(CATEGORIES, n),
+        "published_utc": published,
+        "vader_sentiment": rng.normal(0, 0.3, n).round(4),
+        "finbert_label": rng.choice(["positive", "negative", "neutral"], n),
+    })
+
+
+def scan(rows, dates, start, end, sources, categories, group_by):
+    """The same query over raw rows."""
+    mask = np.ones(len(rows), bool)
+    if start:
+        mask &= dates >= start
+    if end:
+        mask &= dates <= end
+    if sources is not None:
+        mask &= rows["source"].isin(sources).to_numpy()
+    if categories is not None:
+        mask &= rows["category"].isin(categories).to_numpy()
+    return summarize(fold(rows[mask]), group_by)
+
+
+def agrees(got, want, keys):
+    """Same groups and counts, and shares equal to the 4 decimals they are rounded to."""
+    want = want.reset_index(drop=True)
+    if len(got) != len(want) or not (got[keys].astype(str).values == want[keys].astype(str).values).all():
+        return False
+    values = [c for c in got.columns if c not in keys]
+    return np.allclose(got[values].to_numpy(float), want[values].to_numpy(float), atol=1.01e-4, equal_nan=True)
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-aggregate queries vs scanning the scored rows")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--sources", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows, args.days, args.sources)
+    dates = rows["published_utc"].dt.strftime("%Y-%m-%d").to_numpy()
+    with tempfile.TemporaryDirectory() as state_dir:
+        agg = DailyAggregator(state_dir)
+        start = time.perf_counter()
+        agg.add(rows)
+        agg.save()
+        folded = time.perf_counter() - start
+
+        start = time.perf_counter()
+        q = SentimentQuery(state_dir)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        SentimentQuery(state_dir)
+        cached = time.perf_counter() - start
+    print(f"{len(rows)} rows -> {len(q)} (date, source, category) sums; fold {folded:.1f}s, "
+          f"load {cold * 1000:.0f} ms from CSV, {cached * 1000:.1f} ms from the cached index")
+
+    last = str(q.dates[-1])
+    month = last[:8] + "01"
+    queries = [
+        ("all days", dict(group_by=["date"])),
+        ("month by source", dict(start=month, end=last, group_by=["source"])),
+        ("one source, all days", dict(sources=["source000"], group_by=["date"])),
+        ("5 sources, 90 days, by cat", dict(start=str(pd.Timestamp(last) - pd.Timedelta(days=89))[:10], end=last,
+                                            sources=[f"source{i:03d}" for i in range(0, 50, 10)],
+                                            group_by=["date", "category"])),
+        ("one day, every key", dict(start=last, end=last, group_by=["date", "source", "category"])),
+        ("business, this month", dict(categories=["business"], start=month, group_by=["category"])),
+    ]
+    print(f"{'query':<28} {'groups':>7} {'query ms':>9} {'scan ms':>9} {'speedup':>8} {'agree':>6}")
+    for name, kw in queries:
+        fast, got = timed(lambda: q.query(**kw), args.repeat)
+        slow, want = timed(lambda: scan(rows, dates, kw.get("start"), kw.get("end"), kw.get("sources"),
+                                        kw.get("categories"), kw["group_by"]), 1)
+        agree = agrees(got, want, kw["group_by"])
+        print(f"{name:<28} {len(got):>7} {fast * 1000:>9.2f} {slow * 1000:>9.0f} {slow / fast:>7.0f}x "
+              f"{'yes' if agree else 'NO':>6}")
+
+
+if __name__ == "__main__":
+    main()
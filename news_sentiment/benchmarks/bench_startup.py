@@ -0,0 +1,104 @@
+# news_sentiment/benchmarks/bench_startup.py
+#
+# Cold-start cost of each spider: wall time until the first request is
+# scheduled, total process wall time and peak RSS. Every spider runs in a
+# fresh interpreter and is stopped as soon as its first request is
+# scheduled, so nothing is actually fetched. Children run in a scratch
+# directory so no headlines.csv or .state/ files land in the project.
+#
+#   cd news_sentiment
+#   python benchmarks/bench_startup.py                 # all spiders
+#   python benchmarks/bench_startup.py multinews -s FINBERT_PRELOAD=False
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(spider_name, overrides):
+    t0 = time.perf_counter()
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    settings = get_project_settings()
+    settings.update(overrides, priority="cmdline")
+    settings.set("LOG_LEVEL", "ERROR")
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(spider_name)
+    marks = {"imports": time.perf_counter() - t0}
+
+    def on_request(request, spider):
+        if "first_request" not in marks:
+            marks["first_request"] = time.perf_counter() - t0
+            crawler.stop()
+
+    crawler.signals.connect(on_request, signal=signals.request_scheduled)
+    process.crawl(crawler, feeds_file=os.path.join(PROJECT_DIR, "feeds.json"))
+    process.start()
+    marks["closed"] = time.perf_counter() - t0
+    print(json.dumps(marks))
+
+
+def measure(spider_name, overrides, repeat):
+    runs = []
+    for _ in range(repeat):
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", spider_name]
+        for k, v in overrides.items():
+            cmd += ["-s", f"{k}={v}"]
+        env = {**os.environ, "SCRAPY_SETTINGS_MODULE": "news_sentiment.settings"}
+        with tempfile.TemporaryDirectory() as scratch:
+            start = time.perf_counter()
+            proc = subprocess.Popen(cmd, cwd=scratch, env=env, stdout=subprocess.PIPE, text=True)
+            out = proc.stdout.read()
+            _, status, usage = os.wait4(proc.pid, 0)
+            wall = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if proc.returncode != 0:
+            raise SystemExit(f"{spider_name}: child exited with {proc.returncode}")
+        marks = json.loads(out.strip().splitlines()[-1])
+        # ru_maxrss is in KiB on Linux, bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        runs.append({**marks, "wall": wall, "peak_rss_mb": usage.ru_maxrss * scale / 2**20})
+    return {k: min(r[k] for r in runs) for k in runs[0]}
+
+
+def list_spiders():
+    out = subprocess.run(["scrapy", "list"], cwd=PROJECT_DIR, capture_output=True, text=True, check=True)
+    return out.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spider cold-start time and peak memory")
+    parser.add_argument("spiders", nargs="*", help="defaults to every spider in `scrapy list`")
+    parser.add_argument("-s", "--set", action="append", default=[], metavar="NAME=VALUE")
+    parser.add_argument("--repeat", type=int, default=3, help="report the best of N runs")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    overrides = dict(kv.split("=", 1) for kv in args.set)
+
+    if args.child:
+        sys.path.insert(0, PROJECT_DIR)
+        child(args.child, overrides)
+        return
+
+    spiders = args.spiders
+    if not spiders:
+        start = time.perf_counter()
+        spiders = list_spiders()
+        print(f"`scrapy list`: {time.perf_counter() - start:.2f}s")
+    print(f"{'spider':<12} {'imports':>8} {'1st req':>8} {'wall':>8} {'peak RSS':>10}")
+    for name in spiders:
+        r = measure(name, overrides, args.repeat)
+        print(f"{name:<12} {r['imports']:>7.2f}s {r['first_request']:>7.2f}s "
+              f"{r['wall']:>7.2f}s {r['peak_rss_mb']:>7.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
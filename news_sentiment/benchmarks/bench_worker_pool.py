@@ -0,0 +1,60 @@
+# news_sentiment/benchmarks/bench_worker_pool.py
+#
+# FinBERT throughput (items/sec) through ScoringPool as the number of worker
+# processes grows. Total torch threads stay fixed at the core count, so the
+# speedup shows what splitting them across processes buys.
+#
+#   cd news_sentiment
+#   python benchmarks/bench_worker_pool.py --items 2048 --workers 1,2,4
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import wait
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_finbert_batch import load_headlines  # noqa: E402
+
+
+def run(pool, headlines, batch_size):
+    start = time.perf_counter()
+    futures = [pool.submit(headlines[i:i + batch_size]) for i in range(0, len(headlines), batch_size)]
+    wait(futures)
+    for f in futures:
+        f.result()
+    return time.perf_counter() - start
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="FinBERT items/sec by worker-process count")
+    parser.add_argument("--items", type=int, default=2048)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", default=",".join(str(w) for w in (1, 2, 4, 8) if w <= cores))
+    parser.add_argument("--threads-per-worker", type=int, default=0, help="0 = cores / workers")
+    parser.add_argument("--no-pin", action="store_true")
+    args = parser.parse_args()
+
+    from news_sentiment.workers import ScoringPool
+
+    headlines = load_headlines(args.items)
+    print(f"{args.items} headlines, batch size {args.batch_size}, {cores} cores")
+    print(f"{'workers':>7} {'threads':>7} {'seconds':>8} {'items/sec':>10} {'speedup':>8}")
+    baseline = None
+    for n in [int(w) for w in args.workers.split(",")]:
+        pool = ScoringPool(n, args.threads_per_worker or None, pin=not args.no_pin)
+        try:
+            wait(pool.warm_up())
+            run(pool, headlines[: n * args.batch_size], args.batch_size)  # every worker loads its model
+            elapsed = run(pool, headlines, args.batch_size)
+        finally:
+            pool.shutdown()
+        rate = len(headlines) / elapsed
+        baseline = baseline or rate
+        print(f"{n:>7} {pool.threads:>7} {elapsed:>8.2f} {rate:>10.1f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
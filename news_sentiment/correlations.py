@@ -0,0 +1,118 @@
+# news_sentiment/correlations.py
+#
+# Sentiment vs. market-return correlations for every (ticker, lag, metric)
+# at once. Returns for all tickers and lags are built as one matrix and the
+# Pearson r / p-values come out of a handful of NumPy reductions, instead
+# of a pearsonr() call on a fresh dropna() slice per combination.
+
+import numpy as np
+import pandas as pd
+from scipy.special import betainc
+
+RESULT_COLUMNS = ["Ticker", "Lag (days)", "Metric", "Correlation", "p-value", "n"]
+
+
+def lagged_returns(prices, lags):
+    """
+    Daily returns `lag` trading days ahead for every ticker and lag.
+
+    `prices` holds closes (dates x tickers, NaN where a ticker didn't trade).
+    Each ticker moves on its own trading calendar, exactly like
+    close.pct_change().shift(-lag) on that ticker's own series. Returns a
+    frame with (ticker, lag) columns, NaN on the ticker's non-trading days.
+    """
+    P = prices.to_numpy(dtype="float64")
+    traded = ~np.isnan(P)
+    # stable-sort each column's trading days to the top so "previous" and
+    # "lag days ahead" are plain row offsets
+    order = np.argsort(~traded, axis=0, kind="stable")
+    C = np.take_along_axis(P, order, axis=0)
+    R = np.full_like(C, np.nan)
+    R[1:] = C[1:] / C[:-1] - 1
+
+    blocks = []
+    for lag in lags:
+        shifted = np.full_like(R, np.nan)
+        if lag < len(R):
+            shifted[:len(R) - lag] = R[lag:]
+        back = np.empty_like(P)
+        np.put_along_axis(back, order, shifted, axis=0)
+        back[~traded] = np.nan
+        blocks.append(back)
+
+    # (lag, date, ticker) -> (date, ticker, lag): columns grouped by ticker
+    data = np.stack(blocks).transpose(1, 2, 0).reshape(len(P), -1)
+    columns = pd.MultiIndex.from_product([prices.columns, list(lags)], names=["ticker", "lag"])
+    return pd.DataFrame(data, index=prices.index, columns=columns)
+
+
+def pearson(X, Y):
+    """
+    Pearson r, two-sided p-value and n between every column of `X` (dates x
+    metrics) and every column of `Y` (dates x series), each pair using only
+    the rows where both are present (what dropna(subset=[x, y]) + pearsonr
+    does, one pair at a time). Results are (metrics x series) arrays.
+    """
+    X = np.asarray(X, dtype="float64").reshape(len(Y), -1)
+    Y = np.asarray(Y, dtype="float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # centre first so the one-pass sums below don't lose precision
+        X = X - np.nanmean(X, axis=0)
+        Y = Y - np.nanmean(Y, axis=0)
+        PX = (~np.isnan(X)).astype("float64")
+        PY = (~np.isnan(Y)).astype("float64")
+        X0 = np.nan_to_num(X)
+        Y0 = np.nan_to_num(Y)
+
+        # every pairwise-complete sum is a matrix product over the date axis
+        n = PX.T @ PY
+        sx, sxx = X0.T @ PY, (X0 * X0).T @ PY
+        sy, syy = PX.T @ Y0, PX.T @ (Y0 * Y0)
+        sxy = X0.T @ Y0
+        cov = sxy - sx * sy / n
+        var_x = sxx - sx * sx / n
+        var_y = syy - sy * sy / n
+        r = np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0)
+
+        # same t-test as scipy.stats.pearsonr, via the regularized incomplete beta
+        df = n - 2.0
+        p = betainc(df / 2, 0.5, df / (df + r * r * df / (1 - r * r)))
+    n = np.rint(n).astype("int64")
+    p = np.where(n == 2, 1.0, p)
+    p = np.where(np.isnan(r), np.nan, p)
+    return r, p, n
+
+
+def correlate(daily, returns, metrics=("avg_vader", "finbert_pos")):
+    """
+    Correlate each sentiment metric in `daily` (one row per date) with every
+    column of `returns` (from lagged_returns). Rows follow ticker order, then
+    lag, then metric; combinations with fewer than two overlapping days are
+    left out.
+    """
+    aligned = returns.reindex(pd.DatetimeIndex(daily["date"]))
+    Y = aligned.to_numpy(dtype="float64")
+    tickers = aligned.columns.get_level_values(0)
+    lags = aligned.columns.get_level_values(1)
+
+    r, p, n = pearson(daily[list(metrics)].to_numpy(dtype="float64"), Y)
+    frames = []
+    for m_idx, metric in enumerate(metrics):
+        frames.append(pd.DataFrame({
+            "Ticker": tickers, "Lag (days)": lags, "Metric": metric,
+            "Correlation": r[m_idx], "p-value": p[m_idx], "n": n[m_idx],
+            "_t": np.arange(len(tickers)), "_m": m_idx,
+        }))
+    res = pd.concat(frames, ignore_index=True)
+    res = res[res["n"] > 1].sort_values(["_t", "_m"], kind="stable")
+    return res.drop(columns=["_t", "_m"]).reset_index(drop=True)[RESULT_COLUMNS]
+
+
+def rolling_correlations(daily, returns, metric, window, min_periods=None):
+    """
+    Rolling `window`-day correlation of `metric` with every (ticker, lag)
+    column of `returns`; returns a frame indexed by date.
+    """
+    aligned = returns.reindex(pd.DatetimeIndex(daily["date"]))
+    x = pd.Series(daily[metric].to_numpy(dtype="float64"), index=aligned.index)
+    return aligned.rolling(window, min_periods=min_periods or max(3, window // 2)).corr(x)
@@ -0,0 +1,190 @@
+# news_sentiment/market_data.py
+#
+# Daily close prices for analyze_market, served from a local Parquet cache
+# (one file per ticker under market_data/). Only date ranges the cache hasn't
+# covered yet are fetched, for all tickers in one batched call. The cache can
+# be seeded from CSV files (Date,Close) for offline runs:
+#
+#   python market_data.py --seed-csv path/to/csvs
+
+import argparse
+import json
+import os
+from datetime import date, timedelta
+
+import pandas as pd
+
+
+def _file_name(ticker):
+    return ticker.replace("^", "").replace("/", "_")
+
+
+class YahooProvider:
+    """Fetches closes from Yahoo Finance, every ticker in a single yf.download call."""
+
+    def fetch(self, tickers, start, end):
+        import yfinance as yf
+
+        data = yf.download(list(tickers), start=start, end=end, progress=False, group_by="column")
+        # yf.download logs network and symbol errors instead of raising them
+        if data is None or data.empty or "Close" not in data.columns.get_level_values(0):
+            raise RuntimeError("Yahoo Finance returned no closes")
+        close = data["Close"]
+        if isinstance(close, pd.Series):
+            close = close.to_frame(tickers[0])
+        close.index = pd.to_datetime(close.index).normalize().tz_localize(None)
+        return close
+
+
+class CsvProvider:
+    """Reads <directory>/<ticker>.csv files with Date and Close columns (no network)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, tickers, start, end):
+        frames = {}
+        for ticker in tickers:
+            path = os.path.join(self.directory, f"{_file_name(ticker)}.csv")
+            if not os.path.isfile(path):
+                continue
+            df = pd.read_csv(path)
+            df.columns = [c.strip().lower() for c in df.columns]
+            col = "close" if "close" in df.columns else "adj close"
+            s = pd.Series(df[col].values, index=pd.to_datetime(df["date"]).dt.normalize(), name=ticker)
+            if start is not None:
+                s = s[s.index >= pd.Timestamp(start)]
+            if end is not None:
+                s = s[s.index < pd.Timestamp(end)]
+            frames[ticker] = s
+        return pd.DataFrame(frames)
+
+
+class CachedPriceProvider:
+    """
+    Read-through cache in front of another provider.
+
+    Each ticker's closes live in <cache_dir>/<ticker>.parquet and the date
+    range already fetched for it in coverage.json, so market holidays aren't
+    mistaken for gaps. load() asks the upstream provider only for the
+    uncovered ranges and, if that fails (e.g. no network), carries on with
+    whatever is cached. A range only counts as covered for the tickers that
+    came back with closes.
+    """
+
+    def __init__(self, upstream=None, cache_dir="market_data"):
+        self.upstream = upstream or YahooProvider()
+        self.cache_dir = cache_dir
+        self.coverage_path = os.path.join(cache_dir, "coverage.json")
+        self.coverage = {}
+        if os.path.isfile(self.coverage_path):
+            with open(self.coverage_path, encoding="utf-8") as f:
+                self.coverage = json.load(f)
+
+    def _path(self, ticker):
+        return os.path.join(self.cache_dir, f"{_file_name(ticker)}.parquet")
+
+    def _read(self, ticker):
+        path = self._path(ticker)
+        if not os.path.isfile(path):
+            return pd.Series(dtype="float64", index=pd.DatetimeIndex([]), name=ticker)
+        df = pd.read_parquet(path)
+        return pd.Series(df["close"].values, index=pd.DatetimeIndex(df["date"].values), name=ticker)
+
+    def _write(self, ticker, series):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        series = series[~series.index.duplicated(keep="last")].sort_index()
+        pd.DataFrame({"date": series.index, "close": series.values}).to_parquet(self._path(ticker), index=False)
+
+    def _missing(self, ticker, start, end):
+        """Date ranges in [start, end) not yet fetched for `ticker`."""
+        cov = self.coverage.get(_file_name(ticker))
+        if not cov:
+            return [(start, end)]
+        cov_start, cov_end = date.fromisoformat(cov[0]), date.fromisoformat(cov[1])
+        gaps = []
+        if start < cov_start:
+            gaps.append((start, cov_start))
+        if end > cov_end:
+            # start at cov_end even if `start` is later, so coverage stays one contiguous range
+            gaps.append((cov_end, end))
+        return gaps
+
+    def load(self, tickers, start, end):
+        """Closes for every ticker over [start, end): DataFrame indexed by date, one column per ticker."""
+        start, end = pd.Timestamp(start).date(), pd.Timestamp(end).date()
+        tickers = list(tickers)
+
+        # one upstream call per distinct gap, covering every ticker that has it
+        gaps = {}
+        for ticker in tickers:
+            for gap in self._missing(ticker, start, end):
+                gaps.setdefault(gap, []).append(ticker)
+
+        fetched = {}
+        for (gap_start, gap_end), gap_tickers in gaps.items():
+            try:
+                data = self.upstream.fetch(gap_tickers, gap_start, gap_end)
+            except Exception as e:
+                print(f"⚠️ Could not fetch {', '.join(gap_tickers)} for {gap_start}..{gap_end}: {e}")
+                continue
+            # today's bar may still change, so only count complete days as covered
+            covered_end = min(gap_end, date.today())
+            for ticker in gap_tickers:
+                closes = data[ticker].dropna() if ticker in data.columns else None
+                if closes is None or closes.empty:
+                    continue  # a failed ticker stays uncovered, so the next run asks again
+                fetched.setdefault(ticker, []).append(closes)
+                key = _file_name(ticker)
+                cov = self.coverage.get(key)
+                lo = min(gap_start, date.fromisoformat(cov[0])) if cov else gap_start
+                hi = max(covered_end, date.fromisoformat(cov[1])) if cov else covered_end
+                self.coverage[key] = [lo.isoformat(), hi.isoformat()]
+
+        for ticker, parts in fetched.items():
+            self._write(ticker, pd.concat([self._read(ticker)] + parts))
+        if gaps:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self.coverage_path, "w", encoding="utf-8") as f:
+                json.dump(self.coverage, f, indent=2)
+
+        lo, hi = pd.Timestamp(start), pd.Timestamp(end)
+        frames = {}
+        for ticker in tickers:
+            s = self._read(ticker)
+            frames[ticker] = s[(s.index >= lo) & (s.index < hi)]
+        return pd.DataFrame(frames)
+
+    def seed_from_csv(self, directory, tickers=None):
+        """Copy <directory>/<ticker>.csv files into the cache and mark their ranges covered."""
+        if tickers is None:
+            tickers = [os.path.splitext(f)[0] for f in os.listdir(directory) if f.endswith(".csv")]
+        data = CsvProvider(directory).fetch(tickers, None, None)
+        for ticker in data.columns:
+            s = data[ticker].dropna()
+            if s.empty:
+                continue
+            self._write(ticker, pd.concat([self._read(ticker), s]))
+            self.coverage[_file_name(ticker)] = [s.index.min().date().isoformat(), (s.index.max() + timedelta(days=1)).date().isoformat()]
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.coverage_path, "w", encoding="utf-8") as f:
+            json.dump(self.coverage, f, indent=2)
+        return list(data.columns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local market-data cache")
+    parser.add_argument("--cache-dir", default="market_data")
+    parser.add_argument("--seed-csv", metavar="DIR", help="load <DIR>/<ticker>.csv files into the cache")
+    parser.add_argument("--fetch", nargs="*", metavar="TICKER", help="fill the cache for these tickers")
+    parser.add_argument("--start", default="2025-01-01")
+    parser.add_argument("--end", default=date.today().isoformat())
+    args = parser.parse_args()
+
+    cache = CachedPriceProvider(cache_dir=args.cache_dir)
+    if args.seed_csv:
+        seeded = cache.seed_from_csv(args.seed_csv)
+        print(f"✅ Seeded {len(seeded)} tickers from {args.seed_csv}")
+    if args.fetch:
+        prices = cache.load(args.fetch, args.start, args.end)
+        print(f"✅ {len(prices)} days cached for {', '.join(prices.columns)}")
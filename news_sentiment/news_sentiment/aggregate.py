@@ -0,0 +1,250 @@
+# Incremental daily sentiment summaries.
+#
+#   python -m news_sentiment.aggregate                      # fold new rows of headlines.csv
+#   python -m news_sentiment.aggregate --parquet headlines.parquet
+#   python -m news_sentiment.aggregate --rebuild            # start over from scratch
+#
+# Writes daily_summary.csv (read by analyze_market.py) and
+# daily_category_summary.csv. Running sums per (date, source, category) and a
+# watermark are kept under .state/, so each run only reads rows appended (or
+# Parquet files written) since the previous one. With --weight cluster each near-duplicate story
+# (news_sentiment.clusters) counts once, through its representative row,
+# instead of once per outlet that ran it.
+
+import argparse
+import csv
+import glob
+import hashlib
+import io
+import json
+import os
+
+import pandas as pd
+
+from news_sentiment.clusters import cluster_id
+from news_sentiment.dates import DEFAULT as DATES
+from news_sentiment.storage import HEADER
+
+KEYS = ["date", "source", "category"]
+ROW_SUMS = ["count", "vader_sum", "vader_n", "finbert_n", "finbert_positive", "finbert_negative", "finbert_neutral"]
+# the same over cluster representatives only ("stories" is their count)
+STORY_SUMS = ["stories"] + [f"story_{name}" for name in ROW_SUMS[1:]]
+SUMS = ROW_SUMS + STORY_SUMS
+LABELS = ["positive", "negative", "neutral"]
+
+
+def parse_published(published, sources=None):
+    """Vectorized RFC-822 parse; whatever is left goes through news_sentiment.dates, per source."""
+    published = published.fillna("").astype(str).str.strip()
+    rfc822 = published.str.replace(r" (GMT|UTC|UT|Z)$", " +0000", regex=True)
+    out = pd.to_datetime(rfc822, format="%a, %d %b %Y %H:%M:%S %z", utc=True, errors="coerce")
+    rest = out.isna() & (published != "")
+    if rest.any():
+        out[rest] = DATES.normalize_column(published[rest], None if sources is None else sources[rest])
+    return out
+
+
+def fold(rows):
+    """Reduce scored rows to additive sums per (date, source, category)."""
+    if rows.empty:
+        return pd.DataFrame(columns=KEYS + SUMS)
+
+    if "published_utc" in rows:
+        when = pd.to_datetime(rows["published_utc"], utc=True, errors="coerce", format="ISO8601")
+    else:
+        when = parse_published(rows["published"], rows["source"])
+    scraped = pd.to_datetime(rows["scraped_at"], utc=True, errors="coerce", format="ISO8601")
+    # rows written by other SENTIMENT_SCORERS may lack either column; they
+    # still count, with no VADER mean or FinBERT shares
+    vader = pd.to_numeric(rows.get("vader_sentiment", pd.Series(index=rows.index, dtype=float)), errors="coerce")
+    label = rows.get("finbert_label", pd.Series("", index=rows.index)).astype(object).fillna("").astype(str).str.lower()
+
+    frame = pd.DataFrame({
+        "date": when.fillna(scraped).dt.strftime("%Y-%m-%d"),
+        "source": rows["source"].astype(object).fillna(""),
+        "category": rows["category"].astype(object).fillna(""),
+        "count": 1,
+        "vader_sum": vader.fillna(0.0),
+        "vader_n": vader.notna().astype(int),
+        "finbert_n": label.isin(LABELS).astype(int),
+    })
+    for name in LABELS:
+        frame[f"finbert_{name}"] = (label == name).astype(int)
+
+    # a row stands for its story if it started its cluster (or is unclustered)
+    if "cluster_id" in rows:
+        cid = rows["cluster_id"].astype(object).fillna("").astype(str)
+        flag = rows.get("is_representative", pd.Series("", index=rows.index))
+        flag = flag.astype(object).fillna("").astype(str).str.lower()
+        # rows written before the flag: the one whose own headline hash names the cluster
+        # (a verbatim copy from another outlet hashes the same, so it counts again)
+        own = rows["headline"].astype(object).fillna("").map(cluster_id)
+        story = ((cid == "") | flag.isin(["true", "1"]) | ((flag == "") & (cid == own))).astype(int)
+    else:
+        story = 1
+    frame["stories"] = story
+    for name in ROW_SUMS[1:]:
+        frame[f"story_{name}"] = frame[name] * story
+    frame = frame.dropna(subset=["date"])
+    return frame.groupby(KEYS, as_index=False, observed=True)[SUMS].sum()
+
+
+def summarize(sums, keys, weight="row"):
+    """Turn sums into the means/shares analyze_market expects, grouped by `keys`."""
+    return derive(sums.groupby(keys, as_index=False)[SUMS].sum().sort_values(keys), keys, weight)
+
+
+def derive(g, keys, weight="row"):
+    """The means/shares of sums already grouped by `keys`, one row per group."""
+    if weight == "cluster":
+        g = g[keys].join(g[STORY_SUMS].set_axis(ROW_SUMS, axis=1))
+    out = g[keys].copy()
+    out["count"] = g["count"]
+    out["avg_vader"] = (g["vader_sum"] / g["vader_n"].where(g["vader_n"] > 0)).round(4)
+    for name, short in [("positive", "pos"), ("negative", "neg"), ("neutral", "neu")]:
+        out[f"finbert_{short}"] = (g[f"finbert_{name}"] / g["finbert_n"].where(g["finbert_n"] > 0)).round(4)
+    return out
+
+
+class DailyAggregator:
+    """Running (date, source, category) sums plus a watermark of what's been folded in."""
+
+    def __init__(self, state_dir=".state"):
+        self.state_dir = state_dir
+        self.sums_path = os.path.join(state_dir, "daily_sums.csv")
+        self.watermark_path = os.path.join(state_dir, "aggregate_watermark.json")
+        self.watermark = {}
+        self.sums = pd.DataFrame(columns=KEYS + SUMS)
+        if os.path.isfile(self.watermark_path) and os.path.isfile(self.sums_path):
+            with open(self.watermark_path, encoding="utf-8") as f:
+                self.watermark = json.load(f)
+            self.sums = pd.read_csv(self.sums_path, dtype={"date": str, "source": str, "category": str},
+                                    keep_default_na=False)
+            if not set(STORY_SUMS) <= set(self.sums.columns):
+                # folded before story sums existed; --rebuild to count stories in the old rows
+                for name, row_name in zip(STORY_SUMS, ROW_SUMS):
+                    self.sums[name] = self.sums[row_name]
+
+    def reset(self):
+        self.watermark = {}
+        self.sums = pd.DataFrame(columns=KEYS + SUMS)
+
+    def add(self, rows):
+        new = fold(rows)
+        if not new.empty:
+            merged = new if self.sums.empty else pd.concat([self.sums, new], ignore_index=True)
+            self.sums = merged.groupby(KEYS, as_index=False)[SUMS].sum()
+        return len(rows)
+
+    def update_from_csv(self, path="headlines.csv"):
+        """Fold in rows appended to `path` since the last run (the whole file on the first)."""
+        size = os.path.getsize(path)
+        wm = self.watermark if self.watermark.get("csv") == os.path.abspath(path) else {}
+        offset = wm.get("offset", 0)
+        with open(path, "rb") as f:
+            # the file is append-only; if the bytes before our offset changed
+            # it was rewritten and everything has to be folded again
+            if offset and (size < offset or _tail_digest(f, offset) != wm.get("tail")):
+                self.reset()
+                offset = 0
+            f.seek(offset)
+            data = f.read()
+
+        end = data.rfind(b"\n") + 1  # leave a half-written last row for next time
+        data = data[:end]
+        if offset == 0:
+            rows = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False)
+        else:
+            rows = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, header=None,
+                               names=_csv_header(path))
+        n = self.add(rows)
+
+        offset += end
+        with open(path, "rb") as f:
+            self.watermark = {"csv": os.path.abspath(path), "offset": offset, "tail": _tail_digest(f, offset)}
+        return n
+
+    def update_from_parquet(self, root="headlines.parquet"):
+        """
+        Fold in the dataset's files that no earlier run folded. Each file is
+        written once and then left alone, so a file is either folded whole or
+        not yet, whatever order its rows were scraped in; one still being
+        written (no footer yet) waits for the next run.
+        """
+        import pyarrow.parquet as pq
+
+        wm = self.watermark if self.watermark.get("parquet") == os.path.abspath(root) else {}
+        folded = set(wm.get("files", []))
+        # watermarks from before files were tracked held the newest scraped_at folded
+        since = pd.Timestamp(wm["scraped_at"]) if wm.get("scraped_at") else None
+        columns = ["scraped_at", "source", "category", "published_utc", "vader_sentiment", "finbert_label",
+                   "headline", "cluster_id", "is_representative"]
+        frames = []
+        for path in sorted(glob.glob(os.path.join(root, "**", "*.parquet"), recursive=True)):
+            name = os.path.relpath(path, root)
+            if name in folded:
+                continue
+            try:
+                stored = pq.read_schema(path).names
+            except Exception:
+                continue
+            table = pq.read_table(path, columns=[c for c in columns if c in stored])
+            rows = table.to_pandas()
+            if since is not None:
+                rows = rows[rows["scraped_at"] > since]
+            frames.append(rows)
+            folded.add(name)
+        n = self.add(pd.concat(frames, ignore_index=True)) if frames else 0
+        self.watermark = {"parquet": os.path.abspath(root), "files": sorted(folded)}
+        return n
+
+    def save(self):
+        os.makedirs(self.state_dir, exist_ok=True)
+        self.sums.to_csv(self.sums_path, index=False)
+        with open(self.watermark_path, "w", encoding="utf-8") as f:
+            json.dump(self.watermark, f)
+
+    def write_summaries(self, out_dir=".", weight="row"):
+        daily = summarize(self.sums, ["date"], weight)
+        by_category = summarize(self.sums, ["date", "category"], weight)
+        daily.to_csv(os.path.join(out_dir, "daily_summary.csv"), index=False)
+        by_category.to_csv(os.path.join(out_dir, "daily_category_summary.csv"), index=False)
+        return daily, by_category
+
+
+def _csv_header(path):
+    # the columns depend on the scorers that wrote the file (SENTIMENT_SCORERS)
+    with open(path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), HEADER)
+
+
+def _tail_digest(f, offset, size=4096):
+    f.seek(max(0, offset - size))
+    return hashlib.blake2b(f.read(min(size, offset)), digest_size=16).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build daily sentiment summaries incrementally")
+    parser.add_argument("--csv", default="headlines.csv", help="scored headlines CSV (default)")
+    parser.add_argument("--parquet", help="read a Parquet dataset instead of the CSV")
+    parser.add_argument("--state-dir", default=".state")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--rebuild", action="store_true", help="ignore the watermark and rescan everything")
+    parser.add_argument("--weight", choices=["row", "cluster"], default="row",
+                        help="count every row (default) or each near-duplicate story once")
+    args = parser.parse_args()
+
+    agg = DailyAggregator(args.state_dir)
+    if args.rebuild:
+        agg.reset()
+    if args.parquet:
+        n = agg.update_from_parquet(args.parquet)
+    else:
+        n = agg.update_from_csv(args.csv)
+    agg.save()
+    daily, by_category = agg.write_summaries(args.out_dir, args.weight)
+    print(f"✅ Folded in {n} new rows; {len(daily)} days, {len(by_category)} day×category rows")
+
+
+if __name__ == "__main__":
+    main()
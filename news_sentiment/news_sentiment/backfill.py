@@ -0,0 +1,374 @@
+# Rescore stored headlines with the currently configured scorers.
+#
+#   python -m news_sentiment.backfill                          # headlines.csv -> backfills/<version>/headlines.csv
+#   python -m news_sentiment.backfill --parquet headlines.parquet --format parquet --workers 2
+#   python -m news_sentiment.backfill --restart                # throw away a half-done run and start over
+#
+# The input is streamed --chunk-size rows at a time, so memory stays flat
+# however long the history is. Each chunk goes through PUBLISHED_CUTOFF and
+# every scorer in SENTIMENT_SCORERS (expensive ones in FINBERT_BATCH_SIZE
+# batches, spread over FINBERT_WORKERS processes unless --workers says
+# otherwise) and is appended to backfills/<version>/. The version is derived
+# from the scorers, cutoff, input and format unless --version names it. After every chunk the
+# output is flushed and backfills/<version>/manifest.json records how far the
+# input has been read, so rerunning the same command after an interruption
+# carries on from the last chunk.
+
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from news_sentiment.dates import DEFAULT as DATES
+from news_sentiment.pipelines import parse_cutoff
+from news_sentiment.scorers import NA, load_scorers, score_columns, scorer_specs, scorers_identity, skip_verdict
+from news_sentiment.storage import HEADER, ROW_COLUMNS, open_storage
+
+CHUNK_SIZE = 50_000
+
+
+def default_version(identity, cutoff, source, fmt):
+    digest = hashlib.blake2b(f"{identity}|{cutoff}|{source}|{fmt}".encode(), digest_size=4).hexdigest()
+    return f"v-{digest}"
+
+
+def iter_csv(path, position=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield (rows, position) per chunk of a headlines CSV; position is the byte
+    offset after it, always at the end of a record.
+    """
+    with open(path, "rb") as f:
+        header_line = f.readline()
+        header = pd.read_csv(io.BytesIO(header_line), nrows=0).columns.tolist() if header_line.strip() else HEADER
+        offset = position["offset"] if position else f.tell()
+        f.seek(offset)
+        chunk, count = [], 0
+        record, quotes = [], 0
+        for line in f:
+            record.append(line)
+            quotes += line.count(b'"')
+            # a headline can hold newlines, so a record only ends at one outside quotes
+            # (csv.writer doubles quotes inside a field, which keeps the count even)
+            if quotes % 2 or not line.endswith(b"\n"):
+                continue
+            chunk += record
+            offset += sum(map(len, record))
+            record, quotes = [], 0
+            count += 1
+            if count == chunk_size:
+                yield _read_records(chunk, header), {"offset": offset}
+                chunk, count = [], 0
+        if chunk:
+            yield _read_records(chunk, header), {"offset": offset}
+        # anything left in `record` is a half-written last row, left for the next run
+
+
+def _read_records(lines, header):
+    rows = pd.read_csv(io.BytesIO(b"".join(lines)), dtype=str, keep_default_na=False, header=None, names=header)
+    return rows.to_dict("records")
+
+
+def iter_parquet(root, position=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield (rows, position) per chunk of a Parquet dataset, reading its files
+    in path order; position is (file index, rows into that file) after the chunk.
+    """
+    import pyarrow.parquet as pq
+
+    files = sorted(glob.glob(os.path.join(root, "**", "*.parquet"), recursive=True))
+    start_file, start_row = (position["file"], position["row"]) if position else (0, 0)
+    rows = []
+    for index in range(start_file, len(files)):
+        pf = pq.ParquetFile(files[index])
+        columns = [c for c in ROW_COLUMNS if c in pf.schema_arrow.names]
+        done = start_row if index == start_file else 0
+        skip = done
+        for batch in pf.iter_batches(batch_size=chunk_size, columns=columns):
+            if skip >= batch.num_rows:
+                skip -= batch.num_rows
+                continue
+            if skip:
+                batch, skip = batch.slice(skip), 0
+            for row in batch.to_pylist():
+                rows.append(row)
+                done += 1
+                if len(rows) >= chunk_size:
+                    yield rows, {"file": index, "row": done}
+                    rows = []
+    if rows:
+        yield rows, {"file": len(files), "row": 0}
+
+
+class Backfill:
+    """One versioned rescoring run: its output, its manifest and the scorers doing the work."""
+
+    def __init__(self, out_dir, scorers, cutoff=None, fmt="csv", batch_size=32, workers=0, worker_threads=None,
+                 worker_pin=True, row_group_size=10_000):
+        self.out_dir = out_dir
+        self.scorers = scorers
+        self.cheap = [s for s in scorers if not s.expensive]
+        self.expensive = [s for s in scorers if s.expensive]
+        self.by_name = {s.name: s for s in scorers}
+        self.columns = score_columns(scorers)
+        self.cutoff = cutoff
+        self.format = fmt
+        self.batch_size = max(1, int(batch_size))
+        self.workers = workers
+        self.worker_threads = worker_threads
+        self.worker_pin = worker_pin
+        self.row_group_size = row_group_size
+        self.manifest_path = os.path.join(out_dir, "manifest.json")
+        self.manifest = None
+        self.storage = None
+        self.pool = None
+
+    def load(self, source, restart=False):
+        """Read (or start) the manifest; False if this version is already complete."""
+        identity = scorers_identity(self.scorers)
+        manifest = None
+        if os.path.isfile(self.manifest_path) and not restart:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest["scorers"] != identity or manifest["source"] != source or manifest["format"] != self.format:
+                raise ValueError(
+                    f"{self.out_dir} was made from {manifest['source']} with scorers {manifest['scorers']!r} "
+                    f"as {manifest['format']}; pick another --version or pass --restart"
+                )
+            if manifest["done"]:
+                self.manifest = manifest
+                return False
+        if manifest is None:
+            self._discard_output()
+            manifest = {
+                "version": os.path.basename(os.path.normpath(self.out_dir)),
+                "source": source,
+                "format": self.format,
+                "scorers": identity,
+                "columns": self.columns,
+                "cutoff": self.cutoff.isoformat() if self.cutoff else None,
+                "started": datetime.now(timezone.utc).isoformat(),
+                "updated": None,
+                "done": False,
+                "position": None,
+                "rows_read": 0,
+                "rows_written": 0,
+                "rows_before_cutoff": 0,
+                "skipped": {},
+                "failed": {},
+                "output_bytes": 0,
+                "files": [],
+            }
+            self.manifest = manifest
+            self.save()
+        self.manifest = manifest
+        self._truncate_output()
+        return True
+
+    @property
+    def output_path(self):
+        return os.path.join(self.out_dir, "headlines.csv" if self.format == "csv" else "headlines.parquet")
+
+    def _discard_output(self):
+        if os.path.isfile(self.output_path):
+            os.remove(self.output_path)
+        for path in glob.glob(os.path.join(self.output_path, "**", "*.parquet"), recursive=True):
+            os.remove(path)
+
+    def _truncate_output(self):
+        """Drop whatever was written after the last checkpoint (an interrupted chunk)."""
+        if self.format == "csv":
+            if os.path.isfile(self.output_path):
+                with open(self.output_path, "r+b") as f:
+                    f.truncate(self.manifest["output_bytes"])
+            return
+        kept = set(self.manifest["files"])
+        for path in glob.glob(os.path.join(self.output_path, "**", "*.parquet"), recursive=True):
+            if os.path.relpath(path, self.output_path) not in kept:
+                os.remove(path)
+
+    def open(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        if self.format == "csv":
+            self.storage = open_storage("csv", path=self.output_path, score_columns=self.columns)
+        else:
+            self.storage = open_storage("parquet", root=self.output_path, row_group_size=self.row_group_size,
+                                        score_columns=self.columns)
+        if self.expensive and self.workers > 0:
+            from news_sentiment.workers import ScoringPool
+
+            self.pool = ScoringPool(self.workers, self.worker_threads, self.worker_pin, scorers=self.expensive)
+        else:
+            for scorer in self.expensive:
+                scorer.open(self.worker_threads)
+
+    def close(self):
+        if self.storage is not None:
+            self.storage.close()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def prepare(self, records):
+        """Stored records -> output rows, without the ones before the cutoff."""
+        rows = []
+        for record in records:
+            published = record.get("published") or ""
+            published_dt = record.get("published_utc")
+            if not isinstance(published_dt, datetime):
+                # CSV history: a normalized ISO string, or nothing if written before the column existed
+                published_dt = DATES.normalize(published_dt or published, record.get("source"))
+            if self.cutoff and published_dt and published_dt < self.cutoff:
+                self.manifest["rows_before_cutoff"] += 1
+                continue
+            scraped_at = record.get("scraped_at")
+            rows.append({
+                "scraped_at": scraped_at.isoformat() if isinstance(scraped_at, datetime) else scraped_at,
+                "headline": (record.get("headline") or "").strip(),
+                "source": record.get("source"),
+                "category": record.get("category"),
+                "url": record.get("url"),
+                "published": published,
+                "published_utc": published_dt,
+                "cluster_id": record.get("cluster_id") or None,
+                "is_representative": record.get("is_representative"),
+            })
+        return rows
+
+    def score(self, rows, warn=print):
+        for scorer in self.cheap:
+            for row, columns in zip(rows, scorer.score([row["headline"] for row in rows], warn=warn)):
+                row.update(columns)
+
+        for scorer in self.expensive:
+            todo = []
+            for row in rows:
+                verdict = skip_verdict(scorer, row, self.by_name)
+                if verdict is None:
+                    todo.append(row)
+                else:
+                    row.update(scorer.substitute(verdict[0]))
+            skipped = self.manifest["skipped"]
+            skipped[scorer.name] = skipped.get(scorer.name, 0) + len(rows) - len(todo)
+
+            batches = [todo[i:i + self.batch_size] for i in range(0, len(todo), self.batch_size)]
+            if self.pool is not None:
+                # submit the whole chunk up front so every worker stays busy
+                futures = [self.pool.submit([row["headline"] for row in batch], scorer.name) for batch in batches]
+                for batch, future in zip(batches, futures):
+                    try:
+                        results, warnings, _ = future.result()
+                    except Exception as e:
+                        warn(f"{scorer.name} worker failed on a batch of {len(batch)}: {e}")
+                        results, warnings = [dict.fromkeys(scorer.columns, NA)] * len(batch), []
+                        self._count_failed(scorer, len(batch))
+                    for w in warnings:
+                        warn(w)
+                    for row, columns in zip(batch, results):
+                        row.update(columns)
+            else:
+                for batch in batches:
+                    results = scorer.score([row["headline"] for row in batch], warn=warn)
+                    scorer.take_counters()
+                    for row, columns in zip(batch, results):
+                        row.update(columns)
+        return rows
+
+    def _count_failed(self, scorer, n):
+        failed = self.manifest["failed"]
+        failed[scorer.name] = failed.get(scorer.name, 0) + n
+
+    def checkpoint(self, position, read, written):
+        """Make the chunk just written durable, then record that the input got this far."""
+        self.storage.checkpoint()
+        if self.format == "csv":
+            os.fsync(self.storage.file.fileno())
+            self.manifest["output_bytes"] = os.path.getsize(self.output_path)
+        else:
+            self.manifest["files"] = sorted(
+                set(self.manifest["files"]) | {os.path.relpath(p, self.output_path) for p in self.storage.files}
+            )
+        self.manifest["position"] = position
+        self.manifest["rows_read"] += read
+        self.manifest["rows_written"] += written
+        self.save()
+
+    def finish(self):
+        self.manifest["done"] = True
+        self.save()
+
+    def save(self):
+        self.manifest["updated"] = datetime.now(timezone.utc).isoformat()
+        os.makedirs(self.out_dir, exist_ok=True)
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1, default=str)
+        os.replace(tmp, self.manifest_path)
+
+
+def main():
+    from scrapy.utils.project import get_project_settings
+
+    settings = get_project_settings()
+    parser = argparse.ArgumentParser(description="Rescore stored headlines with the configured sentiment scorers")
+    parser.add_argument("--csv", default="headlines.csv", help="scored headlines CSV to rescore (default)")
+    parser.add_argument("--parquet", help="rescore a Parquet dataset instead of the CSV")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="output format (default: same as the input)")
+    parser.add_argument("--out-dir", default="backfills")
+    parser.add_argument("--version", help="name of the output version (default: derived from scorers and cutoff)")
+    parser.add_argument("--cutoff", default=settings.get("PUBLISHED_CUTOFF"),
+                        help="drop rows published before this date (default: PUBLISHED_CUTOFF; 'none' keeps all)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows read and checkpointed at a time")
+    parser.add_argument("--batch-size", type=int, default=settings.getint("FINBERT_BATCH_SIZE", 32))
+    parser.add_argument("--workers", type=int, default=settings.getint("FINBERT_WORKERS", 0),
+                        help="scoring worker processes (0 scores in this process)")
+    parser.add_argument("--restart", action="store_true", help="discard this version's output and start over")
+    args = parser.parse_args()
+
+    scorers = load_scorers(scorer_specs(settings), settings)
+    cutoff = None if str(args.cutoff).lower() == "none" else parse_cutoff(args.cutoff)
+    source = os.path.abspath(args.parquet or args.csv)
+    fmt = args.format or ("parquet" if args.parquet else "csv")
+    version = args.version or default_version(scorers_identity(scorers), cutoff, source, fmt)
+    out_dir = os.path.join(args.out_dir, version)
+
+    backfill = Backfill(
+        out_dir, scorers, cutoff=cutoff, fmt=fmt, batch_size=args.batch_size, workers=args.workers,
+        worker_threads=settings.getint("FINBERT_WORKER_THREADS") or None,
+        worker_pin=settings.getbool("FINBERT_WORKER_PIN", True),
+        row_group_size=settings.getint("PARQUET_ROW_GROUP_SIZE", 10_000),
+    )
+    if not backfill.load(source, restart=args.restart):
+        print(f"✅ {out_dir} is already complete ({backfill.manifest['rows_written']} rows); --restart to redo it")
+        return
+    position = backfill.manifest["position"]
+    if position:
+        print(f"Resuming {version} after {backfill.manifest['rows_read']} rows")
+
+    chunks = (iter_parquet(args.parquet, position, args.chunk_size) if args.parquet
+              else iter_csv(args.csv, position, args.chunk_size))
+    backfill.open()
+    started = time.perf_counter()
+    read = 0
+    try:
+        for records, position in chunks:
+            rows = backfill.score(backfill.prepare(records))
+            backfill.storage.write(rows)
+            backfill.checkpoint(position, len(records), len(rows))
+            read += len(records)
+            rate = read / max(time.perf_counter() - started, 1e-9)
+            print(f"  {backfill.manifest['rows_read']} rows read, {backfill.manifest['rows_written']} written "
+                  f"({rate:.0f} rows/s)")
+    finally:
+        backfill.close()
+    backfill.finish()
+    print(f"✅ Backfilled {backfill.manifest['rows_written']} rows into {backfill.output_path} "
+          f"({backfill.manifest['rows_before_cutoff']} before the cutoff dropped)")
+
+
+if __name__ == "__main__":
+    main()
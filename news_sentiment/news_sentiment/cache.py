@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_headline(headline):
+    # Unicode + whitespace only: VADER reads CAPS as emphasis, so case stays.
+    return _WS.sub(" ", unicodedata.normalize("NFKC", headline or "")).strip()
+
+
+def headline_key(headline):
+    return hashlib.blake2b(normalize_headline(headline).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def resolve_model_id(model, revision="main"):
+    """
+    Identify the FinBERT weights without loading them.
+
+    Uses the commit hash that huggingface_hub recorded for `revision` in the
+    local model cache, so a re-downloaded model gets a new id. Falls back to
+    "<model>@<revision>" when the model hasn't been downloaded yet.
+    """
+    try:
+        from huggingface_hub.constants import HF_HUB_CACHE
+        ref = os.path.join(HF_HUB_CACHE, "models--" + model.replace("/", "--"), "refs", revision)
+        with open(ref, encoding="utf-8") as f:
+            return f"{model}@{f.read().strip()}"
+    except Exception:
+        return f"{model}@{revision}"
+
+
+class SentimentCache:
+    """
+    On-disk cache of every scorer's columns per headline.
+
+    Rows are keyed by the normalized-headline hash and tagged with the model
+    id (the configured scorers, see news_sentiment.scorers.scorers_identity);
+    opening the cache with a different model id drops every row. Once the
+    table grows past `max_entries`, the least recently used rows go.
+    """
+
+    def __init__(self, path, model_id, max_entries=200_000):
+        self.path = path
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+
+        row = self.db.execute("SELECT v FROM meta WHERE k = 'model_id'").fetchone()
+        if row is None or row[0] != model_id:
+            # the columns may have changed with the scorers, so start the table over
+            self.db.execute("DROP TABLE IF EXISTS scores")
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('model_id', ?)", (model_id,))
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " key TEXT PRIMARY KEY,"
+            " columns TEXT,"
+            " last_used REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)")
+        self.db.commit()
+
+    def get(self, headline):
+        key = headline_key(headline)
+        row = self.db.execute("SELECT columns FROM scores WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.db.execute("UPDATE scores SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put_many(self, entries):
+        """entries: iterable of (headline, {column: value})."""
+        now = time.time()
+        self.db.executemany(
+            "INSERT OR REPLACE INTO scores VALUES (?, ?, ?)",
+            [(headline_key(h), json.dumps(columns), now) for h, columns in entries],
+        )
+        self.db.commit()
+
+    def evict(self):
+        (count,) = self.db.execute("SELECT COUNT(*) FROM scores").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self.db.execute(
+                "DELETE FROM scores WHERE key IN "
+                "(SELECT key FROM scores ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+        return max(excess, 0)
+
+    def checkpoint(self):
+        """Evict down to max_entries and commit (LRU touches from get() included); returns the rows evicted."""
+        evicted = self.evict()
+        self.db.commit()
+        return evicted
+
+    def close(self):
+        evicted = self.checkpoint()
+        self.db.close()
+        return evicted
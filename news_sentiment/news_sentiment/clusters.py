@@ -0,0 +1,289 @@
+"""
+Streaming near-duplicate clustering of headlines across sources.
+
+The same story arrives from several outlets with slightly different
+wording. Each headline gets a MinHash signature over the byte shingles of
+its casefolded, punctuation-free text. The signature is split into LSH
+bands, and any earlier story sharing a band is a candidate. A candidate
+whose signature agrees on at least `threshold` of its values (the estimated
+Jaccard similarity), and that has the same numbers in it, is the same story
+("Fed raises rates 25bp" and "... 50bp" are not); wire-service slugs such
+as "UPDATE 2-" are left out of both. The headline then joins that story's
+cluster, whose id is the headline hash of its first member (the
+representative), and can reuse the scores remembered for it.
+
+The index is bounded and lives in preallocated numpy arrays: at most
+`max_entries` representatives, their signatures and band keys, and an
+open-addressing table from band key to representative. Stories not matched
+for `window_hours` are dropped, and when the index is full the least
+recently matched 1% are evicted at once. Each table row counts the entries
+that probed past it, so dropping a story empties its cells on the spot and
+the table never needs rebuilding. The index is saved to
+CLUSTER_INDEX_PATH so stories carry across runs.
+"""
+
+import json
+import os
+import re
+from zlib import crc32
+
+import numpy as np
+
+from news_sentiment.dedup import headline_hash
+
+ROW_CELLS = 8  # table cells: 0 empty, slot + 1 taken
+EVICT_SHARE = 0.01
+_FIBONACCI = np.uint64(0x9E3779B97F4A7C15)
+_NON_WORD = re.compile(r"[\W_]+")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+# wire-service slugs that don't change the story: "UPDATE 2-", "REFILE-", "CORRECTED:"
+_SLUG = re.compile(r"^\W*(?:update|refile|corrected|rpt|wrapup|exclusive|breaking)\b\s*\d*\s*[-:|]+\s*", re.I)
+
+
+def cluster_id(headline):
+    """The id of the cluster `headline` represents: its headline hash, in hex."""
+    return f"{headline_hash(headline):016x}"
+
+
+def story_text(headline):
+    """`headline` without a leading wire-service slug."""
+    return _SLUG.sub("", headline or "")
+
+
+def numbers_hash(headline):
+    """crc32 of the numbers in `headline`, in order; near-duplicates must agree on it."""
+    return crc32(" ".join(_NUMBER.findall(story_text(headline))).encode("ascii"))
+
+
+class ClusterIndex:
+    def __init__(self, path=None, threshold=0.7, num_perm=64, bands=16, shingle=4, max_entries=100_000,
+                 window_hours=48.0, columns=(), identity="", seed=1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.path = path
+        self.threshold = threshold
+        self.params = {"num_perm": num_perm, "bands": bands, "shingle": shingle, "seed": seed}
+        self.shingle = shingle
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.window = window_hours * 3600 if window_hours else None
+        self.columns = tuple(columns)
+        self.identity = identity
+
+        rng = np.random.default_rng(seed)
+        # multiply-shift hashing of 32-bit shingles: h(x) = ((a*x + b) mod 2**64) >> 32
+        self.a = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+        # folds a band's values into one 64-bit key, salted per band
+        self.mult = rng.integers(1, 1 << 63, self.rows, dtype=np.uint64) | np.uint64(1)
+        self.salt = rng.integers(0, 1 << 63, bands, dtype=np.uint64)
+
+        # one row per representative ("slot"); np.zeros pages cost nothing until used
+        self.capacity = max_entries
+        self.sigs = np.zeros((max_entries, num_perm), np.uint32)
+        self.keys = np.zeros((max_entries, bands), np.uint64)
+        self.numbers = np.zeros(max_entries, np.uint32)
+        self.hashes = np.zeros(max_entries, np.uint64)  # the representative's headline hash
+        self.seen = np.full(max_entries, np.inf)  # last matched; inf for free slots
+        self.scores = [None] * max_entries  # score values in `columns` order
+        self.top = 0  # slots at or above top were never used
+        self.free = []
+        self.live = 0
+        # band key -> slot: rows of ROW_CELLS cells probed in order from a
+        # key's home row, at most half full of live entries; overflow[r] is
+        # how many entries found row r full and went on, so a lookup stops
+        # at the first row with none
+        n_rows = 1 << max(1, (2 * max_entries * bands // ROW_CELLS - 1).bit_length())
+        self.table = np.zeros((n_rows, ROW_CELLS), np.int32)
+        self.overflow = np.zeros(n_rows, np.int32)
+        self.mask = n_rows - 1
+        self.shift = np.uint64(64 - (n_rows.bit_length() - 1))
+        self.swept = None
+        self.counters = {}
+        if path and os.path.isfile(path):
+            self._load()
+
+    def __len__(self):
+        return self.live
+
+    def _count(self, key, n=1):
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def signature(self, headline):
+        text = _NON_WORD.sub(" ", story_text(headline).casefold()).strip()
+        if not text:
+            return None
+        k = self.shingle
+        data = np.frombuffer(text.encode("utf-8").ljust(k), np.uint8).astype(np.uint64)
+        # each k-byte window as one integer; repeats don't change a minimum, so no set
+        n = len(data) - k + 1
+        grams = data[:n].copy()
+        for i in range(1, k):
+            grams = (grams << np.uint64(8)) | data[i:n + i]
+        if k > 4:
+            grams = (grams * _FIBONACCI) >> np.uint64(32)
+        return ((grams[:, None] * self.a + self.b) >> np.uint64(32)).min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, sigs):
+        bands = sigs.reshape(*sigs.shape[:-1], self.bands, self.rows).astype(np.uint64)
+        return (bands * self.mult).sum(axis=-1) ^ self.salt
+
+    def _home(self, keys):
+        return ((keys * _FIBONACCI) >> self.shift).astype(np.intp)
+
+    def _candidates(self, keys):
+        """Slots whose band key equals `keys` in the same band."""
+        rows, band, found = self._home(keys), np.arange(self.bands), []
+        while rows.size:
+            block = self.table[rows]
+            hit = block > 0
+            which = hit.nonzero()[0]
+            slots = block[hit] - 1
+            found.append(slots[self.keys[slots, band[which]] == keys[which]])
+            more = self.overflow[rows] > 0
+            rows, band, keys = (rows[more] + 1) & self.mask, band[more], keys[more]
+        return np.concatenate(found)
+
+    def assign(self, headline, now):
+        """
+        (cluster id, slot, shared scores or None, whether it started the
+        cluster) for `headline`; all None if it has no text.
+        """
+        sig = self.signature(headline)
+        if sig is None:
+            return None, None, None, None
+        self._expire(now)
+        keys = self._band_keys(sig)
+        numbers = numbers_hash(headline)
+        slots = self._candidates(keys)
+        if slots.size:
+            similarity = (self.sigs[slots] == sig).mean(axis=1) * (self.numbers[slots] == numbers)
+            best = int(similarity.argmax())
+            if similarity[best] >= self.threshold:
+                slot = int(slots[best])
+                self.seen[slot] = now
+                self._count("joined")
+                shared = self.scores[slot]
+                return self.id(slot), slot, dict(zip(self.columns, shared)) if shared is not None else None, False
+
+        if not self.free and self.top == self.capacity:
+            self._evict()
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot, self.top = self.top, self.top + 1
+        self.sigs[slot] = sig
+        self.keys[slot] = keys
+        self.numbers[slot] = numbers
+        self.hashes[slot] = headline_hash(headline)
+        self.seen[slot] = now
+        self.live += 1
+        self._place(np.full(self.bands, slot), keys)
+        self._count("new")
+        return self.id(slot), slot, None, True
+
+    def id(self, slot):
+        return f"{int(self.hashes[slot]):016x}"
+
+    def _place(self, slots, keys):
+        """Put each (slot, band key) in the first row from its home with a free cell."""
+        entries, rows = (slots + 1).astype(np.int32), self._home(keys)
+        open_ = self.table[rows] == 0
+        cols = open_.argmax(axis=1)
+        if open_[np.arange(rows.size), cols].all() and len(set(rows.tolist())) == rows.size:
+            # the usual case: every home row has room and no two entries share one
+            self.table[rows, cols] = entries
+            return
+        while rows.size:
+            open_ = self.table[rows] == 0
+            has = open_.any(axis=1)
+            # entries sharing a row take its free cells one per step
+            take = np.flatnonzero(has)
+            take = take[np.unique(rows[take], return_index=True)[1]]
+            self.table[rows[take], open_[take].argmax(axis=1)] = entries[take]
+            np.add.at(self.overflow, rows[~has], 1)
+            rest = np.ones(rows.size, bool)
+            rest[take] = False
+            rows = np.where(has, rows, (rows + 1) & self.mask)[rest]
+            entries = entries[rest]
+
+    def _unplace(self, slots):
+        """Empty the cells of `slots`, and take them off the overflow counts of the rows they probed past."""
+        entries, rows = np.repeat(slots + 1, self.bands).astype(np.int32), self._home(self.keys[slots].ravel())
+        while rows.size:
+            hit = self.table[rows] == entries[:, None]
+            found = hit.any(axis=1)
+            # two bands of a slot can share a row, so clear one cell per row per step
+            take = np.flatnonzero(found)
+            take = take[np.unique(rows[take], return_index=True)[1]]
+            self.table[rows[take], hit[take].argmax(axis=1)] = 0
+            np.subtract.at(self.overflow, rows[~found], 1)
+            rest = np.ones(rows.size, bool)
+            rest[take] = False
+            rows = np.where(found, rows, (rows + 1) & self.mask)[rest]
+            entries = entries[rest]
+
+    def remember(self, slot, cid, scores):
+        """Keep the first fully scored member's scores for the rest of its cluster."""
+        if slot is None or self.seen[slot] == np.inf or self.id(slot) != cid or self.scores[slot] is not None:
+            return
+        self.scores[slot] = tuple(scores.get(c) for c in self.columns)
+
+    def _expire(self, now):
+        # swept every 1/64 of the window, so a story may outlive it by that much
+        if self.window is None or (self.swept is not None and now - self.swept < self.window / 64):
+            return
+        self.swept = now
+        self._release(np.flatnonzero(self.seen <= now - self.window), "expired")
+
+    def _evict(self):
+        n = max(1, int(self.capacity * EVICT_SHARE))
+        self._release(np.argpartition(self.seen, n - 1)[:n], "evicted")
+
+    def _release(self, slots, reason):
+        if not len(slots):
+            return
+        self._unplace(slots)
+        self.seen[slots] = np.inf
+        for slot in slots.tolist():
+            self.scores[slot] = None
+            self.free.append(slot)
+        self.live -= len(slots)
+        self._count(reason, len(slots))
+
+    def take_counters(self):
+        counters, self.counters = self.counters, {}
+        return counters
+
+    def save(self):
+        if not self.path:
+            return
+        live = np.flatnonzero(self.seen != np.inf)
+        slots = live[np.argsort(self.seen[live], kind="stable")]  # least recently matched first
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        meta = {"params": self.params, "columns": self.columns, "identity": self.identity,
+                "scores": [self.scores[s] for s in slots.tolist()]}
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, sigs=self.sigs[slots], numbers=self.numbers[slots], hashes=self.hashes[slots],
+                     seen=self.seen[slots], meta=np.array(json.dumps(meta)))
+        os.replace(tmp, self.path)
+
+    def _load(self):
+        with np.load(self.path) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta["params"] != self.params:
+                return  # hashed differently; start over
+            start = max(0, len(data["seen"]) - self.capacity)  # the most recently matched fit
+            sigs, numbers, hashes, seen = (data[k][start:] for k in ("sigs", "numbers", "hashes", "seen"))
+        n = len(seen)
+        self.sigs[:n], self.numbers[:n], self.hashes[:n], self.seen[:n] = sigs, numbers, hashes, seen
+        self.keys[:n] = self._band_keys(sigs)
+        self.top = self.live = n
+        self._place(np.repeat(np.arange(n), self.bands), self.keys[:n].ravel())
+        # scores made by other scorers don't carry over; the clusters do
+        if meta["identity"] == self.identity and tuple(meta["columns"]) == self.columns:
+            for slot, scores in enumerate(meta["scores"][start:]):
+                if scores is not None:
+                    self.scores[slot] = tuple(scores)
@@ -0,0 +1,161 @@
+"""
+Resident crawl mode: keep one multinews crawl (and its loaded models) alive
+and poll each feed on its own schedule instead of re-running the spider
+from cron.
+
+    scrapy crawl multinews -s DAEMON_ENABLED=1
+
+Every DAEMON_TICK seconds the spider's due feeds are handed to the engine;
+new headlines flow through dedup, scoring and storage as they arrive. Every
+DAEMON_CHECKPOINT_INTERVAL seconds pending FinBERT batches are written and
+then the `checkpoint` signal tells stateful components to persist. SIGINT/SIGTERM shut down the usual Scrapy way, which
+closes the pipeline and flushes pending FinBERT batches. With
+DAEMON_HEALTH_PORT set, GET /health (JSON) and /metrics (Prometheus text)
+are served on DAEMON_HEALTH_HOST (localhost by default).
+"""
+
+import json
+import re
+import time
+
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider, NotConfigured
+from twisted.internet import reactor
+from twisted.internet.task import LoopingCall
+from twisted.web import resource, server
+
+from news_sentiment.signals import before_checkpoint, checkpoint
+
+
+class FeedDaemon:
+    def __init__(self, crawler, tick=5.0, checkpoint_interval=300.0, health_host="127.0.0.1", health_port=0,
+                 stale_after=3600.0):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.tick = tick
+        self.checkpoint_interval = checkpoint_interval
+        self.health_host = health_host
+        self.health_port = health_port
+        self.stale_after = stale_after
+        self.spider = None
+        self.started = None
+        self.last_response = None
+        self.last_item = None
+        self.loops = []
+        self.listener = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("DAEMON_ENABLED"):
+            raise NotConfigured("DAEMON_ENABLED is off")
+        ext = cls(
+            crawler,
+            tick=settings.getfloat("DAEMON_TICK", 5.0),
+            checkpoint_interval=settings.getfloat("DAEMON_CHECKPOINT_INTERVAL", 300.0),
+            health_host=settings.get("DAEMON_HEALTH_HOST", "127.0.0.1"),
+            health_port=settings.getint("DAEMON_HEALTH_PORT", 0),
+            stale_after=settings.getfloat("DAEMON_STALE_AFTER", 3600.0),
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.response_downloaded, signal=signals.response_downloaded)
+        crawler.signals.connect(ext.item_scraped, signal=signals.item_scraped)
+        return ext
+
+    def spider_opened(self, spider):
+        if not hasattr(spider, "due_requests"):
+            spider.logger.error(f"Spider {spider.name!r} has no due_requests(); daemon mode needs multinews")
+            return
+        self.spider = spider
+        self.started = time.time()
+
+        poll = LoopingCall(self.poll)
+        poll.start(self.tick, now=False)
+        save = LoopingCall(self.checkpoint)
+        save.start(self.checkpoint_interval, now=False)
+        self.loops = [poll, save]
+
+        if self.health_port:
+            site = server.Site(HealthResource(self))
+            self.listener = reactor.listenTCP(self.health_port, site, interface=self.health_host)
+            port = self.listener.getHost().port
+            spider.logger.info(f"Daemon health endpoint on http://{self.health_host}:{port}/health")
+        spider.logger.info(f"Daemon mode: polling {len(spider.feeds)} feeds, tick {self.tick:g}s")
+
+    def poll(self):
+        for request in self.spider.due_requests():
+            self.crawler.engine.crawl(request)
+
+    def checkpoint(self):
+        # pending rows first: after a crash, a headline the saved dedup index
+        # (or a 304) says was seen but that was never written is lost for good
+        d = self.crawler.signals.send_catch_log_deferred(signal=before_checkpoint, spider=self.spider)
+        d.addCallback(lambda _: self.crawler.signals.send_catch_log(signal=checkpoint))
+        d.addCallback(lambda _: self.stats.inc_value("daemon/checkpoints"))
+        return d
+
+    def spider_idle(self, spider):
+        # nothing queued right now; the next poll() will bring more
+        if self.spider is not None:
+            raise DontCloseSpider
+
+    def spider_closed(self, spider, reason):
+        for loop in self.loops:
+            if loop.running:
+                loop.stop()
+        if self.listener is not None:
+            self.listener.stopListening()
+        if self.started is not None:
+            spider.logger.info(f"Daemon stopped after {time.time() - self.started:.0f}s ({reason})")
+
+    def response_downloaded(self, response, request, spider):
+        # sent before the downloader middlewares, so unchanged (304) feeds count too
+        self.last_response = time.time()
+
+    def item_scraped(self, item, response, spider):
+        self.last_item = time.time()
+
+    def health(self):
+        now = time.time()
+        # no response from any feed for stale_after seconds (or since startup)
+        stale = now - (self.last_response or self.started) > self.stale_after
+        return {
+            "status": "stale" if stale else "ok",
+            "uptime_seconds": round(now - self.started, 1),
+            "feeds": len(self.spider.feeds),
+            "next_poll_in_seconds": round(self.spider.seconds_until_next_due(now), 1),
+            "seconds_since_response": None if self.last_response is None else round(now - self.last_response, 1),
+            "seconds_since_item": None if self.last_item is None else round(now - self.last_item, 1),
+            "items_scraped": self.stats.get_value("item_scraped_count", 0),
+        }
+
+    def metrics(self):
+        lines = [f"news_sentiment_uptime_seconds {time.time() - self.started:.1f}"]
+        for key, value in sorted(self.stats.get_stats().items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = re.sub(r"[^a-zA-Z0-9_]", "_", key)
+            lines.append(f"news_sentiment_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class HealthResource(resource.Resource):
+    isLeaf = True
+
+    def __init__(self, daemon):
+        super().__init__()
+        self.daemon = daemon
+
+    def render_GET(self, request):
+        if request.path == b"/health":
+            body = self.daemon.health()
+            request.setResponseCode(200 if body["status"] == "ok" else 503)
+            request.setHeader(b"Content-Type", b"application/json")
+            return json.dumps(body).encode()
+        if request.path == b"/metrics":
+            request.setHeader(b"Content-Type", b"text/plain; version=0.0.4")
+            return self.daemon.metrics().encode()
+        request.setResponseCode(404)
+        return b"not found\n"
@@ -0,0 +1,270 @@
+"""
+Published-date normalization: feed date strings -> aware UTC datetimes.
+
+Feeds date their entries in a handful of layouts:
+
+    rfc822        Mon, 06 Oct 2025 10:00:00 GMT / +0000 (RSS pubDate)
+    iso8601       2025-10-06T10:00:00Z, with fractions or offsets (Atom, dc:date)
+    rfc822-loose  RFC-822 without weekday or seconds, full month names,
+                  RFC-850 dashes, 2-digit years, named zones (EST, CEST, IST)
+    iso8601-loose a space before the offset, slashes, "UTC"/"GMT" suffixes
+    asctime       Mon Oct  6 10:00:00 2025
+    epoch         Unix seconds or milliseconds
+
+Each layout has its own parser, and the common ones are cheap: fixed
+offsets for strict RFC-822 and datetime.fromisoformat for ISO-8601. A
+DateNormalizer tries them in that order. It remembers which one worked
+for each feed, so later dates from that feed go straight to the right
+parser. Whatever none of them reads is counted as unparsed instead of
+disappearing silently. Naive times are taken to be UTC.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_tz
+
+MONTHS = {
+    name: i + 1
+    for i, name in enumerate(("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"))
+}
+# zone abbreviations seen in feeds, in minutes east of UTC; RFC-822 names
+# plus a few regional ones that are unambiguous in practice
+ZONES = {
+    "UT": 0, "UTC": 0, "GMT": 0, "Z": 0, "WET": 0,
+    "EST": -300, "EDT": -240, "CST": -360, "CDT": -300, "MST": -420, "MDT": -360, "PST": -480, "PDT": -420,
+    "AKST": -540, "AKDT": -480, "HST": -600,
+    "BST": 60, "IST": 330, "CET": 60, "CEST": 120, "EET": 120, "EEST": 180, "MSK": 180,
+    "SGT": 480, "HKT": 480, "JST": 540, "KST": 540, "AEST": 600, "AEDT": 660, "NZST": 720, "NZDT": 780,
+}
+# the same as ISO-8601 offsets, for rewriting RFC-822 dates into fromisoformat's input
+_ZONE_ISO = {name: f"{'-' if m < 0 else '+'}{abs(m) // 60:02d}:{abs(m) % 60:02d}" for name, m in ZONES.items()}
+_MONTH_DIGITS = {}
+for _name, _i in MONTHS.items():
+    for _spelling in (_name, _name.title(), _name.upper()):
+        _MONTH_DIGITS[_spelling] = f"{_i:02d}"
+_TZ_CACHE = {0: timezone.utc}
+MAX_FEEDS = 10_000  # per-feed memo entries kept
+
+
+def _tz(minutes):
+    tz = _TZ_CACHE.get(minutes)
+    if tz is None:
+        tz = _TZ_CACHE[minutes] = timezone(timedelta(minutes=minutes))
+    return tz
+
+
+def _offset(zone):
+    """"+0530", "-04:00", "+05" or a zone name -> minutes east of UTC, None if unknown."""
+    if not zone:
+        return 0
+    if zone[0] in "+-":
+        digits = zone[1:].replace(":", "")
+        if not digits.isdigit() or len(digits) not in (2, 4):
+            return None
+        minutes = int(digits[:2]) * 60 + int(digits[2:] or 0)
+        return -minutes if zone[0] == "-" else minutes
+    return ZONES.get(zone.upper())
+
+
+def _utc(year, month, day, hour, minute, second, offset, micro=0):
+    try:
+        dt = datetime(year, month, day, hour, minute, second, micro, tzinfo=_tz(offset))
+    except ValueError:
+        return None
+    return dt.astimezone(timezone.utc) if offset else dt
+
+
+def _year(text):
+    year = int(text)
+    if len(text) == 2:
+        year += 2000 if year < 50 else 1900  # RFC 2822's reading of 2-digit years
+    return year
+
+
+def parse_rfc822(text):
+    """
+    Strict RFC-822 with weekday and seconds, "Mon, 06 Oct 2025 10:00:00 GMT":
+    the fields sit at fixed positions, so they are rearranged into ISO-8601
+    and handed to datetime.fromisoformat, which also validates them.
+    """
+    if len(text) < 29 or text[3] != "," or text[25] != " ":
+        return None
+    month = _MONTH_DIGITS.get(text[8:11])
+    zone = text[26:]
+    zone = _ZONE_ISO.get(zone, zone)
+    if month is None or zone[0] not in "+-":
+        return None
+    return parse_iso8601(f"{text[12:16]}-{month}-{text[5:7]}T{text[17:25]}{zone}")
+
+
+def parse_iso8601(text):
+    """ISO-8601 as datetime.fromisoformat reads it (Z, offsets, fractions, basic format)."""
+    if not text[:4].isdigit():
+        return None
+    try:
+        dt = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    tz = dt.tzinfo
+    if tz is timezone.utc:
+        return dt
+    if tz is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+_RFC822_LOOSE = re.compile(
+    r"(?:[A-Za-z]+\.?,?\s*)?(\d{1,2})[\s-]+([A-Za-z]{3})[A-Za-z]*\.?,?[\s-]+(\d{4}|\d{2}),?\s+"
+    r"(\d{1,2}):(\d{2})(?::(\d{2})(?:\.\d+)?)?\s*([+-]\d{2}:?\d{2}|[A-Za-z]{1,5})?(?:\s*\(.*\))?$"
+)
+
+
+def parse_rfc822_loose(text):
+    m = _RFC822_LOOSE.match(text)
+    if m is None:
+        return None
+    day, month, year, hour, minute, second, zone = m.groups()
+    month, offset = MONTHS.get(month.lower()), _offset(zone)
+    if month is None or offset is None:
+        return None
+    return _utc(_year(year), month, int(day), int(hour), int(minute), int(second or 0), offset)
+
+
+_ISO8601_LOOSE = re.compile(
+    r"(\d{4})[-/](\d{1,2})[-/](\d{1,2})(?:[T\s]+(\d{1,2}):(\d{2})(?::(\d{2})(?:[.,](\d{1,9}))?)?)?"
+    r"\s*([+-]\d{2}(?::?\d{2})?|[A-Za-z]{1,5})?$"
+)
+
+
+def parse_iso8601_loose(text):
+    m = _ISO8601_LOOSE.match(text)
+    if m is None:
+        return None
+    year, month, day, hour, minute, second, fraction, zone = m.groups()
+    offset = _offset(zone)
+    if offset is None:
+        return None
+    micro = int(fraction[:6].ljust(6, "0")) if fraction else 0
+    return _utc(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0), offset, micro)
+
+
+_ASCTIME = re.compile(r"[A-Za-z]{3}\s+([A-Za-z]{3})\s+(\d{1,2})\s+(\d{1,2}):(\d{2}):(\d{2})\s+(?:([A-Za-z]{1,5})\s+)?(\d{4})$")
+
+
+def parse_asctime(text):
+    m = _ASCTIME.match(text)
+    if m is None:
+        return None
+    month, day, hour, minute, second, zone, year = m.groups()
+    month, offset = MONTHS.get(month.lower()), _offset(zone)
+    if month is None or offset is None:
+        return None
+    return _utc(int(year), month, int(day), int(hour), int(minute), int(second), offset)
+
+
+def parse_epoch(text):
+    if not text.isdigit() or len(text) not in (10, 13):
+        return None
+    seconds = int(text) / (1000 if len(text) == 13 else 1)
+    return datetime.fromtimestamp(seconds, timezone.utc)
+
+
+def parse_email(text):
+    """email.utils' forgiving RFC-2822 reader, for whatever the patterns above miss."""
+    try:
+        parts = parsedate_tz(text)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if parts is None:
+        return None
+    offset = (parts[9] or 0) // 60
+    return _utc(parts[0], parts[1], parts[2], parts[3], parts[4], parts[5], offset)
+
+
+# tried in this order on a feed whose format isn't known yet
+FORMATS = {
+    "rfc822": parse_rfc822,
+    "iso8601": parse_iso8601,
+    "rfc822-loose": parse_rfc822_loose,
+    "iso8601-loose": parse_iso8601_loose,
+    "asctime": parse_asctime,
+    "epoch": parse_epoch,
+    "email": parse_email,
+}
+
+
+class DateNormalizer:
+    """
+    normalize(text, feed) -> aware UTC datetime or None, remembering per
+    feed which of FORMATS read its dates. Counters (per format, memo hits,
+    unparsed) accumulate until take_counters().
+    """
+
+    def __init__(self, formats=FORMATS, max_feeds=MAX_FEEDS):
+        self.formats = dict(formats)
+        self.max_feeds = max_feeds
+        self.learned = {}  # {feed: format name}
+        self.counters = {}
+
+    def _count(self, key):
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+    def normalize(self, text, feed=None):
+        text = text.strip() if isinstance(text, str) else ""
+        if not text:
+            return None
+        known = self.learned.get(feed) if feed is not None else None
+        if known is not None:
+            dt = self.formats[known](text)
+            if dt is not None:
+                self._count(known)
+                self._count("memo_hits")
+                return dt
+        for name, parse in self.formats.items():
+            if name == known:
+                continue
+            dt = parse(text)
+            if dt is not None:
+                self._count(name)
+                if feed is not None:
+                    self._learn(feed, name)
+                return dt
+        self._count("unparsed")
+        return None
+
+    def _learn(self, feed, name):
+        if feed not in self.learned and len(self.learned) >= self.max_feeds:
+            del self.learned[next(iter(self.learned))]
+        self.learned[feed] = name
+
+    def normalize_column(self, published, feeds=None):
+        """
+        Normalize a pandas Series of date strings into a datetime64[UTC]
+        Series. Each distinct string is parsed once (stored history repeats
+        them a lot), using the feed it first appears with for the memo.
+        """
+        import numpy as np
+        import pandas as pd
+
+        codes, uniques = pd.factorize(published.fillna("").astype(str))
+        if feeds is None:
+            first_feeds = [None] * len(uniques)
+        else:
+            first_feeds = feeds.to_numpy()[np.unique(codes, return_index=True)[1]]
+        values = [self.normalize(text, feed) for text, feed in zip(uniques, first_feeds)]
+        parsed = pd.DatetimeIndex(pd.to_datetime(values, utc=True))
+        return pd.Series(parsed.take(codes), index=published.index)
+
+    def take_counters(self):
+        counters, self.counters = self.counters, {}
+        return counters
+
+
+# shared by the spider's feed parsing and the pipeline, so the per-feed
+# memo and the counters cover both
+DEFAULT = DateNormalizer()
+
+
+def parse_date(text, feed=None):
+    """Any supported date string -> aware UTC datetime, or None."""
+    return DEFAULT.normalize(text, feed)
@@ -0,0 +1,78 @@
+import csv
+import hashlib
+import heapq
+import os
+from array import array
+from bisect import bisect_left
+
+from news_sentiment.cache import normalize_headline
+
+
+def _hash64(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def url_hash(url):
+    return _hash64("u:" + url.strip())
+
+
+def headline_hash(headline):
+    return _hash64("h:" + normalize_headline(headline).casefold())
+
+
+class DedupIndex:
+    """
+    Persistent set of 64-bit URL (and optionally headline) hashes.
+
+    On disk the index is a sorted array of unsigned 64-bit ints, so loading
+    it is a single read of 8 bytes per entry and membership is a binary
+    search. Hashes added during a run live in a set until save() merges them
+    into the sorted array and rewrites the file atomically.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.keys = array("Q")
+        self.new = set()
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                self.keys.frombytes(f.read())
+
+    def __len__(self):
+        return len(self.keys) + len(self.new)
+
+    def __contains__(self, key):
+        if key in self.new:
+            return True
+        i = bisect_left(self.keys, key)
+        return i < len(self.keys) and self.keys[i] == key
+
+    def add(self, key):
+        """Add `key`; return False if it was already present."""
+        if key in self:
+            return False
+        self.new.add(key)
+        return True
+
+    def bootstrap_from_csv(self, csv_path, headlines=False):
+        """One-off seed from an existing headlines.csv when no index file exists yet."""
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("url"):
+                    self.new.add(url_hash(row["url"]))
+                if headlines and row.get("headline"):
+                    self.new.add(headline_hash(row["headline"]))
+
+    def save(self):
+        if not self.new:
+            return
+        # add() only admits hashes missing from self.keys, so a plain merge
+        # of the two sorted runs stays duplicate-free
+        merged = array("Q", heapq.merge(self.keys, sorted(self.new)))
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            merged.tofile(f)
+        os.replace(tmp, self.path)
+        self.keys, self.new = merged, set()
@@ -0,0 +1,93 @@
+"""
+Single-pass RSS 2.0 / RSS 1.0 (RDF) / Atom parsing with lxml.
+
+iter_entries() streams the feed body through lxml.etree.iterparse, reads
+title, link and date from each <item>/<entry> in one walk over its
+children, normalizes the date (news_sentiment.dates) and frees the element
+before moving on.
+Namespaces are matched by local name, so RDF items and Atom entries
+(which CSS selectors like "item" or "entry" miss) are handled too.
+"""
+
+import io
+
+from lxml import etree
+
+from news_sentiment.dates import DEFAULT
+
+ENTRY_TAGS = ("{*}item", "{*}entry")
+DC_NS = "http://purl.org/dc/elements/1.1/"
+
+# date elements in order of preference, by feed flavour (old selector order)
+RSS_DATES = ("pubDate", "date")
+ATOM_DATES = ("updated", "published", "date")
+
+
+def _local(tag):
+    return tag.rpartition("}")[2] if tag[:1] == "{" else tag
+
+
+def _text(el):
+    return "".join(el.itertext()).strip()
+
+
+def _entry(el, normalizer, feed):
+    """Pull title, link and date out of one <item>/<entry> in a single pass over its children."""
+    is_atom = _local(el.tag) == "entry"
+    title = link = alt_link = None
+    dates = {}
+    for child in el:
+        tag = child.tag
+        if not isinstance(tag, str):
+            continue  # comments, processing instructions
+        name = _local(tag)
+        if name == "title":
+            if title is None:
+                title = _text(child)
+        elif name == "link":
+            href = child.get("href")
+            if href:
+                # Atom: rel="alternate" (or no rel) is the article itself
+                if child.get("rel", "alternate") == "alternate":
+                    link = link or href
+                else:
+                    alt_link = alt_link or href
+            elif link is None:
+                link = _text(child) or None
+        elif name in ("pubDate", "updated", "published") or (name == "date" and tag == f"{{{DC_NS}}}date"):
+            dates.setdefault(name, child.text)
+
+    published = None
+    for name in ATOM_DATES if is_atom else RSS_DATES:
+        if dates.get(name):
+            published = dates[name].strip()
+            break
+    return {
+        "title": title,
+        "link": link or alt_link,
+        "published": published or "",
+        "published_utc": normalizer.normalize(published, feed),
+    }
+
+
+def iter_entries(body, feed=None, normalizer=DEFAULT):
+    """
+    Yield {title, link, published, published_utc} for every entry in `body`
+    (bytes). Malformed markup is recovered where lxml can; entries without a
+    title or link are skipped. `feed` (its URL) keys the normalizer's memo
+    of date formats.
+    """
+    context = etree.iterparse(
+        io.BytesIO(body), events=("end",), tag=ENTRY_TAGS,
+        recover=True, resolve_entities=False, no_network=True, huge_tree=True,
+    )
+    for _, el in context:
+        entry = _entry(el, normalizer, feed)
+        # drop what we've read so memory stays flat on large feeds
+        el.clear(keep_tail=True)
+        parent = el.getparent()
+        if parent is not None:
+            while el.getprevious() is not None:
+                del parent[0]
+        if entry["title"] and entry["link"]:
+            yield entry
@@ -0,0 +1,280 @@
+"""
+Where a crawl spends its time.
+
+Components time their stages into the crawler's StageMetrics (see
+stage_metrics()), one latency histogram per stage:
+
+    fetch   download latency of each feed (including unchanged ones)
+    parse   turning a feed body into entries
+    dedup   cross-run URL/headline lookups, per item
+    date    published date normalization, per item
+    cache   sentiment cache lookups, per item
+    vader   VADER, per item
+    finbert one FinBERT batch (inference time, also in workers)
+    write   one write to the storage backends
+
+and register gauges (queue depths) that the RunMetrics extension samples
+every METRICS_SAMPLE_INTERVAL seconds. Summaries are published to the crawl
+stats as stage/<name>/* and queue/<name>/*, and when the crawl closes a
+JSON report with the histograms, queue samples and all stats is written to
+RUN_REPORT_DIR. With PROFILE = "cprofile" the run is profiled in-process
+(a .prof next to the report); with PROFILE = "py-spy" a `py-spy record`
+is attached to the crawler process (flamegraph .svg).
+"""
+
+import bisect
+import cProfile
+import json
+import os
+import shutil
+import signal
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet.task import LoopingCall
+
+# histogram bucket upper bounds in seconds: 1µs to ~5 min, sqrt(2) apart
+BOUNDS = tuple(1e-6 * 2 ** (i / 2) for i in range(57))
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    """Log-bucketed latency histogram; quantiles are accurate to a bucket (~41%)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)  # the last bucket is +inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BOUNDS, self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        out = {"count": self.count, "total_seconds": round(self.total, 6),
+               "mean": round(self.total / self.count, 6) if self.count else 0.0}
+        for q in QUANTILES:
+            out[f"p{round(q * 100)}"] = round(self.quantile(q), 6)
+        out["max"] = round(self.max, 6)
+        return out
+
+    def buckets(self):
+        """Non-empty buckets as [upper bound, count] pairs (null = +inf)."""
+        return [[BOUNDS[i] if i < len(BOUNDS) else None, n] for i, n in enumerate(self.counts) if n]
+
+
+class StageMetrics:
+    def __init__(self):
+        self.stages = {}
+        self.gauges = {}
+        self.samples = {}
+
+    def observe(self, stage, seconds):
+        hist = self.stages.get(stage)
+        if hist is None:
+            hist = self.stages[stage] = Histogram()
+        hist.observe(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def gauge(self, name, read):
+        """Register `read()` (returns a number) to be sampled as queue `name`."""
+        self.gauges[name] = read
+
+    def sample(self):
+        for name, read in self.gauges.items():
+            try:
+                value = read()
+            except Exception:
+                continue
+            if value is None:
+                continue
+            s = self.samples.setdefault(name, {"samples": 0, "total": 0, "max": 0, "last": 0})
+            s["samples"] += 1
+            s["total"] += value
+            s["max"] = max(s["max"], value)
+            s["last"] = value
+
+    def queue_summary(self):
+        return {
+            name: {"max": s["max"], "mean": round(s["total"] / s["samples"], 2), "last": s["last"]}
+            for name, s in self.samples.items() if s["samples"]
+        }
+
+    def publish(self, stats):
+        for stage, hist in self.stages.items():
+            for key, value in hist.summary().items():
+                stats.set_value(f"stage/{stage}/{key}", value)
+        for name, summary in self.queue_summary().items():
+            for key, value in summary.items():
+                stats.set_value(f"queue/{name}/{key}", value)
+
+
+def stage_metrics(crawler):
+    """The crawler's StageMetrics, created on first use."""
+    metrics = getattr(crawler, "stage_metrics", None)
+    if metrics is None:
+        metrics = crawler.stage_metrics = StageMetrics()
+    return metrics
+
+
+def _engine_gauges(engine):
+    def scheduler():
+        slot = getattr(engine, "_slot", None) or getattr(engine, "slot", None)
+        return len(slot.scheduler) if slot is not None else None
+
+    def scraper_slot():
+        return engine.scraper.slot
+
+    return {
+        "scheduled": scheduler,
+        "downloading": lambda: len(engine.downloader.active),
+        "responses": lambda: len(scraper_slot().queue) + len(scraper_slot().active),
+        "items_in_pipelines": lambda: scraper_slot().itemproc_size,
+    }
+
+
+class RunMetrics:
+    def __init__(self, crawler, interval=1.0, report_dir="run_reports", profile=""):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.metrics = stage_metrics(crawler)
+        self.interval = interval
+        self.report_dir = report_dir
+        self.profile = profile
+        self.sampler = None
+        self.profiler = None
+        self.py_spy = None
+        self.started = None
+        self.run_id = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("METRICS_ENABLED", True):
+            raise NotConfigured("METRICS_ENABLED is off")
+        profile = (settings.get("PROFILE") or "").lower()
+        if profile not in ("", "cprofile", "py-spy"):
+            raise ValueError(f"PROFILE must be 'cprofile', 'py-spy' or empty, not {profile!r}")
+        if profile and not settings.get("RUN_REPORT_DIR"):
+            raise ValueError(f"PROFILE = {profile!r} needs RUN_REPORT_DIR to write the profile to")
+        ext = cls(
+            crawler,
+            interval=settings.getfloat("METRICS_SAMPLE_INTERVAL", 1.0),
+            report_dir=settings.get("RUN_REPORT_DIR"),
+            profile=profile,
+        )
+        crawler.signals.connect(ext.engine_started, signal=signals.engine_started)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.response_downloaded, signal=signals.response_downloaded)
+        return ext
+
+    def engine_started(self):
+        self.started = time.time()
+        self.run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        for name, read in _engine_gauges(self.crawler.engine).items():
+            self.metrics.gauge(name, read)
+        if self.interval > 0:
+            self.sampler = LoopingCall(self.tick)
+            self.sampler.start(self.interval, now=False)
+        if self.profile:
+            self._start_profiler()
+
+    def tick(self):
+        self.metrics.sample()
+        self.metrics.publish(self.stats)
+
+    def response_downloaded(self, response, request, spider):
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            self.metrics.observe("fetch", latency)
+
+    def _path(self, suffix):
+        return os.path.join(self.report_dir, f"run-{self.run_id}{suffix}")
+
+    def _start_profiler(self):
+        if self.profile == "cprofile":
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+            return
+        if shutil.which("py-spy") is None:
+            self.crawler.spider.logger.warning("PROFILE = 'py-spy' but py-spy is not on PATH; not profiling")
+            return
+        os.makedirs(self.report_dir, exist_ok=True)
+        self.py_spy = subprocess.Popen(
+            ["py-spy", "record", "--pid", str(os.getpid()), "--output", self._path(".svg"), "--subprocesses"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def _stop_profiler(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+            os.makedirs(self.report_dir, exist_ok=True)
+            self.profiler.dump_stats(self._path(".prof"))
+            return self._path(".prof")
+        if self.py_spy is not None:
+            # py-spy writes its flamegraph when interrupted
+            self.py_spy.send_signal(signal.SIGINT)
+            try:
+                self.py_spy.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.py_spy.kill()
+            return self._path(".svg")
+        return None
+
+    def spider_closed(self, spider, reason):
+        if self.sampler and self.sampler.running:
+            self.sampler.stop()
+        self.metrics.sample()
+        self.metrics.publish(self.stats)
+        profile_path = self._stop_profiler()
+        if not self.report_dir or self.started is None:
+            return
+
+        report = {
+            "run_id": self.run_id,
+            "spider": spider.name,
+            "reason": reason,
+            "started": datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            "elapsed_seconds": round(time.time() - self.started, 3),
+            "pid": os.getpid(),
+            "profile": profile_path,
+            "stages": {
+                name: {**hist.summary(), "buckets": hist.buckets()} for name, hist in self.metrics.stages.items()
+            },
+            "queues": self.metrics.queue_summary(),
+            "stats": self.stats.get_stats(),
+        }
+        os.makedirs(self.report_dir, exist_ok=True)
+        path = self._path(".json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1, sort_keys=True, default=str)
+        os.replace(tmp, path)
+        spider.logger.info(f"Run report written to {path}")
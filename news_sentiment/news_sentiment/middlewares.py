@@ -3,11 +3,22 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import hashlib
+import json
+import os
+
 from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
+from news_sentiment.dedup import DedupIndex, headline_hash, url_hash
+from news_sentiment.metrics import StageMetrics, stage_metrics
+from news_sentiment.signals import checkpoint
+from news_sentiment.throttle import HostThrottle
+
 
 class NewsSentimentSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
@@ -53,48 +64,318 @@ class NewsSentimentSpiderMiddleware:
         spider.logger.info("Spider opened: %s" % spider.name)
 
 
-class NewsSentimentDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+class FeedUnchanged(IgnoreRequest):
+    """Raised by ConditionalGetMiddleware for a feed that has not changed since the last poll."""
+
+
+class ConditionalGetMiddleware:
+    """
+    Remembers each feed's ETag, Last-Modified and body hash between crawls.
+    Feed requests are sent with If-None-Match / If-Modified-Since, and a 304,
+    or a 200 whose body hashes the same as last time, is dropped here so
+    the spider never parses an unchanged feed again. Set
+    meta["conditional_get"] = False on a request to opt it out.
+
+    A changed feed's new validators are only saved once its response has
+    been scraped and its items stored; if one of its items fails, they are
+    dropped so the next poll fetches and parses the feed in full again.
+    """
+
+    def __init__(self, state_path, stats=None, crawler=None):
+        self.state_path = state_path
+        self.stats = stats
+        self.crawler = crawler
+        self.state = {}
+        # url -> (request, validators) for feeds whose items are still in flight
+        self.pending = {}
+        self.logger = None
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
+        state_path = crawler.settings.get("CONDITIONAL_GET_STATE_PATH")
+        if not state_path:
+            raise NotConfigured("CONDITIONAL_GET_STATE_PATH is not set")
+        s = cls(state_path, stats=crawler.stats, crawler=crawler)
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(s.item_error, signal=signals.item_error)
+        crawler.signals.connect(s.save, signal=checkpoint)
         return s
 
-    def process_request(self, request, spider):
-        # Called for each request that goes through the downloader
-        # middleware.
+    def spider_opened(self, spider):
+        self.logger = spider.logger
+        if os.path.isfile(self.state_path):
+            with open(self.state_path, encoding="utf-8") as f:
+                self.state = json.load(f)
+        spider.logger.info(f"Conditional GET: validators for {len(self.state)} feeds in {self.state_path}")
+
+    def spider_closed(self, spider):
+        # every response has been scraped by now
+        self._commit(everything=True)
+        self.save()
+
+    def item_error(self, item, response, spider, failure):
+        if self.pending.pop(response.url, None) is not None:
+            self.stats.inc_value("conditional_get/validators_dropped")
+
+    def _commit(self, everything=False):
+        for url, (request, entry) in list(self.pending.items()):
+            if everything or not self._in_flight(request):
+                self.state[url] = entry
+                del self.pending[url]
+
+    def _in_flight(self, request):
+        # still downloading, queued for the spider, or being scraped (items included)
+        engine = self.crawler.engine
+        if engine is None:
+            return False
+        if request in engine.downloader.active:
+            return True
+        slot = engine.scraper.slot
+        return slot is not None and (request in slot.active or any(queued is request for _, queued, _ in slot.queue))
 
-        # Must either:
-        # - return None: continue processing this request
-        # - or return a Response object
-        # - or return a Request object
-        # - or raise IgnoreRequest: process_exception() methods of
-        #   installed downloader middleware will be called
+    def save(self):
+        self._commit()
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.state_path)
+
+    def _applies(self, request):
+        return request.method == "GET" and request.meta.get("conditional_get", True)
+
+    def process_request(self, request, spider=None):
+        if not self._applies(request):
+            return None
+        known = self.state.get(request.url)
+        if known:
+            if known.get("etag") and b"If-None-Match" not in request.headers:
+                request.headers["If-None-Match"] = known["etag"]
+            if known.get("last_modified") and b"If-Modified-Since" not in request.headers:
+                request.headers["If-Modified-Since"] = known["last_modified"]
         return None
 
-    def process_response(self, request, response, spider):
-        # Called with the response returned from the downloader.
+    def process_response(self, request, response, spider=None):
+        if not self._applies(request):
+            return response
+        known = self.state.get(request.url, {})
+
+        if response.status == 304 and known:
+            self.stats.inc_value("conditional_get/not_modified")
+            self._skip(request, known.get("length", 0), "304 Not Modified")
+
+        if response.status != 200:
+            return response
 
-        # Must either;
-        # - return a Response object
-        # - return a Request object
-        # - or raise IgnoreRequest
+        digest = hashlib.blake2b(response.body, digest_size=16).hexdigest()
+        entry = {
+            "etag": _header(response, b"ETag"),
+            "last_modified": _header(response, b"Last-Modified"),
+            "sha": digest,
+            "length": len(response.body),
+        }
+        entry = {k: v for k, v in entry.items() if v is not None}
+        if known.get("sha") == digest:
+            # the server ignored the validators (or has none) but nothing changed
+            self.state[request.url] = entry
+            self.stats.inc_value("conditional_get/unchanged")
+            self._skip(request, 0, "body unchanged")
+        self.pending[request.url] = (request, entry)
+        self.stats.inc_value("conditional_get/changed")
         return response
 
-    def process_exception(self, request, exception, spider):
-        # Called when a download handler or a process_request()
-        # (from other downloader middleware) raises an exception.
+    def _skip(self, request, bytes_saved, reason):
+        self.stats.inc_value("conditional_get/feeds_skipped")
+        self.stats.inc_value("conditional_get/bytes_saved", bytes_saved)
+        if self.logger:
+            self.logger.debug(f"Skipping unchanged feed ({reason}): {request.url}")
+        raise FeedUnchanged(f"Feed unchanged ({reason}): {request.url}")
+
+
+def _header(response, name):
+    value = response.headers.get(name)
+    return value.decode("latin-1") if value else None
 
-        # Must either:
-        # - return None: continue processing this exception
-        # - return a Response object: stops process_exception() chain
-        # - return a Request object: stops process_exception() chain
-        pass
+
+class HostThrottleMiddleware:
+    """
+    Adapts each host's download slot (concurrency and delay) to how that
+    host is behaving, within the HOST_THROTTLE_* bounds. See
+    news_sentiment.throttle.HostThrottle for the policy.
+    """
+
+    ERROR_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, crawler, throttle):
+        self.crawler = crawler
+        self.throttle = throttle
+        self.stats = crawler.stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("HOST_THROTTLE_ENABLED"):
+            raise NotConfigured("HOST_THROTTLE_ENABLED is off")
+        throttle = HostThrottle(
+            min_concurrency=settings.getint("HOST_THROTTLE_MIN_CONCURRENCY", 1),
+            max_concurrency=settings.getint("HOST_THROTTLE_MAX_CONCURRENCY", 4),
+            min_delay=settings.getfloat("HOST_THROTTLE_MIN_DELAY", 0.25),
+            max_delay=settings.getfloat("HOST_THROTTLE_MAX_DELAY", 30.0),
+            target_latency=settings.getfloat("HOST_THROTTLE_TARGET_LATENCY", 2.0),
+            max_error_rate=settings.getfloat("HOST_THROTTLE_MAX_ERROR_RATE", 0.2),
+            start_concurrency=settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN", 1),
+            start_delay=settings.getfloat("DOWNLOAD_DELAY", 1.0),
+            state_path=settings.get("HOST_THROTTLE_STATE_PATH"),
+        )
+        s = cls(crawler, throttle)
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(throttle.save, signal=checkpoint)
+        return s
 
     def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
+        hosts = self.throttle.load()
+        if hosts:
+            spider.logger.info(f"Host throttle: learned limits for {len(hosts)} hosts")
+
+    def spider_closed(self, spider):
+        self.throttle.save()
+        self.stats.set_value("host_throttle/hosts", len(self.throttle.hosts))
+        for key, st in sorted(self.throttle.hosts.items()):
+            latency = f"{st['latency']:.2f}s" if st["latency"] is not None else "-"
+            spider.logger.info(
+                f"Host throttle {key}: concurrency={st['concurrency']} delay={st['delay']:.2f}s "
+                f"latency={latency} error_rate={st['error_rate']:.2f}"
+            )
+
+    def _key(self, request):
+        return request.meta.get("download_slot") or urlparse_cached(request).hostname or ""
+
+    def _apply(self, key):
+        # slots are created by the downloader on a host's first request; until
+        # then the learned values are applied on the next request or response
+        st = self.throttle.host(key)
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if slot is not None:
+            slot.concurrency = st["concurrency"]
+            slot.delay = st["delay"]
+
+    def process_request(self, request, spider=None):
+        self._apply(self._key(request))
+        return None
+
+    def process_response(self, request, response, spider=None):
+        key = self._key(request)
+        error = response.status in self.ERROR_STATUSES
+        retry_after = None
+        if response.status == 429:
+            try:
+                retry_after = float(response.headers.get(b"Retry-After", b"").decode() or 0)
+            except ValueError:
+                retry_after = None
+        self.throttle.record(key, latency=request.meta.get("download_latency"), error=error, retry_after=retry_after)
+        if error:
+            self.stats.inc_value("host_throttle/errors")
+        self._apply(key)
+        return response
+
+    def process_exception(self, request, exception, spider=None):
+        key = self._key(request)
+        self.throttle.record(key, error=True)
+        self.stats.inc_value("host_throttle/errors")
+        self._apply(key)
+        return None
+
+
+class HeadlineDedupMiddleware:
+    """
+    Drops items whose URL (and, with DEDUP_HEADLINES, normalized headline)
+    was already seen by this or an earlier crawl, before they reach the
+    item pipelines and their sentiment models. An item's keys are only
+    added to the index once the item has been stored; until then they are
+    held in memory so repeats within the crawl are still dropped.
+    """
+
+    def __init__(self, index_path, check_headlines=False, bootstrap_csv="headlines.csv", stats=None, metrics=None):
+        self.index_path = index_path
+        self.check_headlines = check_headlines
+        self.bootstrap_csv = bootstrap_csv
+        self.stats = stats
+        self.metrics = metrics or StageMetrics()
+        self.index = None
+        # keys of items that passed but are not stored yet
+        self.pending = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        index_path = crawler.settings.get("DEDUP_INDEX_PATH")
+        if not index_path:
+            raise NotConfigured("DEDUP_INDEX_PATH is not set")
+        s = cls(
+            index_path,
+            check_headlines=crawler.settings.getbool("DEDUP_HEADLINES"),
+            stats=crawler.stats,
+            metrics=stage_metrics(crawler),
+        )
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(s.checkpoint, signal=checkpoint)
+        crawler.signals.connect(s.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(s.item_failed, signal=signals.item_error)
+        crawler.signals.connect(s.item_failed, signal=signals.item_dropped)
+        return s
+
+    def spider_opened(self, spider):
+        self.index = DedupIndex(self.index_path)
+        if not len(self.index) and os.path.isfile(self.bootstrap_csv):
+            # first run with an index: seed it from what's already stored
+            self.index.bootstrap_from_csv(self.bootstrap_csv, headlines=self.check_headlines)
+            self.index.save()
+            spider.logger.info(f"Dedup index bootstrapped from {self.bootstrap_csv}")
+        spider.logger.info(f"Dedup index: {len(self.index)} entries in {self.index_path}")
+
+    def spider_closed(self, spider):
+        self.index.save()
+
+    def checkpoint(self):
+        if self.index is not None:
+            self.index.save()
+
+    async def process_spider_output(self, response, result, spider=None):
+        async for obj in result:
+            if not ItemAdapter.is_item(obj):
+                yield obj
+                continue
+            with self.metrics.time("dedup"):
+                new = self.is_new(ItemAdapter(obj))
+            if new:
+                yield obj
+
+    def item_scraped(self, item):
+        for k in self.keys(ItemAdapter(item)):
+            self.pending.discard(k)
+            self.index.add(k)
+
+    def item_failed(self, item):
+        # a failed or dropped item may come back on a later poll
+        self.pending.difference_update(self.keys(ItemAdapter(item)))
+
+    def keys(self, item):
+        keys = []
+        url = (item.get("url") or "").strip()
+        if url:
+            keys.append(url_hash(url))
+        headline = (item.get("headline") or "").strip()
+        if self.check_headlines and headline:
+            keys.append(headline_hash(headline))
+        return keys
+
+    def is_new(self, item):
+        keys = self.keys(item)
+        if any(k in self.index or k in self.pending for k in keys):
+            self.stats.inc_value("dedup/dropped")
+            return False
+        self.pending.update(keys)
+        self.stats.inc_value("dedup/new")
+        return True
@@ -1,49 +1,290 @@
-import csv
 import os
+import threading
+import time
 from datetime import datetime, timezone
-from email.utils import parsedate_to_datetime
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from transformers import pipeline
-import torch
+from twisted.internet import defer
+from twisted.internet.task import LoopingCall
+from twisted.python.failure import Failure
+
+from news_sentiment.cache import SentimentCache
+from news_sentiment.clusters import ClusterIndex
+from news_sentiment.dates import DEFAULT as DATES
+from news_sentiment.metrics import StageMetrics, stage_metrics
+from news_sentiment.scorers import NA, load_scorers, score_columns, scorer_specs, scorers_identity, skip_verdict
+from news_sentiment.signals import before_checkpoint, checkpoint
+from news_sentiment.storage import open_storage
+
+
+CUTOFF = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def parse_cutoff(value):
+    """PUBLISHED_CUTOFF ("YYYY-MM-DD" or an ISO timestamp, UTC unless it says otherwise) as a datetime."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        dt = datetime.fromisoformat(str(value))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def deferred_from_future(future):
+    """Wrap a concurrent.futures.Future in a Deferred fired on the reactor thread."""
+    from twisted.internet import reactor
+
+    d = defer.Deferred()
+
+    def done(f):
+        try:
+            result = f.result()
+        except BaseException as e:
+            reactor.callFromThread(d.errback, Failure(e))
+        else:
+            reactor.callFromThread(d.callback, result)
+
+    future.add_done_callback(done)
+    return d
 
 
 class NewsSentimentPipeline:
     CSV_PATH = "headlines.csv"
-    HEADER = [
-        "scraped_at",
-        "headline",
-        "source",
-        "category",
-        "url",
-        "published",
-        "vader_sentiment",
-        "finbert_label",
-        "finbert_score",
-    ]
-
-    def __init__(self):
-        # VADER is lightweight
-        self.analyzer = SentimentIntensityAnalyzer()
+
+    def __init__(self, batch_size=32, max_wait=5.0, cache_path=None, cache_max_entries=200_000, stats=None,
+                 preload=True, workers=0, worker_threads=None, worker_pin=True, storage=None, metrics=None,
+                 scorers=None, cutoff=CUTOFF, dates=None, clusters=None, reuse_cluster_scores=False,
+                 aggregate_dir=None):
+        # cheap scorers (VADER) run inline on every item; expensive ones
+        # (FinBERT) are batched, see news_sentiment.scorers
+        self.scorers = scorers if scorers is not None else load_scorers()
+        self.cheap = [s for s in self.scorers if not s.expensive]
+        self.expensive = [s for s in self.scorers if s.expensive]
+        self.by_name = {s.name: s for s in self.scorers}
+        self.columns = score_columns(self.scorers)
         self.seen_urls = set()
+        self.cutoff = cutoff  # items published before this are dropped (None keeps all)
+        # shared with feedparse, so its per-feed format memo and counters span both
+        self.dates = dates or DATES
+
+        # near-duplicate clustering: ClusterIndex kwargs, None disables it;
+        # members of a cluster take the scores of its first scored row
+        self.cluster_config = clusters
+        self.reuse_cluster_scores = reuse_cluster_scores
+        self.clusters = None
+
+        # state dir of news_sentiment.aggregate's daily sums, folded forward
+        # from the stored rows at every checkpoint (None leaves them alone)
+        self.aggregate_dir = aggregate_dir
+
+        # expensive scorers load their models on first use, or in a background
+        # thread started by open_spider so loading overlaps with the first
+        # feed downloads
+        self._open_lock = threading.Lock()
+        self.preload = preload
 
-        # Preload FinBERT sentiment model
-        device = 0 if torch.cuda.is_available() else -1
-        self.finbert = pipeline(
-            "sentiment-analysis",
-            model="ProsusAI/finbert",
-            tokenizer="ProsusAI/finbert",
-            device=device,
+        # with workers > 0, batches are scored in a ScoringPool of worker
+        # processes and the reactor thread keeps crawling meanwhile
+        self.workers = workers
+        self.worker_threads = worker_threads
+        self.worker_pin = worker_pin
+        self.pool = None
+        self.in_flight = set()
+
+        # micro-batching: rows wait in `pending` until the batch is full or
+        # the oldest one has waited `max_wait` seconds
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = max_wait
+        self.pending = []
+        self.pending_since = None
+        self.flusher = None
+
+        # cross-run score cache (None disables it)
+        self.cache_path = cache_path
+        self.cache_max_entries = cache_max_entries
+        self.cache = None
+        self.stats = stats
+
+        # per-stage timings and queue gauges, see news_sentiment.metrics
+        self.metrics = metrics or StageMetrics()
+        self.metrics.gauge("finbert_pending", lambda: len(self.pending))
+        self.metrics.gauge("finbert_in_flight", lambda: len(self.in_flight))
+
+        # {backend name: constructor kwargs}, see news_sentiment.storage
+        self.storage_config = storage or {"csv": {"path": self.CSV_PATH}}
+        self.storages = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = cls(
+            batch_size=crawler.settings.getint("FINBERT_BATCH_SIZE", 32),
+            max_wait=crawler.settings.getfloat("FINBERT_BATCH_MAX_WAIT", 5.0),
+            cache_path=crawler.settings.get("SENTIMENT_CACHE_PATH"),
+            cache_max_entries=crawler.settings.getint("SENTIMENT_CACHE_MAX_ENTRIES", 200_000),
+            stats=crawler.stats,
+            preload=crawler.settings.getbool("FINBERT_PRELOAD", True),
+            workers=crawler.settings.getint("FINBERT_WORKERS", 0),
+            worker_threads=crawler.settings.getint("FINBERT_WORKER_THREADS") or None,
+            worker_pin=crawler.settings.getbool("FINBERT_WORKER_PIN", True),
+            storage={
+                name: cls.storage_kwargs(name, crawler.settings)
+                for name in crawler.settings.getlist("STORAGE_BACKENDS", ["csv"])
+            },
+            metrics=stage_metrics(crawler),
+            scorers=load_scorers(scorer_specs(crawler.settings), crawler.settings),
+            cutoff=parse_cutoff(crawler.settings.get("PUBLISHED_CUTOFF")),
+            clusters=cls.cluster_kwargs(crawler.settings),
+            reuse_cluster_scores=crawler.settings.getbool("CLUSTER_REUSE_SCORES", False),
+            aggregate_dir=crawler.settings.get("AGGREGATE_STATE_DIR"),
         )
+        crawler.signals.connect(pipeline.flush_pending, signal=before_checkpoint)
+        crawler.signals.connect(pipeline.checkpoint, signal=checkpoint)
+        return pipeline
+
+    @classmethod
+    def storage_kwargs(cls, name, settings):
+        if name == "csv":
+            return {"path": cls.CSV_PATH}
+        if name == "parquet":
+            return {
+                "root": settings.get("PARQUET_ROOT", "headlines.parquet"),
+                "row_group_size": settings.getint("PARQUET_ROW_GROUP_SIZE", 10_000),
+            }
+        return {}
+
+    @staticmethod
+    def cluster_kwargs(settings):
+        if not settings.getbool("CLUSTER_ENABLED", True):
+            return None
+        return {
+            "path": settings.get("CLUSTER_INDEX_PATH"),
+            "threshold": settings.getfloat("CLUSTER_THRESHOLD", 0.7),
+            "max_entries": settings.getint("CLUSTER_MAX_ENTRIES", 100_000),
+            "window_hours": settings.getfloat("CLUSTER_WINDOW_HOURS", 48),
+        }
+
+    def _open_scorers(self):
+        with self._open_lock:
+            for scorer in self.expensive:
+                scorer.open()
+
+    def _preload_scorers(self, spider):
+        try:
+            self._open_scorers()
+        except Exception as e:
+            spider.logger.warning(f"Scorer preload failed, will retry on first batch: {e}")
 
     def open_spider(self, spider):
-        file_exists = os.path.isfile(self.CSV_PATH)
-        self.file = open(self.CSV_PATH, "a", newline="", encoding="utf-8")
-        self.writer = csv.writer(self.file)
-        if not file_exists:
-            self.writer.writerow(self.HEADER)
+        self.storages = [
+            open_storage(name, score_columns=self.columns, **kwargs) for name, kwargs in self.storage_config.items()
+        ]
+
+        if self.cluster_config is not None:
+            self.clusters = ClusterIndex(columns=list(self.columns), identity=scorers_identity(self.scorers),
+                                         **self.cluster_config)
+        if self.cache_path:
+            self.cache = SentimentCache(self.cache_path, scorers_identity(self.scorers), self.cache_max_entries)
+
+        if self.workers > 0 and self.expensive:
+            from news_sentiment.workers import ScoringPool
+
+            self.pool = ScoringPool(self.workers, self.worker_threads, self.worker_pin, self.expensive)
+            if self.preload:
+                self.pool.warm_up()
+        elif self.preload and self.expensive:
+            threading.Thread(target=self._preload_scorers, args=(spider,), daemon=True).start()
+
+        # flush partial batches when the feed stream goes quiet
+        if self.max_wait > 0:
+            self.flusher = LoopingCall(self._flush_if_stale, spider)
+            self.flusher.start(self.max_wait, now=False)
 
     def close_spider(self, spider):
-        self.file.close()
+        if self.flusher and self.flusher.running:
+            self.flusher.stop()
+        self.flush(spider)
+        # wait for batches still out with the workers before closing files
+        d = defer.DeferredList(list(self.in_flight))
+        d.addBoth(lambda _: self._close(spider))
+        return d
+
+    def flush_pending(self, spider):
+        """Score and write every pending row; fires once the batches out with the workers are written too."""
+        self.flush(spider)
+        return defer.DeferredList(list(self.in_flight))
+
+    def checkpoint(self):
+        # make what's been written so far durable/readable (daemon mode)
+        for storage in self.storages:
+            storage.checkpoint()
+        if self.cache:
+            self._count_evicted(self.cache.checkpoint())
+        # the dedup middleware remembers URLs across checkpoints; this set
+        # only has to catch repeats within one interval
+        self.seen_urls.clear()
+        self._count_dates()
+        self._save_clusters()
+        self._update_aggregates()
+
+    def _count_evicted(self, evicted):
+        if self.stats is not None and evicted:
+            self.stats.inc_value("sentiment_cache/evicted", evicted)
+
+    def _count_dates(self):
+        # dates/<format> per layout read, dates/memo_hits, dates/unparsed
+        counters = self.dates.take_counters()
+        if self.stats is not None:
+            for key, value in counters.items():
+                self.stats.inc_value(f"dates/{key}", value)
+
+    def _save_clusters(self):
+        # clusters/new, clusters/joined, clusters/expired, clusters/evicted
+        if self.clusters is None:
+            return
+        if self.stats is not None:
+            for key, value in self.clusters.take_counters().items():
+                self.stats.inc_value(f"clusters/{key}", value)
+            self.stats.set_value("clusters/entries", len(self.clusters))
+        self.clusters.save()
+
+    def _update_aggregates(self):
+        # read back only what was appended since the last fold (the aggregate
+        # watermark), so the sums news_sentiment.query answers from stay current
+        if not self.aggregate_dir:
+            return
+        from news_sentiment.aggregate import DailyAggregator
+
+        if "csv" in self.storage_config:
+            path, update = self.storage_config["csv"]["path"], DailyAggregator.update_from_csv
+        elif "parquet" in self.storage_config:
+            path, update = self.storage_config["parquet"]["root"], DailyAggregator.update_from_parquet
+        else:
+            return
+        if not os.path.exists(path):
+            return  # nothing stored yet
+        with self.metrics.time("aggregate"):
+            agg = DailyAggregator(self.aggregate_dir)
+            n = update(agg, path)
+            agg.save()
+        if self.stats is not None:
+            self.stats.inc_value("aggregate/rows", n)
+
+    def _close(self, spider):
+        self._log_scorer_stats(spider)
+        self._count_dates()
+        self._save_clusters()
+        unparsed = self.stats.get_value("dates/unparsed", 0) if self.stats is not None else 0
+        if unparsed:
+            spider.logger.warning(f"{unparsed} published dates could not be parsed; "
+                                  f"those items were kept regardless of PUBLISHED_CUTOFF")
+        for storage in self.storages:
+            storage.close()
+        self.storages = []  # a late checkpoint signal must not touch closed files
+        self._update_aggregates()
+        if self.cache:
+            self._count_evicted(self.cache.close())
+            self.cache = None
+        if self.pool:
+            self.pool.shutdown()
 
     def process_item(self, item, spider):
         # de-dup within a run
@@ -53,53 +294,217 @@ class NewsSentimentPipeline:
         if url:
             self.seen_urls.add(url)
 
-        # normalize published to UTC
+        # normalize published to UTC (feeds parsed by feedparse arrive with it done)
         published_raw = item.get("published")
-        published_dt = None
-        if published_raw:
-            try:
-                dt = parsedate_to_datetime(published_raw)
-                published_dt = dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
-                if published_dt.tzinfo is not timezone.utc:
-                    published_dt = published_dt.astimezone(timezone.utc)
-            except Exception:
-                published_dt = None
+        published_dt = item.get("published_utc")
+        if published_dt is None and published_raw:
+            with self.metrics.time("date"):
+                published_dt = self.dates.normalize(published_raw, item.get("source"))
 
         # cutoff to filter old items
-        cutoff = datetime(2025, 1, 1, tzinfo=timezone.utc)
-        if published_dt and published_dt < cutoff:
+        if self.cutoff and published_dt and published_dt < self.cutoff:
             return item
 
         headline = (item.get("headline") or "").strip()
         scraped_at = datetime.now(timezone.utc).isoformat()
+        row = {
+            "scraped_at": scraped_at,
+            "headline": headline,
+            "source": item.get("source"),
+            "category": item.get("category"),
+            "url": url,
+            "published": published_raw,
+            "published_utc": published_dt,
+        }
+
+        # --- near-duplicate of a story already seen: same cluster, same scores ---
+        slot = None  # the cluster's slot in the index, for remembering its scores
+        if self.clusters is not None and headline:
+            with self.metrics.time("cluster"):
+                cid, slot, shared, started = self.clusters.assign(headline, time.time())
+            row["cluster_id"] = cid
+            row["is_representative"] = started
+            if shared is not None and self.reuse_cluster_scores:
+                row.update(shared)
+                if self.stats is not None:
+                    self.stats.inc_value("clusters/reused_scores")
+                self.write_rows([row])
+                return item
+
+        # --- scores cached by an earlier run ---
+        if self.cache and headline:
+            with self.metrics.time("cache"):
+                cached = self.cache.get(headline)
+            if self.stats is not None:
+                self.stats.inc_value("sentiment_cache/hit" if cached else "sentiment_cache/miss")
+            if cached:
+                row.update(cached)
+                self._remember_cluster(row, slot)
+                self.write_rows([row])
+                return item
+
+        # --- cheap scorers (VADER), inline ---
+        for scorer in self.cheap:
+            with self.metrics.time(scorer.name):
+                row.update(scorer.score([headline], warn=spider.logger.warning)[0])
+
+        # --- expensive scorers (FinBERT), per batch, see flush ---
+        todo = []
+        for scorer in self.expensive:
+            verdict = skip_verdict(scorer, row, self.by_name)
+            if verdict is None:
+                todo.append(scorer.name)
+                continue
+            row.update(scorer.substitute(verdict[0]))
+            if self.stats is not None:
+                self.stats.inc_value(f"{scorer.name}/skipped")
+        if not todo:
+            self._store([row], [slot])
+            return item
+
+        # the returned Deferred fires with the item once its row is written
+        d = defer.Deferred()
+        if not self.pending:
+            self.pending_since = time.monotonic()
+        self.pending.append((row, item, d, todo, slot))
+        if len(self.pending) >= self.batch_size:
+            self.flush(spider)
+        return d
+
+    def _flush_if_stale(self, spider):
+        # an exception here would stop the LoopingCall for the rest of the crawl
+        try:
+            if self.pending and time.monotonic() - self.pending_since >= self.max_wait:
+                self.flush(spider)
+        except Exception as e:
+            spider.logger.error(f"Flushing a stale batch failed: {e}")
+
+    def flush(self, spider):
+        """Run each expensive scorer once over the pending rows that need it, then write them out."""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        self.pending_since = None
+        jobs = []
+        for scorer in self.expensive:
+            rows = [row for row, _, _, todo, _ in batch if scorer.name in todo]
+            if rows:
+                jobs.append((scorer, rows))
+
+        if self.pool is None:
+            for scorer, rows in jobs:
+                self._apply(rows, self._score_in_process(scorer, rows, spider))
+            self._write_batch(batch, spider)
+            return
+
+        d = defer.DeferredList([self._score_in_pool(scorer, rows, spider) for scorer, rows in jobs])
+        d.addCallback(lambda _: self._write_batch(batch, spider))
+        d.addErrback(lambda f: self._fail_batch([entry for entry in batch if not entry[2].called], f, spider))
+        self.in_flight.add(d)
+        d.addBoth(lambda _: self.in_flight.discard(d))
+
+    def _score_in_process(self, scorer, rows, spider):
+        # a scorer that fails to load or run leaves its columns N/A, as in the pool
+        try:
+            with self._open_lock:
+                scorer.open()
+            with self.metrics.time(scorer.name):
+                results = scorer.score([row["headline"] for row in rows], warn=spider.logger.warning)
+        except Exception as e:
+            spider.logger.warning(f"{scorer.name} failed on a batch of {len(rows)}: {e}")
+            results = [dict.fromkeys(scorer.columns, NA)] * len(rows)
+        self._count(scorer, scorer.take_counters())
+        return results
+
+    def _score_in_pool(self, scorer, rows, spider):
+        def scored(out):
+            results, warnings, counters = out
+            for w in warnings:
+                spider.logger.warning(w)
+            if counters.get("seconds"):
+                self.metrics.observe(scorer.name, counters["seconds"])
+            self._count(scorer, counters)
+            return results
+
+        def failed(failure):
+            spider.logger.warning(f"{scorer.name} worker failed on a batch of {len(rows)}: "
+                                  f"{failure.getErrorMessage()}")
+            return [dict.fromkeys(scorer.columns, NA)] * len(rows)
+
+        d = deferred_from_future(self.pool.submit([row["headline"] for row in rows], scorer.name))
+        d.addCallbacks(scored, failed)
+        d.addCallback(lambda results: self._apply(rows, results))
+        return d
+
+    @staticmethod
+    def _apply(rows, results):
+        for row, columns in zip(rows, results):
+            row.update(columns)
+
+    def _count(self, scorer, counters):
+        # for classifiers, tokens vs padded_tokens is the padding waste of the
+        # length buckets; seconds is summed over workers, so tokens/sec is per worker
+        if self.stats is None or not counters:
+            return
+        for key, value in counters.items():
+            self.stats.inc_value(f"{scorer.name}/{key}", value)
+        tokens = self.stats.get_value(f"{scorer.name}/tokens", 0)
+        padded = self.stats.get_value(f"{scorer.name}/padded_tokens", 0)
+        seconds = self.stats.get_value(f"{scorer.name}/seconds", 0)
+        if padded:
+            self.stats.set_value(f"{scorer.name}/padding_waste", round(1 - tokens / padded, 4))
+        if seconds and tokens:
+            self.stats.set_value(f"{scorer.name}/tokens_per_sec", round(tokens / seconds, 1))
+
+    def _log_scorer_stats(self, spider):
+        if self.stats is None:
+            return
+        for scorer in self.expensive:
+            name = scorer.name
+            if not self.stats.get_value(f"{name}/tokens"):
+                continue
+            spider.logger.info(
+                f"{name}: {self.stats.get_value(f'{name}/texts')} headlines, "
+                f"{self.stats.get_value(f'{name}/tokens')} tokens in {self.stats.get_value(f'{name}/batches')} passes, "
+                f"{self.stats.get_value(f'{name}/padding_waste', 0):.1%} padding, "
+                f"{self.stats.get_value(f'{name}/tokens_per_sec', 0):.0f} tokens/sec"
+            )
+
+    def _write_batch(self, batch, spider):
+        # every item's Deferred must fire, or Scrapy waits on it forever
+        try:
+            self._store([row for row, _, _, _, _ in batch], [slot for _, _, _, _, slot in batch])
+        except Exception:
+            self._fail_batch(batch, Failure(), spider)
+            return
+        for _, item, d, _, _ in batch:
+            d.callback(item)
+
+    @staticmethod
+    def _fail_batch(batch, failure, spider):
+        spider.logger.error(f"Failed to write a batch of {len(batch)}: {failure.getErrorMessage()}")
+        for _, _, d, _, _ in batch:
+            d.errback(failure)
+
+    def _store(self, rows, slots):
+        """Write fully scored rows and remember their scores for later runs and near-duplicates (by cluster slot)."""
+        self.write_rows(rows)
+        # a row an expensive scorer failed on is scored again next time
+        scored = [
+            (row, slot) for row, slot in zip(rows, slots)
+            if row["headline"] and not any(all(row.get(c) == NA for c in s.columns) for s in self.expensive)
+        ]
+        for row, slot in scored:
+            self._remember_cluster(row, slot)
+        if self.cache:
+            self.cache.put_many((row["headline"], {column: row.get(column) for column in self.columns})
+                                for row, _ in scored)
+
+    def _remember_cluster(self, row, slot):
+        if self.clusters is not None and row.get("cluster_id"):
+            self.clusters.remember(slot, row["cluster_id"], row)
 
-        # --- VADER ---
-        vader_sentiment = ""
-        if headline:
-            scores = self.analyzer.polarity_scores(headline)
-            vader_sentiment = round(scores["compound"], 4)
-
-        # --- FinBERT ---
-        finbert_label, finbert_score = "N/A", "N/A"
-        if headline:
-            try:
-                result = self.finbert(headline[:512])  # truncate if long
-                if result and isinstance(result, list):
-                    finbert_label = result[0]["label"]
-                    finbert_score = round(float(result[0]["score"]), 4)
-            except Exception as e:
-                spider.logger.warning(f"FinBERT error on '{headline}': {e}")
-
-        # Write CSV row
-        self.writer.writerow([
-            scraped_at,
-            headline,
-            item.get("source"),
-            item.get("category"),
-            url,
-            published_raw,
-            vader_sentiment,
-            finbert_label,
-            finbert_score,
-        ])
-        return item
\ No newline at end of file
+    def write_rows(self, rows):
+        with self.metrics.time("write"):
+            for storage in self.storages:
+                storage.write(rows)
@@ -0,0 +1,194 @@
+# Sentiment queries over the daily pre-aggregates.
+#
+#   python -m news_sentiment.query --start 2025-10-01 --end 2025-10-31
+#   python -m news_sentiment.query --source Reuters,CNBC --group-by source,category
+#   python -m news_sentiment.query --category business --group-by date --weight cluster --out business.csv
+#
+# Answers range and group-by queries from the running (date, source,
+# category) sums that news_sentiment.aggregate keeps under .state/, which the
+# pipeline also folds new rows into at every checkpoint (AGGREGATE_STATE_DIR).
+# The scored rows themselves are never read. The sums are held as arrays
+# sorted by date, with an index from each date to its first row and from
+# each source to its rows, so a query only touches the rows it selects. The
+# arrays are cached in .state/query_index.npz until the sums change.
+#
+#     from news_sentiment.query import SentimentQuery
+#     SentimentQuery().query(start="2025-10-01", sources=["Reuters"], group_by=["date", "category"])
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from news_sentiment.aggregate import KEYS, SUMS, derive
+
+
+class SentimentQuery:
+    """
+    Range and group-by queries over (date, source, category) sums. Results
+    have the columns of daily_summary.csv: the group keys, count, avg_vader
+    and the FinBERT label shares.
+    """
+
+    def __init__(self, state_dir=".state"):
+        self.sums_path = os.path.join(state_dir, "daily_sums.csv")
+        self.index_path = os.path.join(state_dir, "query_index.npz")
+        self.stamp = None
+        self._build(pd.DataFrame(columns=KEYS + SUMS))
+        self.refresh()
+
+    @classmethod
+    def from_sums(cls, sums):
+        """A query over an in-memory sums frame (DailyAggregator.sums) instead of .state/."""
+        query = cls.__new__(cls)
+        query.sums_path = query.index_path = None
+        query.stamp = None
+        query._build(sums)
+        return query
+
+    def refresh(self):
+        """Pick up sums saved since the last load; cheap when nothing changed."""
+        if not self.sums_path or not os.path.isfile(self.sums_path):
+            return False
+        st = os.stat(self.sums_path)
+        stamp = f"{st.st_size}:{st.st_mtime_ns}"
+        if stamp == self.stamp:
+            return False
+        if not self._load_index(stamp):
+            sums = pd.read_csv(self.sums_path, dtype={"date": str, "source": str, "category": str},
+                               keep_default_na=False)
+            for name in SUMS:
+                if name not in sums:
+                    # folded before story sums existed, as in DailyAggregator
+                    sums[name] = sums[name.replace("story_", "")] if name != "stories" else sums["count"]
+            self._build(sums)
+            self._save_index(stamp)
+        self.stamp = stamp
+        return True
+
+    def _build(self, sums):
+        sums = sums.sort_values(KEYS, kind="stable")
+        date_codes, self.dates = pd.factorize(sums["date"].astype(str), sort=True)
+        source_codes, self.sources = pd.factorize(sums["source"].astype(str), sort=True)
+        category_codes, self.categories = pd.factorize(sums["category"].astype(str), sort=True)
+        self.dates, self.sources, self.categories = (np.asarray(v, dtype=str)
+                                                     for v in (self.dates, self.sources, self.categories))
+        self.date_codes = date_codes.astype(np.int32)
+        self.source_codes = source_codes.astype(np.int32)
+        self.category_codes = category_codes.astype(np.int32)
+        self.values = sums[SUMS].to_numpy(np.float64) if len(sums) else np.zeros((0, len(SUMS)))
+        # date index: rows of date i are date_start[i]:date_start[i + 1]
+        self.date_start = np.searchsorted(self.date_codes, np.arange(len(self.dates) + 1))
+        # source index: rows of source j, in date order, are
+        # source_rows[source_start[j]:source_start[j + 1]]
+        self.source_rows = np.argsort(self.source_codes, kind="stable").astype(np.int64)
+        self.source_start = np.searchsorted(self.source_codes[self.source_rows], np.arange(len(self.sources) + 1))
+        self._source_ids = {name: i for i, name in enumerate(self.sources.tolist())}
+        self._category_ids = {name: i for i, name in enumerate(self.categories.tolist())}
+
+    _ARRAYS = ("dates", "sources", "categories", "date_codes", "source_codes", "category_codes", "values",
+               "date_start", "source_rows", "source_start")
+
+    def _load_index(self, stamp):
+        if not os.path.isfile(self.index_path):
+            return False
+        with np.load(self.index_path) as data:
+            if str(data["stamp"]) != stamp or list(data["sums"]) != SUMS:
+                return False
+            for name in self._ARRAYS:
+                setattr(self, name, data[name])
+        self._source_ids = {name: i for i, name in enumerate(self.sources.tolist())}
+        self._category_ids = {name: i for i, name in enumerate(self.categories.tolist())}
+        return True
+
+    def _save_index(self, stamp):
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, stamp=np.array(stamp), sums=np.array(SUMS),
+                     **{name: getattr(self, name) for name in self._ARRAYS})
+        os.replace(tmp, self.index_path)
+
+    def __len__(self):
+        return len(self.values)
+
+    def rows(self, start=None, end=None, sources=None, categories=None):
+        """Positions of the sums rows with start <= date <= end (ISO dates) in `sources` and `categories`."""
+        lo = self.date_start[np.searchsorted(self.dates, start, "left")] if start else 0
+        hi = self.date_start[np.searchsorted(self.dates, end, "right")] if end else len(self.values)
+        if sources is not None:
+            picked = []
+            for code in sorted(self._source_ids[s] for s in sources if s in self._source_ids):
+                rows = self.source_rows[self.source_start[code]:self.source_start[code + 1]]
+                # each source's rows are in date order, so the range is a slice of them too
+                picked.append(rows[np.searchsorted(rows, lo):np.searchsorted(rows, hi)])
+            rows = np.concatenate(picked) if picked else np.zeros(0, np.int64)
+        else:
+            rows = np.arange(lo, hi)
+        if categories is not None:
+            wanted = [self._category_ids[c] for c in categories if c in self._category_ids]
+            rows = rows[np.isin(self.category_codes[rows], wanted)]
+        return rows
+
+    def query(self, start=None, end=None, sources=None, categories=None, group_by=("date",), weight="row"):
+        """
+        Summaries of the selected sums grouped by `group_by` (any of date,
+        source, category); weight="cluster" counts each near-duplicate story once.
+        """
+        group_by = list(group_by)
+        unknown = set(group_by) - set(KEYS)
+        if unknown or not group_by:
+            raise ValueError(f"group_by must be a non-empty subset of {KEYS}, got {group_by}")
+        rows = self.rows(start, end, sources, categories)
+        if not rows.size:
+            return derive(pd.DataFrame(columns=group_by + SUMS), group_by, weight)
+        codes = {"date": self.date_codes, "source": self.source_codes, "category": self.category_codes}
+        names = {"date": self.dates, "source": self.sources, "category": self.categories}
+        dims = [len(names[key]) for key in group_by]
+        # np.unique sorts the combined codes, so groups come out in `group_by` order
+        groups, inverse = np.unique(np.ravel_multi_index([codes[key][rows] for key in group_by], dims),
+                                    return_inverse=True)
+        values = self.values[rows]
+        frame = pd.DataFrame({name: np.bincount(inverse, weights=values[:, i], minlength=len(groups))
+                              for i, name in enumerate(SUMS)})
+        for key, key_codes in zip(group_by, np.unravel_index(groups, dims)):
+            frame[key] = names[key][key_codes]
+        out = derive(frame, group_by, weight)
+        out["count"] = out["count"].astype(int)
+        return out.reset_index(drop=True)
+
+
+def _names(value):
+    return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query daily sentiment sums by date range, source and category")
+    parser.add_argument("--state-dir", default=".state")
+    parser.add_argument("--start", help="first date, YYYY-MM-DD (inclusive)")
+    parser.add_argument("--end", help="last date, YYYY-MM-DD (inclusive)")
+    parser.add_argument("--source", help="comma-separated sources")
+    parser.add_argument("--category", help="comma-separated categories")
+    parser.add_argument("--group-by", default="date", help=f"comma-separated, from {','.join(KEYS)}")
+    parser.add_argument("--weight", choices=["row", "cluster"], default="row",
+                        help="count every row (default) or each near-duplicate story once")
+    parser.add_argument("--out", help="write the result to this CSV instead of printing it")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    q = SentimentQuery(args.state_dir)
+    loaded = time.perf_counter()
+    result = q.query(args.start, args.end, _names(args.source), _names(args.category), _names(args.group_by),
+                     args.weight)
+    done = time.perf_counter()
+    if args.out:
+        result.to_csv(args.out, index=False)
+    else:
+        print(result.to_string(index=False))
+    print(f"✅ {len(result)} groups from {len(q)} pre-aggregated rows "
+          f"(load {(loaded - started) * 1000:.1f} ms, query {(done - loaded) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import json
+import os
+import time
+
+# a feed counts as due a little early, so a scheduler firing every N minutes
+# doesn't skip a feed with refresh_interval N because of a few seconds' jitter
+SLACK = 0.1
+
+
+class FeedSchedule:
+    """
+    When each feed was last polled, so feeds with a refresh_interval
+    (minutes, from feeds.json) are only requested once they're due. Feeds
+    without one use `default_interval`; with the default of 0 they're due
+    on every run. Without a `path` the schedule lives only in memory.
+    """
+
+    def __init__(self, path=None, default_interval=0):
+        self.path = path
+        self.default_interval = default_interval
+        self.last = {}
+        self.previous = {}
+        if path and os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                self.last = json.load(f)
+
+    def seconds_until_due(self, feed, now=None):
+        now = time.time() if now is None else now
+        interval = float(feed.get("refresh_interval") or self.default_interval or 0) * 60
+        last = self.last.get(feed["url"])
+        if not interval or last is None:
+            return 0.0
+        return max(0.0, last + interval * (1 - SLACK) - now)
+
+    def due(self, feed, now=None):
+        return self.seconds_until_due(feed, now) == 0.0
+
+    def mark(self, url, now=None):
+        self.previous[url] = self.last.get(url)
+        self.last[url] = time.time() if now is None else now
+
+    def forget(self, url):
+        """Undo mark(), e.g. when the request failed and the feed should be retried next run."""
+        if url not in self.previous:
+            return
+        prev = self.previous.pop(url)
+        if prev is None:
+            self.last.pop(url, None)
+        else:
+            self.last[url] = prev
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.last, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
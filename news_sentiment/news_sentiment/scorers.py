@@ -0,0 +1,261 @@
+"""
+Sentiment scorers: the models the pipeline runs on each headline.
+
+SENTIMENT_SCORERS lists them in order as {"class": dotted path, **kwargs}.
+Each scorer writes its own columns. Cheap scorers (VADER) run inline on
+every item. Expensive ones (FinBERT, other transformers) wait in the
+pipeline's micro-batches and, with FINBERT_WORKERS, run in the scoring
+worker processes.
+
+An expensive scorer configured with
+
+    "skip_if": {"scorer": "vader", "confidence": 0.9}
+
+is not run on headlines that the named cheap scorer is at least that
+confident about. Its columns are filled from the cheap scorer's label
+instead (see Scorer.substitute), and the skips are counted in the
+<name>/skipped stat.
+"""
+
+import json
+from abc import ABC, abstractmethod
+from importlib.metadata import version
+
+from scrapy.utils.misc import load_object
+
+from news_sentiment.scoring import FINBERT_MODEL, MAX_PADDING, build_finbert, export_onnx, score_finbert
+
+NA = "N/A"
+
+# column kinds: "label" (text, NA when missing), "score" (float, NA when
+# missing) and "float" (float, empty when missing)
+KINDS = ("label", "score", "float")
+
+
+class Scorer(ABC):
+    """Base class; subclasses set `name` and `columns` and implement score()."""
+
+    name = None
+    columns = {}  # {column: kind}, in output order
+    expensive = False
+
+    def __init__(self, name=None, skip_if=None):
+        self.name = name or self.name
+        self.skip_if = skip_if
+
+    @classmethod
+    def from_settings(cls, settings, **kwargs):
+        return cls(**kwargs)
+
+    def identity(self):
+        """Changes whenever the scores would; part of the sentiment cache's model id."""
+        return self.name
+
+    def prepare(self):
+        """One-off setup that every process opening the scorer shares; run once before the scoring workers start."""
+
+    def open(self, threads=None):
+        """Load models. Expensive scorers are opened off the reactor thread or in a worker."""
+
+    @abstractmethod
+    def score(self, headlines, warn=print):
+        """One {column: value} dict per headline."""
+
+    def verdict(self, scores):
+        """(label, confidence in [0, 1]) from one headline's columns, or None if it has none."""
+        return None
+
+    def substitute(self, label):
+        """The columns to write when skipped because a cheap scorer was confident of `label`."""
+        return dict.fromkeys(self.columns, NA)
+
+    def take_counters(self):
+        """Counters (tokens, seconds, ...) since the last call; published as <name>/* stats."""
+        return {}
+
+
+class VaderScorer(Scorer):
+    name = "vader"
+    columns = {"vader_sentiment": "float"}
+
+    # the thresholds VADER's authors recommend for labelling the compound score
+    POSITIVE = 0.05
+    NEGATIVE = -0.05
+
+    def __init__(self, name=None, skip_if=None):
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+        super().__init__(name, skip_if)
+        self.analyzer = SentimentIntensityAnalyzer()
+        self.column = next(iter(self.columns))
+
+    def identity(self):
+        return f"vader-{version('vaderSentiment')}"
+
+    def score(self, headlines, warn=print):
+        return [
+            {self.column: round(self.analyzer.polarity_scores(h)["compound"], 4) if h else ""}
+            for h in headlines
+        ]
+
+    def verdict(self, scores):
+        compound = scores.get(self.column)
+        if compound in ("", None):
+            return None
+        if compound >= self.POSITIVE:
+            label = "positive"
+        elif compound <= self.NEGATIVE:
+            label = "negative"
+        else:
+            label = "neutral"
+        return label, abs(compound)
+
+
+class ClassifierScorer(Scorer):
+    """
+    Any hub sequence classifier, run like FinBERT (see news_sentiment.scoring).
+    Writes <prefix>_label and <prefix>_score, prefix defaulting to the name.
+    """
+
+    expensive = True
+
+    def __init__(self, model, name=None, prefix=None, backend="torch", max_length=None, max_padding=MAX_PADDING,
+                 skip_if=None):
+        super().__init__(name or model.rpartition("/")[2].lower(), skip_if)
+        self.model = model
+        self.backend = backend
+        self.max_length = max_length
+        self.max_padding = max_padding
+        prefix = prefix or self.name
+        self.label_column, self.score_column = f"{prefix}_label", f"{prefix}_score"
+        self.columns = {self.label_column: "label", self.score_column: "score"}
+        self.threads = None
+        self.classifier = None
+
+    @classmethod
+    def from_settings(cls, settings, **kwargs):
+        kwargs.setdefault("max_length", settings.getint("FINBERT_MAX_TOKENS") or None)
+        kwargs.setdefault("max_padding", settings.getfloat("FINBERT_MAX_PADDING", MAX_PADDING))
+        return cls(**kwargs)
+
+    def __getstate__(self):
+        # sent to scoring workers unopened; each loads its own model
+        return {**self.__dict__, "classifier": None}
+
+    def identity(self):
+        from news_sentiment.cache import resolve_model_id
+
+        # other backends can score slightly differently, so they get their own entries
+        return resolve_model_id(self.model) + ("" if self.backend == "torch" else f"+{self.backend}")
+
+    def prepare(self):
+        if self.backend == "onnx":
+            export_onnx(model=self.model)
+
+    def open(self, threads=None):
+        self.threads = threads or self.threads
+        if self.classifier is None:
+            self.classifier = build_finbert(self.backend, threads=self.threads, max_length=self.max_length,
+                                            max_padding=self.max_padding, model=self.model)
+
+    def score(self, headlines, warn=print):
+        self.open()
+        return [
+            {self.label_column: label, self.score_column: score}
+            for label, score in score_finbert(self.classifier, headlines, warn=warn)
+        ]
+
+    def verdict(self, scores):
+        label, score = scores.get(self.label_column), scores.get(self.score_column)
+        if label in (NA, None) or score in (NA, None):
+            return None
+        return label, score
+
+    def substitute(self, label):
+        return {self.label_column: label, self.score_column: NA}
+
+    def take_counters(self):
+        return self.classifier.take_counters() if self.classifier is not None else {}
+
+
+class FinbertScorer(ClassifierScorer):
+    """ProsusAI/finbert on FINBERT_BACKEND; writes finbert_label and finbert_score."""
+
+    def __init__(self, model=FINBERT_MODEL, name="finbert", **kwargs):
+        super().__init__(model, name=name, **kwargs)
+
+    @classmethod
+    def from_settings(cls, settings, **kwargs):
+        kwargs.setdefault("backend", settings.get("FINBERT_BACKEND", "torch"))
+        return super().from_settings(settings, **kwargs)
+
+
+DEFAULT_SCORERS = [
+    {"class": "news_sentiment.scorers.VaderScorer"},
+    {"class": "news_sentiment.scorers.FinbertScorer"},
+]
+
+
+def scorer_specs(settings):
+    """
+    SENTIMENT_SCORERS from `settings`. On the command line it is given as a
+    JSON list: -s 'SENTIMENT_SCORERS=[{"class": "news_sentiment.scorers.VaderScorer"}]'.
+    """
+    specs = settings.get("SENTIMENT_SCORERS", DEFAULT_SCORERS)
+    if isinstance(specs, str):
+        specs = json.loads(specs)
+    return list(specs)
+
+
+def load_scorers(specs=DEFAULT_SCORERS, settings=None):
+    """Build the scorers listed in `specs` (SENTIMENT_SCORERS) and check they fit together."""
+    scorers = []
+    for spec in specs:
+        kwargs = dict(spec)
+        cls = load_object(kwargs.pop("class"))
+        scorers.append(cls.from_settings(settings, **kwargs) if settings is not None else cls(**kwargs))
+
+    names, columns = set(), set()
+    for scorer in scorers:
+        if scorer.name in names:
+            raise ValueError(f"Two sentiment scorers are named {scorer.name!r}; give one a different name")
+        names.add(scorer.name)
+        for column, kind in scorer.columns.items():
+            if column in columns:
+                raise ValueError(f"Sentiment scorer {scorer.name!r} writes column {column!r} again")
+            if kind not in KINDS:
+                raise ValueError(f"Column {column!r} of {scorer.name!r} has unknown kind {kind!r}")
+            columns.add(column)
+
+    cheap = {s.name for s in scorers if not s.expensive}
+    for scorer in scorers:
+        if scorer.skip_if and (not scorer.expensive or scorer.skip_if.get("scorer") not in cheap):
+            raise ValueError(f"skip_if on {scorer.name!r} must name a cheap scorer, one of {sorted(cheap)}, "
+                             f"and only expensive scorers can be skipped")
+    return scorers
+
+
+def skip_verdict(scorer, row, by_name):
+    """The skip_if scorer's verdict on `row` if it's confident enough to skip `scorer`, else None."""
+    if not scorer.skip_if:
+        return None
+    verdict = by_name[scorer.skip_if["scorer"]].verdict(row)
+    if verdict is None or verdict[1] < scorer.skip_if["confidence"]:
+        return None
+    return verdict
+
+
+def score_columns(scorers):
+    """{column: kind} over all scorers, in output order."""
+    return {column: kind for scorer in scorers for column, kind in scorer.columns.items()}
+
+
+def scorers_identity(scorers):
+    """The sentiment cache's model id: every scorer's identity and skip rule."""
+    parts = []
+    for scorer in scorers:
+        part = scorer.identity()
+        if scorer.skip_if:
+            part += f"?skip_if={scorer.skip_if['scorer']}>={scorer.skip_if['confidence']}"
+        parts.append(part)
+    return "+".join(parts)
@@ -0,0 +1,252 @@
+import os
+import shutil
+import time
+from abc import ABC, abstractmethod
+
+FINBERT_MODEL = "ProsusAI/finbert"
+
+# "torch": the transformers model in fp32 (the reference)
+# "torch-int8": same, with Linear layers dynamically quantized to int8
+# "onnx": ONNX Runtime on an fp32 export of the model (exported once, cached)
+BACKENDS = ("torch", "torch-int8", "onnx")
+ONNX_DIR = ".state/onnx"
+
+# what FinbertClassifier.counters tracks
+COUNTERS = ("texts", "tokens", "padded_tokens", "batches", "seconds")
+
+
+# A FinBERT call tokenizes all of its headlines at once, sorts them by token
+# length and cuts the sorted run into forward passes of at most `batch_size`,
+# starting a new one whenever padding would exceed MAX_PADDING of the tokens
+# in the pass. Passes hold at least MIN_BUCKET headlines, since on CPU a
+# handful of extra pad tokens costs less than another forward pass.
+# Headlines longer than max_length tokens are truncated.
+MAX_PADDING = 0.25
+MIN_BUCKET = 8
+
+
+def build_finbert(backend="torch", threads=None, onnx_dir=ONNX_DIR, max_length=None, max_padding=MAX_PADDING,
+                  model=FINBERT_MODEL):
+    """
+    A FinBERT classifier for `backend`. Every backend is called like the
+    transformers pipeline: finbert(texts, batch_size=n) -> [{"label", "score"}].
+    Any other sequence-classification `model` from the hub works the same way.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown FinBERT backend {backend!r}; expected one of {list(BACKENDS)}")
+    if backend == "onnx":
+        return OnnxFinbert(export_onnx(onnx_dir, model), threads=threads, max_length=max_length,
+                           max_padding=max_padding)
+
+    # torch/transformers take seconds and hundreds of MB to import, so they
+    # are only pulled in once a model is actually needed
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    device = "cuda" if torch.cuda.is_available() and backend == "torch" else "cpu"
+    classifier = AutoModelForSequenceClassification.from_pretrained(model).eval()
+    if backend == "torch-int8":
+        classifier = torch.ao.quantization.quantize_dynamic(classifier, {torch.nn.Linear}, dtype=torch.qint8)
+    return TorchFinbert(
+        classifier.to(device),
+        AutoTokenizer.from_pretrained(model, use_fast=True),
+        device=device,
+        max_length=max_length,
+        max_padding=max_padding,
+    )
+
+
+def export_onnx(onnx_dir=ONNX_DIR, model=FINBERT_MODEL):
+    """
+    Export FinBERT (or `model`) to ONNX once per model revision; returns the
+    directory holding it. Each process exports into its own temporary
+    directory and renames it into place, so concurrent exports don't mix.
+    """
+    from news_sentiment.cache import resolve_model_id
+
+    revision = resolve_model_id(model).rpartition("@")[2][:12] or "latest"
+    out_dir = os.path.join(onnx_dir, f"{model.rpartition('/')[2].lower()}-{revision}")
+    model_path = os.path.join(out_dir, "model.onnx")
+    if os.path.isfile(model_path):
+        return out_dir
+
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    # eager attention traces to a plain masked softmax; the sdpa path bakes
+    # in shape-dependent branches that break on padded batches
+    classifier = AutoModelForSequenceClassification.from_pretrained(model, attn_implementation="eager").eval()
+    tokenizer = AutoTokenizer.from_pretrained(model)
+    sample = tokenizer(["Stocks rally as inflation cools", "Markets slip"], padding=True, return_tensors="pt")
+    # positional, so in forward()'s order rather than the tokenizer's
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    tmp_dir = f"{out_dir}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            classifier,
+            tuple(sample[n] for n in names),
+            os.path.join(tmp_dir, "model.onnx"),
+            input_names=names,
+            output_names=["logits"],
+            dynamic_axes={**{n: {0: "batch", 1: "sequence"} for n in names}, "logits": {0: "batch"}},
+            opset_version=17,
+            dynamo=False,
+        )
+    tokenizer.save_pretrained(tmp_dir)
+    classifier.config.save_pretrained(tmp_dir)
+    if os.path.isdir(out_dir) and not os.path.isfile(model_path):
+        shutil.rmtree(out_dir, ignore_errors=True)  # left by an interrupted export
+    try:
+        os.rename(tmp_dir, out_dir)
+    except OSError:
+        # another process got there first; its export is just as good
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return out_dir
+
+
+class FinbertClassifier(ABC):
+    """
+    Bulk tokenization, length-bucketed batching and softmax shared by the
+    backends; subclasses only run the model (`logits`). `counters` tally
+    texts, real and padded tokens, forward passes and seconds spent since
+    the last take_counters().
+    """
+
+    def __init__(self, tokenizer, id2label, max_length=None, max_padding=MAX_PADDING):
+        self.tokenizer = tokenizer
+        self.id2label = id2label
+        self.max_length = max_length or min(tokenizer.model_max_length, 512)
+        self.max_padding = max_padding
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    @abstractmethod
+    def logits(self, batch):
+        """Logits (numpy, batch x labels) for a dict of padded int64 arrays."""
+
+    def buckets(self, lengths, batch_size):
+        """Indices into `lengths`, grouped into forward passes of similar length."""
+        batches, current, real = [], [], 0
+        for i in sorted(range(len(lengths)), key=lengths.__getitem__):
+            n = lengths[i]  # the longest so far, since lengths ascend
+            padding = 1 - (real + n) / ((len(current) + 1) * n)
+            if len(current) >= batch_size or (len(current) >= MIN_BUCKET and padding > self.max_padding):
+                batches.append(current)
+                current, real = [], 0
+            current.append(i)
+            real += n
+        if current:
+            batches.append(current)
+        return batches
+
+    def pad(self, encoded, indices):
+        import numpy as np
+
+        width = max(len(encoded["input_ids"][i]) for i in indices)
+        batch = {}
+        for key, rows in encoded.items():
+            fill = self.tokenizer.pad_token_id if key == "input_ids" else 0
+            arr = np.full((len(indices), width), fill, dtype=np.int64)
+            for row, i in enumerate(indices):
+                arr[row, :len(rows[i])] = rows[i]
+            batch[key] = arr
+        return batch
+
+    def __call__(self, texts, batch_size=None):
+        import numpy as np
+
+        if isinstance(texts, str):
+            texts = [texts]
+        start = time.perf_counter()
+        encoded = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+
+        out = [None] * len(texts)
+        batches = self.buckets(lengths, batch_size or len(texts))
+        for indices in batches:
+            batch = self.pad(encoded, indices)
+            logits = self.logits(batch)
+            probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probs /= probs.sum(axis=1, keepdims=True)
+            for i, row in zip(indices, probs):
+                best = int(row.argmax())
+                out[i] = {"label": self.id2label[best], "score": float(row[best])}
+            self.counters["padded_tokens"] += batch["input_ids"].size
+
+        self.counters["texts"] += len(texts)
+        self.counters["tokens"] += sum(lengths)
+        self.counters["batches"] += len(batches)
+        self.counters["seconds"] += time.perf_counter() - start
+        return out
+
+    def take_counters(self):
+        counters, self.counters = self.counters, dict.fromkeys(COUNTERS, 0)
+        return counters
+
+
+class TorchFinbert(FinbertClassifier):
+    """FinBERT as a (possibly quantized) transformers model."""
+
+    def __init__(self, model, tokenizer, device="cpu", **kwargs):
+        super().__init__(tokenizer, model.config.id2label, **kwargs)
+        self.model = model
+        self.device = device
+
+    def logits(self, batch):
+        import torch
+
+        with torch.inference_mode():
+            inputs = {k: torch.from_numpy(v).to(self.device) for k, v in batch.items()}
+            return self.model(**inputs).logits.float().cpu().numpy()
+
+
+class OnnxFinbert(FinbertClassifier):
+    """FinBERT on ONNX Runtime's CPU provider."""
+
+    def __init__(self, model_dir, threads=None, **kwargs):
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoTokenizer
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        super().__init__(
+            AutoTokenizer.from_pretrained(model_dir, use_fast=True),
+            AutoConfig.from_pretrained(model_dir).id2label,
+            **kwargs,
+        )
+
+    def logits(self, batch):
+        return self.session.run(["logits"], {k: v for k, v in batch.items() if k in self.input_names})[0]
+
+
+def score_finbert(finbert, headlines, warn=print):
+    """Return one (label, score) pair per headline, "N/A" where scoring fails."""
+    results = [("N/A", "N/A")] * len(headlines)
+    todo = [i for i, h in enumerate(headlines) if h]
+    if not todo:
+        return results
+
+    # the classifier truncates by tokens (max_length), not characters
+    texts = [headlines[i] for i in todo]
+    try:
+        outputs = finbert(texts, batch_size=len(texts))
+    except Exception as e:
+        # one bad headline shouldn't cost the whole batch; retry singly
+        warn(f"FinBERT batch of {len(texts)} failed ({e}); retrying one by one")
+        outputs = []
+        for headline, text in zip((headlines[i] for i in todo), texts):
+            try:
+                outputs.append(finbert(text)[0])
+            except Exception as e:
+                warn(f"FinBERT error on '{headline}': {e}")
+                outputs.append(None)
+
+    for i, out in zip(todo, outputs):
+        if out:
+            results[i] = (out["label"], round(float(out["score"]), 4))
+    return results
@@ -22,9 +22,25 @@ ADDONS = {}
 ROBOTSTXT_OBEY = False
 
 # Concurrency and throttling settings
+# With HOST_THROTTLE_ENABLED these are only the starting point for a host the
+# throttle hasn't seen before; each host's concurrency and delay are then
+# learned from its latency and errors, within the bounds below, and kept in
+# HOST_THROTTLE_STATE_PATH between crawls.
 #CONCURRENT_REQUESTS = 16
 CONCURRENT_REQUESTS_PER_DOMAIN = 1
 DOWNLOAD_DELAY = 1
+HOST_THROTTLE_ENABLED = True
+HOST_THROTTLE_MIN_CONCURRENCY = 1
+HOST_THROTTLE_MAX_CONCURRENCY = 4
+HOST_THROTTLE_MIN_DELAY = 0.25
+HOST_THROTTLE_MAX_DELAY = 30.0
+HOST_THROTTLE_TARGET_LATENCY = 2.0
+HOST_THROTTLE_MAX_ERROR_RATE = 0.2
+HOST_THROTTLE_STATE_PATH = ".state/host_throttle.json"
+
+# Feeds with a refresh_interval (minutes) in feeds.json are only requested
+# once that long has passed since their last poll, recorded here.
+FEED_SCHEDULE_PATH = ".state/feed_schedule.json"
 
 # Disable cookies (enabled by default)
 #COOKIES_ENABLED = False
@@ -40,21 +56,64 @@ DOWNLOAD_DELAY = 1
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
+SPIDER_MIDDLEWARES = {
 #    "news_sentiment.middlewares.NewsSentimentSpiderMiddleware": 543,
-#}
+    "news_sentiment.middlewares.HeadlineDedupMiddleware": 550,
+}
+
+# Cross-run dedup: sorted 64-bit hashes of every stored URL. Items already in
+# the index are dropped before scoring. DEDUP_HEADLINES also drops items whose
+# normalized headline was stored before under a different URL.
+DEDUP_INDEX_PATH = ".state/dedup.idx"
+DEDUP_HEADLINES = False
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "news_sentiment.middlewares.NewsSentimentDownloaderMiddleware": 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    "news_sentiment.middlewares.ConditionalGetMiddleware": 543,
+    "news_sentiment.middlewares.HostThrottleMiddleware": 560,
+}
+
+# Conditional GET: each feed's ETag, Last-Modified and body hash are kept
+# here between crawls. Feeds that answer 304, or whose body hasn't changed,
+# are skipped before parsing (see conditional_get/* in the crawl stats).
+# Set to None to always fetch and parse every feed.
+CONDITIONAL_GET_STATE_PATH = ".state/feed_validators.json"
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
+EXTENSIONS = {
 #    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+    "news_sentiment.daemon.FeedDaemon": 500,
+    "news_sentiment.metrics.RunMetrics": 510,
+}
+
+# Per-stage timing histograms (fetch, parse, dedup, date, cluster, cache,
+# vader, finbert, write) and queue depths sampled every METRICS_SAMPLE_INTERVAL
+# seconds, published as stage/* and queue/* stats. At the end of each crawl
+# a JSON report (histograms, queues, all stats) is written to RUN_REPORT_DIR
+# (None to skip). PROFILE = "cprofile" profiles the whole run into a .prof
+# beside the report; "py-spy" records a flamegraph instead (needs py-spy on
+# PATH, and usually root or ptrace permission). Either needs RUN_REPORT_DIR.
+METRICS_ENABLED = True
+METRICS_SAMPLE_INTERVAL = 1.0
+RUN_REPORT_DIR = "run_reports"
+PROFILE = ""
+
+# Resident mode: `scrapy crawl multinews -s DAEMON_ENABLED=1` keeps the
+# crawl and its models alive and polls each feed every refresh_interval
+# minutes (DAEMON_DEFAULT_REFRESH_INTERVAL for feeds without one). State is
+# checkpointed every DAEMON_CHECKPOINT_INTERVAL seconds; with
+# DAEMON_HEALTH_PORT set, /health and /metrics are served on
+# DAEMON_HEALTH_HOST. Parquet files are closed at each checkpoint so they
+# can be read while the daemon runs.
+DAEMON_ENABLED = False
+DAEMON_TICK = 5.0
+DAEMON_DEFAULT_REFRESH_INTERVAL = 15
+DAEMON_CHECKPOINT_INTERVAL = 300.0
+DAEMON_HEALTH_HOST = "127.0.0.1"
+DAEMON_HEALTH_PORT = 8787
+DAEMON_STALE_AFTER = 3600.0
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
@@ -62,6 +121,100 @@ ITEM_PIPELINES = {
     "news_sentiment.pipelines.NewsSentimentPipeline": 300,
 }
 
+# Items published before PUBLISHED_CUTOFF (a date or ISO timestamp, UTC by
+# default) are dropped before scoring; None keeps everything. To apply a new
+# cutoff or new scorers to stored history, see `python -m news_sentiment.backfill`.
+PUBLISHED_CUTOFF = "2025-01-01"
+
+# Sentiment models run on every headline, in this order, each writing its own
+# columns (see news_sentiment.scorers). Cheap scorers (VADER) run inline;
+# expensive ones (FinBERT, other transformers) are micro-batched as below and
+# run in the FINBERT_WORKERS processes. Entries are {"class": ..., **kwargs},
+# e.g. a second classifier writing distil_label and distil_score:
+#     {"class": "news_sentiment.scorers.ClassifierScorer", "name": "distil",
+#      "model": "mrm8488/distilroberta-finetuned-financial-news-sentiment-analysis"}
+# An expensive scorer with "skip_if": {"scorer": "vader", "confidence": 0.9}
+# is skipped for headlines VADER scores at |compound| >= 0.9, and gets VADER's
+# label with no score. Changing the scorers changes the CSV columns, so move
+# an existing headlines.csv aside first. With -s, give the list as JSON.
+SENTIMENT_SCORERS = [
+    {"class": "news_sentiment.scorers.VaderScorer"},
+    {"class": "news_sentiment.scorers.FinbertScorer"},
+]
+
+# FinBERT scores headlines in micro-batches. A batch is scored once it holds
+# FINBERT_BATCH_SIZE headlines, or once its oldest headline has waited
+# FINBERT_BATCH_MAX_WAIT seconds; whatever is left is flushed on close.
+FINBERT_BATCH_SIZE = 32
+FINBERT_BATCH_MAX_WAIT = 5.0
+
+# FinBERT (and torch/transformers) are imported on first use. With preload on,
+# open_spider starts loading them in a background thread so the model is
+# ready by the time the first batch fills; off, loading waits for that batch.
+FINBERT_PRELOAD = True
+
+# FinBERT inference backend: "torch" (fp32), "torch-int8" (dynamic int8
+# quantization of the Linear layers) or "onnx" (ONNX Runtime; the model is
+# exported once per revision under .state/onnx). The int8 and ONNX backends
+# are faster on CPU; see benchmarks/bench_finbert_backends.py for their
+# agreement with fp32.
+FINBERT_BACKEND = "torch"
+
+# Each batch is tokenized in one call to the fast tokenizer, truncated to
+# FINBERT_MAX_TOKENS tokens (0 = the model's limit, 512 for FinBERT), and
+# split into forward passes of similar-length headlines so that padding
+# stays under FINBERT_MAX_PADDING of the tokens in each pass. Padding waste
+# and tokens/sec are reported as finbert/* in the crawl stats. These limits
+# apply to every ClassifierScorer unless its entry sets its own.
+FINBERT_MAX_TOKENS = 0
+FINBERT_MAX_PADDING = 0.25
+
+# Score FinBERT batches in this many worker processes (0 = in the crawler
+# process). Each worker holds its own model copy and runs torch with
+# FINBERT_WORKER_THREADS threads (0 = cores / workers), pinned to its own
+# cores when FINBERT_WORKER_PIN is on.
+FINBERT_WORKERS = 0
+FINBERT_WORKER_THREADS = 0
+FINBERT_WORKER_PIN = True
+
+# Where scored headlines are written. "csv" appends to headlines.csv;
+# "parquet" writes a typed dataset partitioned by day under PARQUET_ROOT,
+# one row group per PARQUET_ROW_GROUP_SIZE rows. List both to write both;
+# `python -m news_sentiment.storage` exports the Parquet data back to CSV.
+STORAGE_BACKENDS = ["csv"]
+PARQUET_ROOT = "headlines.parquet"
+PARQUET_ROW_GROUP_SIZE = 10_000
+
+# At every checkpoint and at the end of the crawl, rows appended since the
+# last fold are added to the per-(date, source, category) sums kept in
+# AGGREGATE_STATE_DIR, from the CSV if it's a backend and the Parquet data
+# otherwise. `python -m news_sentiment.query` answers date-range and group-by
+# queries from those sums; None leaves them to `python -m news_sentiment.aggregate`.
+AGGREGATE_STATE_DIR = ".state"
+
+# Cross-run cache of VADER/FinBERT scores keyed by normalized headline text.
+# Entries are dropped automatically when the FinBERT weights or the VADER
+# version change; set SENTIMENT_CACHE_PATH = None to disable.
+SENTIMENT_CACHE_PATH = ".state/sentiment_cache.sqlite"
+SENTIMENT_CACHE_MAX_ENTRIES = 200_000
+
+# Near-duplicate clustering: the same story from several outlets gets one
+# cluster_id (MinHash/LSH over headline shingles, news_sentiment.clusters); the
+# row that started the cluster is marked is_representative. Clustering only
+# annotates rows: with CLUSTER_REUSE_SCORES (off by default) members also take
+# the scores of the cluster's first scored headline instead of their own
+# inference, which changes what is stored. Headlines whose estimated Jaccard
+# similarity reaches CLUSTER_THRESHOLD join a cluster. The index keeps up to
+# CLUSTER_MAX_ENTRIES stories not matched for CLUSTER_WINDOW_HOURS and is
+# saved to CLUSTER_INDEX_PATH between runs. `python -m news_sentiment.aggregate
+# --weight cluster` counts each story once in the daily summaries.
+CLUSTER_ENABLED = True
+CLUSTER_THRESHOLD = 0.7
+CLUSTER_REUSE_SCORES = False
+CLUSTER_MAX_ENTRIES = 100_000
+CLUSTER_WINDOW_HOURS = 48
+CLUSTER_INDEX_PATH = ".state/clusters.npz"
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
 #AUTOTHROTTLE_ENABLED = True
@@ -0,0 +1,12 @@
+# Project-specific Scrapy signals.
+
+# Sent periodically by the feed daemon (news_sentiment.daemon) so components
+# holding state in memory persist it without waiting for spider_closed.
+# Handlers take no arguments.
+checkpoint = object()
+
+# Sent by the daemon just before `checkpoint`, so rows still waiting in the
+# pipeline's batches are written before the dedup index and feed validators
+# that mark them seen are saved. Handlers take `spider` and may return a
+# Deferred, which checkpoint waits for.
+before_checkpoint = object()
@@ -1,15 +1,19 @@
 import os
 import json
+import time
 import scrapy
+from lxml import etree
 from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 
+from news_sentiment.feedparse import iter_entries
+from news_sentiment.metrics import stage_metrics
+from news_sentiment.middlewares import FeedUnchanged
+from news_sentiment.schedule import FeedSchedule
+from news_sentiment.signals import checkpoint
+
 
 class MultiNewsSpider(scrapy.Spider):
     name = "multinews"
-    custom_settings = {
-        "DOWNLOAD_DELAY": 0.5,
-        "CONCURRENT_REQUESTS_PER_DOMAIN": 2,
-    }
 
     def __init__(self, feeds_file=None, source=None, category=None, *args, **kwargs):
         """
@@ -54,7 +58,14 @@ class MultiNewsSpider(scrapy.Spider):
                         cat = (row.get("category") or "general").strip()
                         if not src or not url:
                             raise ValueError("missing source or url")
-                        normalized.append({"source": src, "category": cat, "url": url})
+                        # optional: higher priority is requested first; refresh_interval
+                        # (minutes) limits how often the feed is polled
+                        priority = int(row.get("priority") or 0)
+                        refresh = float(row.get("refresh_interval") or 0)
+                        if refresh < 0:
+                            raise ValueError("refresh_interval must be >= 0")
+                        normalized.append({"source": src, "category": cat, "url": url,
+                                           "priority": priority, "refresh_interval": refresh})
                     except Exception as e:
                         self.logger.warning(f"Skipping invalid feed row #{i}: {e}")
                 if normalized:
@@ -64,51 +75,89 @@ class MultiNewsSpider(scrapy.Spider):
         # Minimal fallback so job still runs
         self.logger.warning("feeds.json not found; falling back to Reuters World.")
         return [
-            {"source": "Reuters", "category": "world", "url": "https://www.reuters.com/rssFeed/worldNews"}
+            {"source": "Reuters", "category": "world", "url": "https://www.reuters.com/rssFeed/worldNews",
+             "priority": 0, "refresh_interval": 0}
         ]
 
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        # resident mode (news_sentiment.daemon) keeps polling; feeds without
+        # a refresh_interval then use DAEMON_DEFAULT_REFRESH_INTERVAL
+        spider.daemon = crawler.settings.getbool("DAEMON_ENABLED")
+        default_interval = crawler.settings.getfloat("DAEMON_DEFAULT_REFRESH_INTERVAL", 15) if spider.daemon else 0
+        spider.schedule = FeedSchedule(crawler.settings.get("FEED_SCHEDULE_PATH"), default_interval)
+        crawler.signals.connect(spider.schedule.save, signal=checkpoint)
+        spider.metrics = stage_metrics(crawler)
+        return spider
+
     async def start(self):
+        for request in self.due_requests():
+            yield request
+
+    def due_requests(self, now=None):
+        """Requests for the feeds that are due, highest priority first; marks them polled."""
         headers = {
         "Accept": "application/rss+xml,application/xml;q=0.9,*/*;q=0.8",
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
                       "AppleWebKit/537.36 (KHTML, like Gecko) "
                       "Chrome/135.0.0.0 Safari/537.36"
         }
-        for feed in self.feeds:
-            yield scrapy.Request(
+        now = time.time() if now is None else now
+        requests = []
+        for feed in sorted(self.feeds, key=lambda f: -f["priority"]):
+            if not self.schedule.due(feed, now):
+                if not self.daemon:
+                    self.crawler.stats.inc_value("feeds/not_due")
+                continue
+            self.schedule.mark(feed["url"], now)
+            self.crawler.stats.inc_value("feeds/requested")
+            requests.append(scrapy.Request(
                 url=feed["url"],
                 callback=self.parse_feed,
+                errback=self.feed_failed,
                 cb_kwargs={"source": feed["source"], "category": feed["category"]},
                 headers=headers,
-            )
+                priority=feed["priority"],
+                dont_filter=True,
+            ))
+        return requests
+
+    def seconds_until_next_due(self, now=None):
+        now = time.time() if now is None else now
+        return min((self.schedule.seconds_until_due(f, now) for f in self.feeds), default=0.0)
+
+    def feed_failed(self, failure):
+        # unchanged feeds (conditional GET) count as polled
+        if failure.check(FeedUnchanged):
+            return
+        url = failure.request.url
+        self.logger.warning(f"Feed failed: {url}: {failure.value!r}")
+        self.crawler.stats.inc_value("feeds/failed")
+        # a one-off crawl retries it next run; the daemon waits out the interval
+        if not self.daemon:
+            self.schedule.forget(url)
+
+    def closed(self, reason):
+        self.schedule.save()
 
     def parse_feed(self, response, source, category):
-        # RSS: <item>, Atom: <entry>
-        items = response.css("item")
-        is_atom = False
-        if not items:
-            items = response.css("entry")
-            is_atom = True
-
-        for it in items:
-            title = it.css("title::text").get() or it.css("title *::text").get()
-
-            if is_atom:
-                link = it.css("link::attr(href)").get() or it.css("link::text").get()
-                pub = it.css("updated::text").get() or it.css("published::text").get() or it.css("dc\\:date::text").get()
-            else:
-                link = it.css("link::text").get() or it.css("link::attr(href)").get()
-                pub = it.css("pubDate::text").get() or it.css("dc\\:date::text").get()
-
-            if not title or not link:
-                continue
+        # RSS 2.0 <item>, RSS 1.0 <rdf:item> and Atom <entry>, one pass over the body
+        try:
+            with self.metrics.time("parse"):
+                entries = list(iter_entries(response.body, feed=response.url))
+        except etree.XMLSyntaxError as e:
+            self.logger.warning(f"Could not parse feed {response.url}: {e}")
+            return
 
+        for entry in entries:
             yield {
-                "headline": title.strip(),
+                "headline": entry["title"],
                 "source": source,
                 "category": category,
-                "url": self._strip_tracking_params(link.strip()),
-                "published": (pub or "").strip(),
+                "url": self._strip_tracking_params(entry["link"]),
+                "published": entry["published"],
+                "published_utc": entry["published_utc"],
             }
 
     @staticmethod
@@ -0,0 +1,270 @@
+import argparse
+import csv
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+
+ROW_COLUMNS = [
+    "scraped_at",
+    "headline",
+    "source",
+    "category",
+    "url",
+    "published",
+    "published_utc",  # published normalized to UTC (news_sentiment.dates), empty if unreadable
+    "cluster_id",  # near-duplicate story cluster (news_sentiment.clusters), empty if clustering is off
+    "is_representative",  # the row started its cluster (counted once per story), empty if clustering is off
+]
+# row columns added after headlines.csv files were first written; files
+# without them keep being appended in their own layout
+ADDED_COLUMNS = ("published_utc", "cluster_id", "is_representative")
+# {column: kind} written by the default scorers (news_sentiment.scorers);
+# each configured scorer adds its own
+SCORE_COLUMNS = {
+    "vader_sentiment": "float",
+    "finbert_label": "label",
+    "finbert_score": "score",
+}
+HEADER = ROW_COLUMNS + list(SCORE_COLUMNS)
+
+
+def _float_or_none(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _flag_or_none(value):
+    if value is None or isinstance(value, bool):
+        return value
+    if value != value:  # NaN
+        return None
+    value = str(value).strip().lower()
+    return value in ("true", "1") if value else None
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return "" if value is None else value
+
+
+class CsvStorage:
+    """Appends rows to headlines.csv, the format everything downstream reads today."""
+
+    def __init__(self, path="headlines.csv", score_columns=SCORE_COLUMNS):
+        self.path = path
+        self.header = ROW_COLUMNS + list(score_columns)
+        file_exists = os.path.isfile(path) and os.path.getsize(path) > 0
+        if file_exists:
+            with open(path, newline="", encoding="utf-8") as f:
+                existing = next(csv.reader(f), [])
+            legacy = [c for c in self.header if c in existing or c not in ADDED_COLUMNS]
+            if existing == legacy:
+                # written before some of ADDED_COLUMNS existed; keep appending in its
+                # layout (news_sentiment.backfill rewrites history with them)
+                self.header = legacy
+            elif existing != self.header:
+                raise ValueError(
+                    f"{path} has columns {existing} but the configured scorers write {self.header}; "
+                    f"move it aside (or change SENTIMENT_SCORERS back) before crawling"
+                )
+        self.file = open(path, "a", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        if not file_exists:
+            self.writer.writerow(self.header)
+
+    def write(self, rows):
+        for row in rows:
+            self.writer.writerow([_csv_value(row.get(col, "")) for col in self.header])
+        self.file.flush()
+
+    def checkpoint(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetStorage:
+    """
+    Date-partitioned Parquet dataset: <root>/date=YYYY-MM-DD/part-<run>.parquet.
+
+    Timestamps are parsed to UTC, source/category and label columns are
+    dictionary encoded and score columns are float32. The score columns'
+    kinds are kept in the schema metadata for export_csv. Rows are buffered and written one row
+    group at a time; each run keeps one open file per date and closes them
+    all in close(). A long-running crawl calls checkpoint() to finish the
+    open files (a Parquet file is only readable once closed) and start new
+    ones.
+    """
+
+    def __init__(self, root="headlines.parquet", row_group_size=10_000, score_columns=SCORE_COLUMNS):
+        import pyarrow as pa
+
+        self.pa = pa
+        self.root = root
+        self.row_group_size = row_group_size
+        self.score_columns = dict(score_columns)
+        self.run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.buffer = []
+        self.writers = {}
+        self.part = 0
+        self.files = []  # every file this instance has opened
+
+        category = pa.dictionary(pa.int32(), pa.string())
+        utc = pa.timestamp("us", tz="UTC")
+        self.schema = pa.schema([
+            ("scraped_at", utc),
+            ("headline", pa.string()),
+            ("source", category),
+            ("category", category),
+            ("url", pa.string()),
+            ("published", pa.string()),
+            ("published_utc", utc),
+            ("cluster_id", pa.string()),
+            ("is_representative", pa.bool_()),
+            *[(name, category if kind == "label" else pa.float32()) for name, kind in self.score_columns.items()],
+        ], metadata={"score_columns": json.dumps(self.score_columns)})
+
+    def write(self, rows):
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        by_date = {}
+        for row in self.buffer:
+            scraped_at = row["scraped_at"]
+            if isinstance(scraped_at, str):
+                scraped_at = datetime.fromisoformat(scraped_at)
+            published_utc = row.get("published_utc")
+            day = (published_utc or scraped_at).date().isoformat()
+            cols = by_date.setdefault(day, {name: [] for name in self.schema.names})
+            cols["scraped_at"].append(scraped_at)
+            cols["headline"].append(row.get("headline"))
+            cols["source"].append(row.get("source"))
+            cols["category"].append(row.get("category"))
+            cols["url"].append(row.get("url"))
+            cols["published"].append(row.get("published"))
+            cols["published_utc"].append(published_utc)
+            cols["cluster_id"].append(row.get("cluster_id") or None)
+            cols["is_representative"].append(_flag_or_none(row.get("is_representative")))
+            for name, kind in self.score_columns.items():
+                value = row.get(name)
+                if kind == "label":
+                    cols[name].append(value if value and value != "N/A" else None)
+                else:
+                    cols[name].append(_float_or_none(value))
+        self.buffer = []
+
+        for day, cols in by_date.items():
+            table = self.pa.Table.from_pydict(cols, schema=self.schema)
+            self._writer(day).write_table(table, row_group_size=self.row_group_size)
+
+    def _writer(self, day):
+        if day not in self.writers:
+            import pyarrow.parquet as pq
+
+            part_dir = os.path.join(self.root, f"date={day}")
+            os.makedirs(part_dir, exist_ok=True)
+            suffix = f"-{self.part}" if self.part else ""
+            path = os.path.join(part_dir, f"part-{self.run_id}{suffix}.parquet")
+            self.writers[day] = pq.ParquetWriter(path, self.schema, compression="zstd")
+            self.files.append(path)
+        return self.writers[day]
+
+    def checkpoint(self):
+        if self.buffer or self.writers:
+            self.close()
+            self.part += 1
+
+    def close(self):
+        if self.buffer:
+            self.flush()
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+
+BACKENDS = {
+    "csv": CsvStorage,
+    "parquet": ParquetStorage,
+}
+
+
+def open_storage(name, **kwargs):
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend {name!r}; expected one of {sorted(BACKENDS)}")
+    return backend(**kwargs)
+
+
+def read_dataset(root="headlines.parquet", columns=None, start=None, end=None, where=None):
+    """
+    Load (part of) a Parquet dataset into pandas, reading only the requested
+    columns and the date=... partitions between `start` and `end` (inclusive
+    "YYYY-MM-DD" strings). `where` is an extra pyarrow.dataset expression.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+    dataset = ds.dataset(root, format="parquet", partitioning=partitioning)
+    filt = None
+    if start:
+        filt = ds.field("date") >= start
+    if end:
+        cond = ds.field("date") <= end
+        filt = cond if filt is None else filt & cond
+    if where is not None:
+        filt = where if filt is None else filt & where
+    return dataset.to_table(columns=columns, filter=filt).to_pandas()
+
+
+def dataset_score_columns(root="headlines.parquet"):
+    """{column: kind} of the scores stored in a Parquet dataset."""
+    import pyarrow.dataset as ds
+
+    metadata = ds.dataset(root, format="parquet").schema.metadata or {}
+    if b"score_columns" in metadata:
+        return json.loads(metadata[b"score_columns"])
+    return dict(SCORE_COLUMNS)  # written before scorers were configurable
+
+
+def export_csv(root="headlines.parquet", out="headlines_export.csv", start=None, end=None):
+    """Write the Parquet dataset back out in the headlines.csv layout."""
+    import pyarrow.dataset as ds
+
+    score_columns = dataset_score_columns(root)
+    stored = set(ds.dataset(root, format="parquet").schema.names)
+    header = [c for c in ROW_COLUMNS if c in stored] + list(score_columns)
+    df = read_dataset(root, columns=header, start=start, end=end)
+    df = df.sort_values("scraped_at")
+    df["scraped_at"] = df["scraped_at"].map(lambda ts: ts.isoformat())
+    df["published_utc"] = df["published_utc"].map(lambda ts: ts.isoformat() if ts == ts else "")  # NaT != NaT
+    for name in ("cluster_id", "is_representative"):
+        if name in df:
+            df[name] = df[name].astype(object).where(df[name].notna(), "")
+    for name, kind in score_columns.items():
+        if kind == "label":
+            df[name] = df[name].astype(object).fillna("N/A")
+        else:
+            missing = "N/A" if kind == "score" else ""
+            df[name] = df[name].map(lambda v, missing=missing: missing if v != v else round(float(v), 4))
+    df.to_csv(out, index=False, columns=header)
+    return len(df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the Parquet headline dataset to CSV")
+    parser.add_argument("--root", default="headlines.parquet")
+    parser.add_argument("--out", default="headlines_export.csv")
+    parser.add_argument("--start", help="first date to export, YYYY-MM-DD")
+    parser.add_argument("--end", help="last date to export, YYYY-MM-DD")
+    args = parser.parse_args()
+    n = export_csv(args.root, args.out, args.start, args.end)
+    print(f"✅ Exported {n} rows to {args.out}")
@@ -0,0 +1,99 @@
+import json
+import os
+
+
+class HostThrottle:
+    """
+    Per-host concurrency and delay, learned from response latency and errors.
+
+    Each host keeps an exponentially weighted latency and error rate. Healthy
+    hosts (fast, few errors) get one more concurrent request and a shorter
+    delay per response (additive increase); slow hosts give one back; errors
+    (timeouts, connection failures, 429, 5xx) halve concurrency and double the
+    delay (multiplicative decrease). Values stay within the configured
+    bounds and are saved between crawls, so a run starts where the last one
+    left off.
+    """
+
+    def __init__(
+        self,
+        min_concurrency=1,
+        max_concurrency=4,
+        min_delay=0.25,
+        max_delay=30.0,
+        target_latency=2.0,
+        max_error_rate=0.2,
+        alpha=0.3,
+        start_concurrency=1,
+        start_delay=1.0,
+        state_path=None,
+    ):
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max(max_concurrency, min_concurrency)
+        self.min_delay = min_delay
+        self.max_delay = max(max_delay, min_delay)
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self.alpha = alpha
+        self.start_concurrency = self._clamp_concurrency(start_concurrency)
+        self.start_delay = self._clamp_delay(start_delay)
+        self.state_path = state_path
+        self.hosts = {}
+
+    def _clamp_concurrency(self, value):
+        return int(min(max(value, self.min_concurrency), self.max_concurrency))
+
+    def _clamp_delay(self, value):
+        return float(min(max(value, self.min_delay), self.max_delay))
+
+    def host(self, key):
+        if key not in self.hosts:
+            self.hosts[key] = {
+                "concurrency": self.start_concurrency,
+                "delay": self.start_delay,
+                "latency": None,
+                "error_rate": 0.0,
+                "responses": 0,
+                "errors": 0,
+            }
+        return self.hosts[key]
+
+    def record(self, key, latency=None, error=False, retry_after=None):
+        """Fold one response (or failure) into `key`'s stats and adapt its limits."""
+        st = self.host(key)
+        a = self.alpha
+        st["error_rate"] = (1 - a) * st["error_rate"] + a * (1.0 if error else 0.0)
+        if latency is not None:
+            st["latency"] = latency if st["latency"] is None else (1 - a) * st["latency"] + a * latency
+        st["responses"] += 1
+        st["errors"] += int(error)
+
+        if error:
+            st["concurrency"] = self._clamp_concurrency(st["concurrency"] // 2)
+            st["delay"] = self._clamp_delay(max(st["delay"] * 2, retry_after or 0))
+        elif st["error_rate"] > self.max_error_rate or (st["latency"] or 0) > self.target_latency:
+            st["concurrency"] = self._clamp_concurrency(st["concurrency"] - 1)
+            st["delay"] = self._clamp_delay(st["delay"] * 1.5)
+        else:
+            st["concurrency"] = self._clamp_concurrency(st["concurrency"] + 1)
+            st["delay"] = self._clamp_delay(st["delay"] * 0.75)
+        return st
+
+    def load(self):
+        if self.state_path and os.path.isfile(self.state_path):
+            with open(self.state_path, encoding="utf-8") as f:
+                self.hosts = json.load(f)
+            # bounds may have changed since the state was written
+            for st in self.hosts.values():
+                st["concurrency"] = self._clamp_concurrency(st["concurrency"])
+                st["delay"] = self._clamp_delay(st["delay"])
+        return self.hosts
+
+    def save(self):
+        if not self.state_path:
+            return
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.hosts, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.state_path)
@@ -0,0 +1,81 @@
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# per-process copies of the expensive scorers, opened by _init_worker
+_scorers = {}
+
+
+def _init_worker(counter, threads, pin, scorers):
+    global _scorers
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+
+    # give each worker its own slice of cores so they don't fight over them
+    if pin and hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+        mine = cpus[index * threads:(index + 1) * threads]
+        if mine:
+            os.sched_setaffinity(0, mine)
+
+    import torch
+    torch.set_num_threads(threads)
+    _scorers = {scorer.name: scorer for scorer in scorers}
+    for scorer in scorers:
+        try:
+            scorer.open(threads)
+        except Exception:
+            pass  # retried (and reported) by the first _score call
+
+
+def _score(name, headlines):
+    scorer = _scorers[name]
+    warnings = []
+    results = scorer.score(headlines, warn=warnings.append)
+    return results, warnings, scorer.take_counters()
+
+
+def _ping():
+    return os.getpid()
+
+
+class ScoringPool:
+    """
+    Expensive scorers (FinBERT by default) in separate worker processes.
+
+    Each worker loads its own copy of every scorer's model and runs torch
+    with `threads_per_worker` threads (by default the cores split evenly
+    across workers), optionally pinned to its own cores. submit() returns a
+    concurrent.futures.Future of (results, warnings, counters) for one
+    batch, counters being the worker's Scorer.take_counters().
+    """
+
+    def __init__(self, workers, threads_per_worker=None, pin=True, scorers=None):
+        if scorers is None:
+            from news_sentiment.scorers import FinbertScorer
+
+            scorers = [FinbertScorer()]
+        self.workers = workers
+        self.threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        # e.g. the ONNX export, done here once rather than by every worker at once
+        for scorer in scorers:
+            scorer.prepare()
+        # spawn, not fork: the parent may hold a running reactor and torch threads
+        ctx = mp.get_context("spawn")
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(ctx.Value("i", 0), self.threads, pin, list(scorers)),
+        )
+
+    def warm_up(self):
+        """Start every worker (and its model loads) now rather than on the first batch."""
+        return [self.executor.submit(_ping) for _ in range(self.workers)]
+
+    def submit(self, headlines, scorer="finbert"):
+        return self.executor.submit(_score, scorer, list(headlines))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
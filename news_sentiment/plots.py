@@ -0,0 +1,181 @@
+# news_sentiment/plots.py
+#
+# Headless plot rendering, kept apart from the analysis scripts. Figures are
+# drawn with the object-oriented Matplotlib API on Agg canvases (pyplot and
+# the interactive backends are never imported), rendered in a process pool,
+# and skipped when the data behind them hasn't changed since the last render:
+#
+#   python plots.py                  # sentiment trend plots from the daily summaries
+#   python plots.py --force          # re-render everything
+
+import argparse
+import hashlib
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# bump when a renderer's drawing code changes, so stale figures get redrawn
+RENDER_VERSION = 1
+MANIFEST_PATH = ".state/plot_hashes.json"
+
+# kind: key in RENDERERS; path: output PNG; title: figure title; data: DataFrame to draw
+PlotJob = namedtuple("PlotJob", ["kind", "path", "title", "data"])
+
+
+# --- Renderers ---
+
+def _figure(figsize):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def render_market_scatter(job):
+    """Sentiment metrics against same-day index returns."""
+    data = job.data
+    fig = _figure((10, 5))
+    ax = fig.add_subplot()
+    ax.scatter(data["avg_vader"], data["returns"], label="VADER vs Returns", alpha=0.7)
+    ax.scatter(data["finbert_pos"], data["returns"], label="FinBERT % Positive vs Returns", alpha=0.7)
+    ax.axhline(0, color="gray", linestyle="--")
+    ax.set_title(job.title)
+    ax.set_xlabel("Sentiment Metric")
+    ax.set_ylabel("Market Returns")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(job.path)
+
+
+def render_sentiment_trend(job):
+    """Daily VADER average and FinBERT label shares (in %) over time."""
+    data = job.data
+    dates = pd.to_datetime(data["date"])
+    fig = _figure((10, 5))
+    ax = fig.add_subplot()
+    ax.plot(dates, data["avg_vader"], marker="o", label="VADER Avg Sentiment")
+    ax.plot(dates, data["finbert_pos"] * 100, marker="o", label="FinBERT % Positive")
+    ax.plot(dates, data["finbert_neg"] * 100, marker="o", label="FinBERT % Negative")
+    ax.plot(dates, data["finbert_neu"] * 100, marker="o", label="FinBERT % Neutral")
+    ax.axhline(0, color="gray", linestyle="--")
+    ax.set_title(job.title)
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Score / % of Headlines")
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(job.path)
+
+
+RENDERERS = {
+    "market_scatter": render_market_scatter,
+    "sentiment_trend": render_sentiment_trend,
+}
+
+
+def _render(job):
+    os.makedirs(os.path.dirname(job.path) or ".", exist_ok=True)
+    RENDERERS[job.kind](job)
+    return job.path
+
+
+# --- Change detection ---
+
+def job_hash(job):
+    """Digest of everything that ends up in the figure: renderer, title and data."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{RENDER_VERSION}\0{job.kind}\0{job.title}\0".encode())
+    h.update(",".join(map(str, job.data.columns)).encode())
+    h.update(pd.util.hash_pandas_object(job.data, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _load_manifest(path):
+    if path and os.path.isfile(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def _save_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def render_all(jobs, workers=None, manifest_path=MANIFEST_PATH, force=False):
+    """
+    Render every job whose input hash differs from the last render (or whose
+    PNG is missing), `workers` processes at a time (default: one per CPU).
+    Returns (rendered, skipped) lists of output paths.
+    """
+    manifest = _load_manifest(manifest_path)
+    todo, skipped = [], []
+    for job in jobs:
+        digest = job_hash(job)
+        if not force and manifest.get(job.path) == digest and os.path.isfile(job.path):
+            skipped.append(job.path)
+        else:
+            todo.append((job, digest))
+
+    workers = min(workers or os.cpu_count() or 1, len(todo))
+    rendered = []
+    try:
+        if workers <= 1:
+            for job, digest in todo:
+                rendered.append(_render(job))
+                manifest[job.path] = digest
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for (job, digest), path in zip(todo, pool.map(_render, [job for job, _ in todo])):
+                    rendered.append(path)
+                    manifest[job.path] = digest
+    finally:
+        if manifest_path and rendered:
+            _save_manifest(manifest_path, manifest)
+    return rendered, skipped
+
+
+# --- Sentiment trend jobs ---
+
+def sentiment_trend_jobs(daily_csv="daily_summary.csv", category_csv="daily_category_summary.csv",
+                         out_dir="sentiment_plots"):
+    """One overall trend plot plus one per category, from the aggregate summaries."""
+    columns = ["date", "avg_vader", "finbert_pos", "finbert_neg", "finbert_neu"]
+    jobs = []
+    if os.path.isfile(daily_csv):
+        daily = pd.read_csv(daily_csv).sort_values("date")
+        jobs.append(PlotJob("sentiment_trend", os.path.join(out_dir, "sentiment_trend.png"),
+                            "Daily Sentiment Trends (Overall)", daily[columns].reset_index(drop=True)))
+    if os.path.isfile(category_csv):
+        by_category = pd.read_csv(category_csv, keep_default_na=False, na_values=[""]).sort_values("date")
+        for category, group in by_category.groupby("category"):
+            if not category:
+                continue
+            jobs.append(PlotJob("sentiment_trend", os.path.join(out_dir, f"sentiment_trend_{category}.png"),
+                                f"Daily Sentiment Trends ({category.title()} News)",
+                                group[columns].reset_index(drop=True)))
+    return jobs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render sentiment trend plots")
+    parser.add_argument("--daily-csv", default="daily_summary.csv")
+    parser.add_argument("--category-csv", default="daily_category_summary.csv")
+    parser.add_argument("--out-dir", default="sentiment_plots")
+    parser.add_argument("--workers", type=int, help="render processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="re-render even if the data is unchanged")
+    args = parser.parse_args()
+
+    jobs = sentiment_trend_jobs(args.daily_csv, args.category_csv, args.out_dir)
+    rendered, skipped = render_all(jobs, workers=args.workers, force=args.force)
+    for path in rendered:
+        print(f"📈 Plot saved: {path}")
+    print(f"✅ Rendered {len(rendered)} plots, {len(skipped)} unchanged")